@@ -2,9 +2,10 @@
 # Copyright Etendut
 # licence MIT
 from micropython import const, mem_info
-from pybricks.parameters import Color, Button
+from pybricks.parameters import Color, Button, Stop
 from pybricks.pupdevices import Remote
-from pybricks.tools import wait, StopWatch
+from pybricks.tools import wait, StopWatch, multitask, run_task
+from ustruct import calcsize, pack_into, unpack_from
 
 try:
     from typing import TYPE_CHECKING
@@ -15,8 +16,8 @@ if TYPE_CHECKING:
     # noinspection PyUnusedImports
     from modules.mock_types import MockHub, MockRemote
 
-from pybricks.pupdevices import Motor
-from pybricks.parameters import Port, Direction, Stop
+from pybricks.pupdevices import Motor, ColorDistanceSensor
+from pybricks.parameters import Port, Direction
 from uerrno import ENODEV
 from umath import floor, sqrt
 
@@ -30,7 +31,9 @@ print('Version 2.1.0')
 COUNTDOWN_LIMIT_MINUTES: int = const(
     3)  # run for (x) minutes, min 1 minute, max up to you. the default of 3 minutes is play tested :).
 # c = center button, + = + button, - = - button
+# a space between chords makes a code of several steps, e.g. '+,,+ -,,- c,c,c'
 COUNTDOWN_RESET_CODE = 'c,c,c'  # left center button, center button, right center button
+COUNTDOWN_RESET_CODE_STEP_SECS: int = const(3)  # time allowed between the steps of the code
 
 # How many seconds to wait before doing a load/unload automatically. 0 = disabled
 ODV_AUTO_DRIVE_TIMEOUT_SECS: int = const(30)
@@ -38,6 +41,11 @@ ODV_AUTO_DRIVE_TIMEOUT_SECS: int = const(30)
 # for debugging or ODV full auto
 REMOTE_DISABLED = False
 
+# ODVs sharing a grid, each hub broadcasts its tile reservations on its own channel (0-255) and observes the
+# others, e.g. ODV_FLEET_CHANNEL = 1, ODV_FLEET_PEER_CHANNELS = [2, 3]. None = a single ODV
+ODV_FLEET_CHANNEL = None
+ODV_FLEET_PEER_CHANNELS = []
+
 
 
 # odv settings
@@ -45,6 +53,18 @@ ODV_SPEED: int = const(45)  # set between 40 and 70
 # X= obstacle, H= Home, L = Load, U = Unload, # = grid tile
 # ODV_GRID = ["H######", "###X#XX", "LX###XU", "###X###"]
 ODV_GRID = ["XL##XU", "H#X###"]
+# auto-drive route costs, 0 = work out from the motor speed and acceleration
+ODV_TILE_COST_MS: int = const(0)  # time to drive one grid tile
+ODV_TURN_COST_MS: int = const(0)  # time lost stopping and starting again for a turn
+# load/unload, the cart stays in the station for ODV_TRANSFER_DWELL_MS, or with a transfer sensor until it reads
+# the cart full/empty
+ODV_TRANSFER_DWELL_MS: int = const(2000)  # time to stay in the station, with a sensor the longest time
+ODV_TRANSFER_SENSOR_PORT = None  # optional Color and Distance sensor looking into the cart, e.g. Port.B
+ODV_TRANSFER_SENSOR_FULL_DISTANCE: int = const(40)  # sensor distance (%) at or below which the cart is full
+# gearing, motor degrees per grid pitch (stud) on the x and y axes
+ODV_GEAR_RATIO_TO_GRID = (80, 80)
+ODV_CALIBRATE = False  # measure ODV_GEAR_RATIO_TO_GRID once, kept in the hub and checked at each homing after boot
+ODV_AXIS_TRAVEL_PITCHES = (0, 0)  # pitches between the x and y axis end stops, 0 = home tile to far grid edges
 
 
 ##################################################################################
@@ -62,9 +82,6 @@ class ErrorFlashCodes:
     def set_error_no_motor_on_b(self):
         self.flash_count = 3
 
-    def set_error_no_remote(self):
-        self.flash_count = 4
-
     def flash_error_code(self):
         """
             this flashes the remote led
@@ -89,12 +106,17 @@ class MotorHelper:
         self.mh__remote_disabled = False
         self.mh_auto_drive = False
         self.mh_is_homed = False
+        self.mh_route_active = False
 
     def handle_flip(self):
         """Tracked racer only"""
         pass
 
-    def do_homing(self):
+    async def start_up(self):
+        """Calibration run at boot while the remote is found, servo only"""
+        pass
+
+    async def do_homing(self):
         """ODV only"""
         pass
 
@@ -114,6 +136,15 @@ class MotorHelper:
         """ODV only"""
         pass
 
+    def advance_route(self):
+        """Moves the active route on by one step without blocking, ODV only"""
+        pass
+
+    def resume_route(self) -> bool:
+        """Continues a route interrupted by the user, ODV only
+        :return: True if there was a route to continue"""
+        return False
+
     def enable_auto_drive(self):
         """enable mh_auto_drive, ODV only"""
         if self.mh_auto_drive:
@@ -152,30 +183,324 @@ class MotorHelper:
 
 
 ##################################################################################
-# Countdown helper
+# Actuator helper
 ##################################################################################
 
-def wait_for_no_pressed_buttons():
-    if REMOTE_DISABLED:
-        return
-    remote_buttons_pressed = remote.buttons.pressed()
-    while remote_buttons_pressed:
-        remote_buttons_pressed = remote.buttons.pressed()
-        wait(100)
+_COMMAND_NONE: int = const(0)
+_COMMAND_DC: int = const(1)
+_COMMAND_STOP: int = const(2)
+_COMMAND_RUN_TARGET: int = const(3)
+_COMMAND_LIGHT: int = const(4)
 
 
-def convert_millis_hours_minutes_seconds(millis: int):
+class Actuator:
     """
-        utility for making milliseconds hours/minutes/seconds
-    :param millis:
-    :return hours, minutes, seconds:
+    Wraps a motor or light and drops a command that repeats the last one sent to it. Other commands are
+    passed on and clear the last command, anything else, angle() and the like, comes straight from the device
     """
-    hours = int((millis / (1000 * 60 * 60)) % 24)
-    minutes = int((millis / (1000 * 60)) % 60)
-    seconds = int((millis / 1000) % 60)
 
-    return hours, minutes, seconds
+    def __init__(self, device):
+        self.device = device
+        self.last_command = _COMMAND_NONE
+        self.last_value = 0
+        self.last_speed = 0
+        self.commands_sent = 0
+        self.commands_saved = 0
+
+    def __getattr__(self, name):
+        # only called for names the actuator does not have, keep them so the next look up is direct
+        value = getattr(self.device, name)
+        setattr(self, name, value)
+        return value
+
+    def __repeats__(self, command: int, value: int, speed: int = 0) -> bool:
+        """
+            records a coalesced command
+        :return True if it is the same as the last one and need not be sent:
+        """
+        if command == self.last_command and value == self.last_value and speed == self.last_speed:
+            self.commands_saved += 1
+            return True
+        self.last_command = command
+        self.last_value = value
+        self.last_speed = speed
+        self.commands_sent += 1
+        return False
+
+    def __forget__(self):
+        """records a command that is always sent"""
+        self.last_command = _COMMAND_NONE
+        self.commands_sent += 1
+
+    def dc(self, duty: int):
+        if not self.__repeats__(_COMMAND_DC, duty):
+            self.device.dc(duty)
+
+    def stop(self):
+        if not self.__repeats__(_COMMAND_STOP, 0):
+            self.device.stop()
+
+    def run_target(self, speed: int, target_angle: int, then=Stop.HOLD, wait: bool = True):
+        # a waiting move is always sent, the caller may await it
+        if wait or then != Stop.HOLD:
+            self.__forget__()
+            return self.device.run_target(speed, target_angle, then, wait)
+        if not self.__repeats__(_COMMAND_RUN_TARGET, target_angle, speed):
+            self.device.run_target(speed, target_angle, then, False)
+
+    def run(self, speed: int):
+        self.__forget__()
+        self.device.run(speed)
+
+    def run_until_stalled(self, speed: int, duty_limit: int = None):
+        self.__forget__()
+        if duty_limit is None:
+            return self.device.run_until_stalled(speed)
+        return self.device.run_until_stalled(speed, duty_limit=duty_limit)
 
+    def reset_angle(self, angle: int):
+        self.__forget__()
+        self.device.reset_angle(angle)
+
+    def on(self, brightness: int = 100):
+        if not self.__repeats__(_COMMAND_LIGHT, brightness):
+            self.device.on(brightness)
+
+    def off(self):
+        if not self.__repeats__(_COMMAND_LIGHT, 0):
+            self.device.off()
+
+
+##################################################################################
+# Calibration storage
+##################################################################################
+
+# saved calibration, in the hub's user storage from offset 0:
+# magic byte, vehicle kind byte, the vehicle's values packed with its ustruct layout, checksum byte
+_CALIBRATION_MAGIC: int = const(0x4C)
+_CALIBRATION_SERVO: int = const(1)
+_CALIBRATION_ODV: int = const(2)
+# how far apart two absolute encoder readings can be and still count as the same place
+_CALIBRATION_TOLERANCE: int = const(20)
+
+
+def load_calibration(kind: int, layout: str):
+    """
+    Reads the calibration saved by save_calibration
+    :param kind: _CALIBRATION_SERVO or _CALIBRATION_ODV
+    :param layout: ustruct format of the values
+    :return the values, None if there are none for this vehicle or they fail the check:
+    """
+    global hub
+    size = calcsize(layout) + 3
+    try:
+        data = hub.system.storage(0, read=size)
+    except (AttributeError, ValueError, OSError):
+        # no user storage on this firmware
+        return None
+    if data[0] != _CALIBRATION_MAGIC or data[1] != kind or sum(data[:-1]) & 0xFF != data[-1]:
+        return None
+    return unpack_from(layout, data, 2)
+
+
+def save_calibration(kind: int, layout: str, *values):
+    """
+    Keeps calibration values in the hub's user storage so the next boot can check them instead of calibrating
+    :param kind: _CALIBRATION_SERVO or _CALIBRATION_ODV
+    :param layout: ustruct format of the values
+    :param values:
+    """
+    global hub
+    data = bytearray(calcsize(layout) + 3)
+    data[0] = _CALIBRATION_MAGIC
+    data[1] = kind
+    pack_into(layout, data, 2, *values)
+    data[-1] = sum(data[:-1]) & 0xFF
+    try:
+        hub.system.storage(0, write=data)
+    except (AttributeError, ValueError, OSError):
+        print('--calibration not saved')
+
+
+def angles_match(angle: int, saved_angle: int) -> bool:
+    """two absolute encoder readings are the same place, the encoder wraps every turn"""
+    return abs((angle - saved_angle + 180) % 360 - 180) <= _CALIBRATION_TOLERANCE
+
+
+##################################################################################
+# Remote input
+##################################################################################
+
+# one bit per remote button
+_BUTTON_LEFT_PLUS: int = const(1)
+_BUTTON_LEFT_MINUS: int = const(2)
+_BUTTON_LEFT: int = const(4)
+_BUTTON_CENTER: int = const(8)
+_BUTTON_RIGHT_PLUS: int = const(16)
+_BUTTON_RIGHT_MINUS: int = const(32)
+_BUTTON_RIGHT: int = const(64)
+_BUTTON_STOP: int = const(68)  # either red button
+
+# a scan covers finding the remote, connecting and discovering its services, boot scans long enough for all
+# of it while the motors start up by themselves. A scan blocks every task, so a remote lost while driving is
+# looked for in scans that start short and double each time one fails, up to a full scan, with a gap between
+# them for the other tasks
+_REMOTE_SCAN_MS: int = const(2000)
+_REMOTE_RESCAN_MS: int = const(250)
+_REMOTE_RETRY_MS: int = const(400)
+
+_BUTTON_BITS = ((Button.LEFT_PLUS, _BUTTON_LEFT_PLUS), (Button.LEFT_MINUS, _BUTTON_LEFT_MINUS),
+                (Button.LEFT, _BUTTON_LEFT), (Button.CENTER, _BUTTON_CENTER),
+                (Button.RIGHT_PLUS, _BUTTON_RIGHT_PLUS), (Button.RIGHT_MINUS, _BUTTON_RIGHT_MINUS),
+                (Button.RIGHT, _BUTTON_RIGHT))
+
+
+class RemoteInput:
+    """
+    The remote buttons, read once per tick by input_task and shared by the countdown and the vehicle
+    """
+
+    def __init__(self):
+        self.buttons = 0  # held this tick
+        self.pressed = 0  # went down since the last tick
+        self.released = 0  # went up since the last tick
+        self.connected = True
+        self.stopwatch = StopWatch()
+        self.lost_time = 0
+        self.scan_ms = _REMOTE_RESCAN_MS
+
+    def sample(self):
+        """
+            read the remote buttons into the bitmasks, a lost remote reads as no buttons held
+        """
+        try:
+            remote_buttons_pressed = remote.buttons.pressed()
+        except OSError:
+            self.lose()
+            remote_buttons_pressed = ()
+        buttons = 0
+        for button in remote_buttons_pressed:
+            for remote_button, bit in _BUTTON_BITS:
+                if button == remote_button:
+                    buttons |= bit
+                    break
+        self.pressed = buttons & ~self.buttons
+        self.released = self.buttons & ~buttons
+        self.buttons = buttons
+
+    def lose(self):
+        """
+            the remote has gone, input_task looks for it again in the background
+        """
+        if not self.connected:
+            return
+        print('--remote lost')
+        self.connected = False
+        self.lost_time = self.stopwatch.time()
+        self.scan_ms = _REMOTE_RESCAN_MS
+
+    def connect(self, scan_ms: int = _REMOTE_SCAN_MS) -> bool:
+        """
+            look for the remote for scan_ms, this blocks but moving motors and the hub light carry on
+            by themselves
+        :return True if the remote was found:
+        """
+        global remote
+        try:
+            remote = Remote(timeout=scan_ms)
+        except OSError:
+            return False
+        print('--remote connected.')
+        self.connected = True
+        return True
+
+    def reconnect(self) -> int:
+        """
+            look for a lost remote, for longer each time it is not found
+        :return ms the remote was lost for, 0 if it was not found:
+        """
+        if not self.connect(self.scan_ms):
+            self.scan_ms = min(self.scan_ms * 2, _REMOTE_SCAN_MS)
+            return 0
+        return max(self.stopwatch.time() - self.lost_time, 1)
+
+
+remote_input = RemoteInput()
+
+
+##################################################################################
+# Status lights
+##################################################################################
+
+class StatusLights:
+    """
+    The hub and remote lights. The hub light flashes by itself once given a pattern, the remote light can only
+    be switched on and off so it is flashed from here, but only sent a color when it changes
+    """
+
+    def __init__(self):
+        self.stopwatch = StopWatch()
+        self.color = None
+        self.durations = None
+        self.period = 0
+        self.pattern_start_time = 0
+        self.remote_color = None
+
+    def show(self, color, durations: list[int] = None):
+        """
+            show a color, steady or flashing, call every tick so the remote keeps flashing
+        :param color:
+        :param durations: on and off times in ms, as for hub.light.blink, None for a steady color
+        """
+        global hub
+        global remote
+        if color != self.color or durations is not self.durations:
+            self.color = color
+            self.durations = durations
+            self.pattern_start_time = self.stopwatch.time()
+            if durations:
+                self.period = sum(durations)
+                hub.light.blink(color, durations)
+            else:
+                hub.light.on(color)
+
+        if REMOTE_DISABLED or not remote_input.connected:
+            return
+        remote_color = color
+        if durations:
+            # find the step of the pattern the remote is on, even steps are on, odd ones off
+            elapsed = (self.stopwatch.time() - self.pattern_start_time) % self.period
+            step = 0
+            while elapsed >= durations[step]:
+                elapsed -= durations[step]
+                step += 1
+            if step % 2:
+                remote_color = Color.NONE
+        if remote_color != self.remote_color:
+            self.remote_color = remote_color
+            try:
+                remote.light.on(remote_color)
+            except OSError:
+                remote_input.lose()
+
+
+# flash patterns, on and off times in ms
+_READY_FLASH = [500, 500]
+_FINAL_MINUTE_FLASH = [500, 250]
+_FINAL_20_SECS_FLASH = [200, 100]
+LED_FLASHING_SEQUENCE = [75] * 5 + [1000]
+
+
+##################################################################################
+# Countdown helper
+##################################################################################
+
+# the countdown changes phase or prints a message every _COUNTDOWN_EVENT_MS in its last minute
+_COUNTDOWN_EVENT_MS: int = const(10000)
+_COUNTDOWN_EVENT_SECS: int = const(10)
+_FINAL_MINUTE_MS: int = const(60000)
+_FINAL_MINUTE_SECS: int = const(60)
+_FINAL_20_SECS_MS: int = const(20000)
 
 _READY: int = const(0)
 _ACTIVE: int = const(10)
@@ -192,16 +517,19 @@ class CountdownTimer:
 
     def __init__(self):
         # assign external objects to properties of the class
-        self.last_countdown_message: str = ''
         self.countdown_status: int = _UNKNOWN
 
         # Start a timer.
         self.stopwatch = StopWatch()
-        self.led_flash_sw_time = 0
+        self.lights = StatusLights()
         self.end_time = 0
+        self.next_event_time = 0
+        # set when the countdown ends, see has_session_ended
+        self.session_ended = False
         # remote timing
         self.remote_buttons_time_out_ms = 0
         self.reset_time_since_last_remote_press()
+        self.reset_code = ButtonSequence(COUNTDOWN_RESET_CODE, COUNTDOWN_RESET_CODE_STEP_SECS * 1000)
 
     def reset_time_since_last_remote_press(self):
         self.remote_buttons_time_out_ms = self.stopwatch.time() + (ODV_AUTO_DRIVE_TIMEOUT_SECS * 1000)
@@ -216,32 +544,48 @@ class CountdownTimer:
         """
         if self.countdown_status == _ENDED or self.countdown_status == _READY:
             return False
+        # paused while the remote is lost
+        if not remote_input.connected:
+            return True
+        # nothing changes until the next phase or message
+        if self.stopwatch.time() < self.next_event_time:
+            return True
+        return self.__next_countdown_event__()
 
-        # calculate remaining_time time
+    def __next_countdown_event__(self) -> bool:
+        """
+            move the countdown on to its current phase and work out when the next one is due
+        :return True if there is time remaining:
+        """
         remaining_time = self.end_time - self.stopwatch.time()
-
-        # print a friendly console message
-        con_hour, con_min, con_sec = convert_millis_hours_minutes_seconds(int(remaining_time))
-
-        if con_sec % 10 == 0 and con_min < 1:
-            countdown_message = 'countdown ending in: {}:{:02}'.format(con_min, con_sec)
-            if self.last_countdown_message != countdown_message:
-                self.last_countdown_message = countdown_message
-                print(self.last_countdown_message)  # when time has run out end countdown
+        # round up to the event just passed, a tick can run a little after it
+        event_secs = (remaining_time + _COUNTDOWN_EVENT_MS - 1) // _COUNTDOWN_EVENT_MS * _COUNTDOWN_EVENT_SECS
+        if event_secs < _FINAL_MINUTE_SECS:
+            print('countdown ending in: 0:{:02}'.format(max(event_secs, 0)))
         if remaining_time <= 0:
             self.countdown_status = _ENDED
-            self.show_status()
-            return False
-        # in last 25s slow flash a warning
-        if remaining_time < (1000 * 20):
+            self.session_ended = True
+        elif remaining_time <= _FINAL_20_SECS_MS:
+            # in last 20s fast flash a warning
             self.countdown_status = _FINAL_20_SECS
-            self.show_status()
-
+        elif remaining_time <= _FINAL_MINUTE_MS:
             # in last minute slow flash a warning
-        if remaining_time < (1000 * 60):
             self.countdown_status = _FINAL_MINUTE
-            self.show_status()
+        self.show_status()
+        if self.countdown_status == _ENDED:
+            return False
 
+        events_left = min((remaining_time - 1) // _COUNTDOWN_EVENT_MS, _FINAL_MINUTE_MS // _COUNTDOWN_EVENT_MS)
+        self.next_event_time = self.end_time - events_left * _COUNTDOWN_EVENT_MS
+        return True
+
+    def has_session_ended(self) -> bool:
+        """
+            True the first time it is asked after the countdown ends, so the end of a session is handled once
+        """
+        if not self.session_ended:
+            return False
+        self.session_ended = False
         return True
 
     def __start_countdown__(self):
@@ -252,6 +596,7 @@ class CountdownTimer:
         self.countdown_status = _ACTIVE
         self.show_status()
         self.end_time = self.stopwatch.time() + (COUNTDOWN_LIMIT_MINUTES * 60 * 1000)
+        self.next_event_time = self.end_time - _FINAL_MINUTE_MS
 
     def reset(self):
         if REMOTE_DISABLED:
@@ -261,6 +606,19 @@ class CountdownTimer:
         self.countdown_status = _READY
         self.reset_time_since_last_remote_press()
 
+    def resume(self, lost_ms: int):
+        """
+            carry on once a lost remote is back, the countdown was paused while it was gone
+        :param lost_ms:
+        """
+        print('countdown resumed')
+        if _ACTIVE <= self.countdown_status <= _FINAL_20_SECS:
+            self.end_time += lost_ms
+            self.next_event_time += lost_ms
+        # the new remote's light is not showing anything yet
+        self.lights.remote_color = None
+        self.reset_time_since_last_remote_press()
+
     def check_remote_buttons(self):
         """
             check countdown time buttons
@@ -268,106 +626,106 @@ class CountdownTimer:
         if REMOTE_DISABLED:
             return
 
-        remote_buttons_pressed = remote.buttons.pressed()
-        if len(remote_buttons_pressed) == 0:
+        if not remote_input.buttons:
             return
 
         self.reset_time_since_last_remote_press()
+        # only a button going down counts, so a held button does not start the countdown straight after a reset
+        if not remote_input.pressed:
+            return
 
-        if self.countdown_status == _READY and Button.CENTER in remote_buttons_pressed:
+        if self.countdown_status == _READY and remote_input.pressed & _BUTTON_CENTER:
             self.__start_countdown__()
-            wait_for_no_pressed_buttons()
 
         # if reset sequence pressed reset the countdown timer
-        if all(i in remote_buttons_pressed for i in PROGRAM_RESET_CODE_PRESSED) and not any(
-                i in remote_buttons_pressed for i in PROGRAM_RESET_CODE_NOT_PRESSED):
+        if self.reset_code.press(remote_input.buttons, self.stopwatch.time()):
             self.reset()
-            wait_for_no_pressed_buttons()
 
     def show_status(self):
-        global hub
-        global remote
-        if self.countdown_status == _READY:
-            self.__flash_remote_and_hub_light__(Color.GREEN, 500, Color.NONE, 500)
+        if not remote_input.connected:
+            self.lights.show(Color.WHITE, LED_FLASHING_SEQUENCE)
+        elif self.countdown_status == _READY:
+            self.lights.show(Color.GREEN, _READY_FLASH)
         elif self.countdown_status == _ACTIVE:
-            hub.light.on(Color.GREEN)
-            if not REMOTE_DISABLED:
-                remote.light.on(Color.GREEN)
+            self.lights.show(Color.GREEN)
         elif self.countdown_status == _FINAL_20_SECS:
-            self.__flash_remote_and_hub_light__(Color.ORANGE, 200, Color.NONE, 100)
+            self.lights.show(Color.ORANGE, _FINAL_20_SECS_FLASH)
         elif self.countdown_status == _FINAL_MINUTE:
-            self.__flash_remote_and_hub_light__(Color.ORANGE, 500, Color.NONE, 250)
+            self.lights.show(Color.ORANGE, _FINAL_MINUTE_FLASH)
         elif self.countdown_status == _ENDED:
-            hub.light.on(Color.ORANGE)
-            if not REMOTE_DISABLED:
-                remote.light.on(Color.ORANGE)
-
-    def __flash_remote_and_hub_light__(self, on_color, on_msec: int, off_color, off_msec: int):
-        """
-            this flashes the remote led
-        :param on_color:
-        :param on_msec:
-        :param off_color:
-        :param off_msec:
-        """
-        global hub
-        # we use a timer to make it a non-blocking call
-        if self.stopwatch.time() > (on_msec + off_msec + self.led_flash_sw_time):
-            self.led_flash_sw_time = self.stopwatch.time()
-            if not REMOTE_DISABLED:
-                remote.light.on(off_color)
-            hub.light.on(off_color)
-        elif self.stopwatch.time() > (off_msec + self.led_flash_sw_time):
-            if not REMOTE_DISABLED:
-                remote.light.on(on_color)
-            hub.light.on(on_color)
+            self.lights.show(Color.ORANGE)
 
 
 ##################################################################################
 # Code helper
 ##################################################################################
 
-def code_to_button_press_hash(button_code):
+def code_to_button_press_hash(button_code) -> int:
     """
-    Returns the button needed to match a given code
+    Returns the buttons of one chord of a code, any other button held means no match
     :param button_code:
-    :return buttons_that_are_pressed[], buttons_that_should_not_pressed[]:
+    :return buttons bitmask:
     """
     code_items = button_code.split(',')
-    buttons_that_should_not_pressed = [Button.LEFT_PLUS, Button.LEFT_MINUS, Button.LEFT, Button.CENTER,
-                                       Button.RIGHT_PLUS, Button.RIGHT_MINUS, Button.RIGHT]
-    buttons_that_are_pressed = []
+    buttons = 0
     # left code
     if '+' in code_items[0]:
-        buttons_that_are_pressed.append(Button.LEFT_PLUS)
-        buttons_that_should_not_pressed.remove(Button.LEFT_PLUS)
+        buttons |= _BUTTON_LEFT_PLUS
     if '-' in code_items[0]:
-        buttons_that_are_pressed.append(Button.LEFT_MINUS)
-        buttons_that_should_not_pressed.remove(Button.LEFT_MINUS)
+        buttons |= _BUTTON_LEFT_MINUS
     if 'c' in code_items[0]:
-        buttons_that_are_pressed.append(Button.LEFT)
-        buttons_that_should_not_pressed.remove(Button.LEFT)
+        buttons |= _BUTTON_LEFT
 
     # middle code
     if 'c' in code_items[1]:
-        buttons_that_are_pressed.append(Button.CENTER)
-        buttons_that_should_not_pressed.remove(Button.CENTER)
+        buttons |= _BUTTON_CENTER
 
     # right code
     if '+' in code_items[2]:
-        buttons_that_are_pressed.append(Button.RIGHT_PLUS)
-        buttons_that_should_not_pressed.remove(Button.RIGHT_PLUS)
+        buttons |= _BUTTON_RIGHT_PLUS
     if '-' in code_items[2]:
-        buttons_that_are_pressed.append(Button.RIGHT_MINUS)
-        buttons_that_should_not_pressed.remove(Button.RIGHT_MINUS)
+        buttons |= _BUTTON_RIGHT_MINUS
     if 'c' in code_items[2]:
-        buttons_that_are_pressed.append(Button.RIGHT)
-        buttons_that_should_not_pressed.remove(Button.RIGHT)
+        buttons |= _BUTTON_RIGHT
+
+    if buttons == 0:
+        raise ValueError('no buttons in code ' + button_code)
+    return buttons
 
-    return buttons_that_are_pressed, buttons_that_should_not_pressed
 
+class ButtonSequence:
+    """
+    A code of button chords separated by spaces, pressed one after another. Only moves on when a button goes
+    down, so a code costs nothing on the ticks in between
+    """
 
-PROGRAM_RESET_CODE_PRESSED, PROGRAM_RESET_CODE_NOT_PRESSED = code_to_button_press_hash(COUNTDOWN_RESET_CODE)
+    def __init__(self, code: str, step_timeout_ms: int):
+        self.steps = bytearray([code_to_button_press_hash(step) for step in code.split()])
+        self.step_timeout_ms = step_timeout_ms
+        self.step_index = 0
+        self.step_deadline_ms = 0
+
+    def press(self, buttons: int, now_ms: int) -> bool:
+        """
+            moves the code on, call when a button has gone down
+        :param buttons: the buttons held
+        :param now_ms:
+        :return True when the last chord of the code is matched:
+        """
+        if self.step_index and now_ms > self.step_deadline_ms:
+            self.step_index = 0
+        if buttons & ~self.steps[self.step_index]:
+            # a button that is not part of the chord, start the code again
+            self.step_index = 0
+        if buttons != self.steps[self.step_index]:
+            # not wrong yet, the rest of the chord may still be on its way
+            return False
+        self.step_index += 1
+        self.step_deadline_ms = now_ms + self.step_timeout_ms
+        if self.step_index < len(self.steps):
+            return False
+        self.step_index = 0
+        return True
 
 ##################################################################################
 # Main program
@@ -381,17 +739,20 @@ remote: "MockRemote"
 def setup_hub():
     global hub
 
+    hub_options = {}
+    if ODV_FLEET_CHANNEL is not None:
+        hub_options = {'broadcast_channel': ODV_FLEET_CHANNEL, 'observe_channels': ODV_FLEET_PEER_CHANNELS}
     try:
         # this import will fail if the city hub is not connected.
         from pybricks.hubs import CityHub
-        hub = CityHub()
+        hub = CityHub(**hub_options)
         print('Lego City Hub found')
         return False
     except ImportError as ex1:
         print(ex1)
         try:
             from pybricks.hubs import TechnicHub
-            hub = TechnicHub()
+            hub = TechnicHub(**hub_options)
             print('Lego Technic Hub found')
             return True
 
@@ -400,33 +761,67 @@ def setup_hub():
             raise Exception('This program only support Lego City hub and Lego Technic hub')
 
 
-LED_FLASHING_SEQUENCE = [75] * 5 + [1000]
+class BootTimeline:
+    """
+    When each part of start up began and ended, printed once the hub is ready to show what holds up the boot
+    """
 
+    def __init__(self):
+        self.stopwatch = StopWatch()
+        self.phases = []
+
+    def start(self, name: str):
+        self.phases.append([name, self.stopwatch.time(), -1])
+
+    def end(self, name: str):
+        for phase in self.phases:
+            if phase[0] == name:
+                phase[2] = self.stopwatch.time()
+
+    def print_timeline(self):
+        print('--boot timeline ms')
+        for name, start, end in self.phases:
+            print('  {:<10}{:>6} -{:>6}{:>7}'.format(name, start, end, end - start))
 
-def setup_remote(error_flash_code_helper, retry=5):
-    global hub
-    global remote
 
+# boot gives up looking for the remote after this many scans, input_task carries on looking with full scans
+_BOOT_REMOTE_SCANS: int = const(5)
+_READY_TIMEOUT_MS: int = const(500)
+
+
+async def connect_remote(boot_timeline: BootTimeline):
+    """looks for the remote in short scans, the motors start up in between"""
+    global hub
+    boot_timeline.start('remote')
     # Flashing led while waiting connection
     hub.light.blink(Color.WHITE, LED_FLASHING_SEQUENCE)
+    for remote_retry_count in range(1, _BOOT_REMOTE_SCANS + 1):
+        print("--looking for remote try " + str(remote_retry_count))
+        if remote_input.connect():
+            break
+        await wait(0)
+    else:
+        # carry on without it, input_task keeps looking
+        remote_input.lose()
+    boot_timeline.end('remote')
 
-    # try to connect to remote multiple times
-    remote_retry_count = 1
 
-    while True:
-        # noinspection PyBroadException
-        try:
-            print("--looking for remote try " + str(remote_retry_count))
-            # Connect to the remote
-            remote = Remote()
-            print("--remote connected.")
-            break
-        except:
-            if remote_retry_count >= retry:
-                error_flash_code_helper.set_error_no_remote()
-                raise  # ignore first 20 errors
-        remote_retry_count += 1
-        wait(50)
+async def start_up_motors(drive_motors: MotorHelper, boot_timeline: BootTimeline):
+    """the vehicle's calibration"""
+    boot_timeline.start('calibrate')
+    await drive_motors.start_up()
+    boot_timeline.end('calibrate')
+
+
+async def wait_until_ready(boot_timeline: BootTimeline):
+    """waits for the hub's motion sensor to settle, a City hub has none"""
+    global hub
+    boot_timeline.start('ready')
+    imu = getattr(hub, 'imu', None)
+    stopwatch = StopWatch()
+    while imu is not None and not imu.ready() and stopwatch.time() < _READY_TIMEOUT_MS:
+        await wait(10)
+    boot_timeline.end('ready')
 
 
 ##################################################################################
@@ -451,10 +846,62 @@ OK_MOVES = [TRACK, LOAD, UNLOAD]
 _FINE_GRID_SIZE = const(10)
 _ODV_SIZE = const(8)
 
-_GEAR_RATIO_TO_GRID: int = const(80)  # Motor rotation angle per grid pitch (deg/pitch)
+# fine grid move offsets, indexed by direction
+_DIRECTION_DX = (-1, 0, 1, 1, 1, 0, -1, -1)
+_DIRECTION_DY = (-1, -1, -1, 0, 1, 1, 1, 0)
+
+# grid tiles, 2 bits each, the home tile is stored as a track tile
+_TILE_WALL = const(0)
+_TILE_TRACK = const(1)
+_TILE_LOAD = const(2)
+_TILE_UNLOAD = const(3)
+
+# fine grid collision cells, 2 bits each
+_CELL_BLOCKED = const(0)
+_CELL_FREE = const(1)
+_CELL_LOAD = const(2)
+_CELL_UNLOAD = const(3)
+
 _MAX_MOTOR_ROT_SPEED: int = const(1400)  # Max motor speed (deg/s) ~1500
 _HOMING_MOTOR_ROT_SPEED: int = const(200)  # Homing speed (deg/s)
 _HOMING_DUTY: int = const(45)  # Homing motor duty (%) (adjustment required)
+_HOMING_POLL_MS: int = const(10)  # stall and settle polling interval
+_SETTLE_SPEED: int = const(20)  # deg/s, an axis slower than this is settled
+_SETTLE_COUNT: int = const(3)  # polls in a row both axes must be settled for
+_TARGET_TOLERANCE: int = const(10)  # deg, a move ending further than this from its target counts as drift
+_ODV_CALIBRATION_LAYOUT = '<HHhh'  # gear_ratio_to_grid x, y then the home stops' absolute angles x, y
+
+# auto-drive route steps
+_STEP_TILE = const(0)  # drive to a tile
+_STEP_LOAD = const(1)  # drive the x axis to an angle, into the load station, until the cart is loaded
+_STEP_UNLOAD = const(2)  # drive the x axis to an angle, into the unload station, until the cart is empty
+_STEP_SET_LOAD = const(3)  # set has_load, 1 = loaded
+_STEP_SEGMENT = const(4)  # plan the tiles between two cluster entrances, see _cluster_path_to_grid_tile
+_STEP_FLEET_LEG = const(5)  # plan a path to a tile around the other ODVs' reservations, see ODVFleet
+_STEP_WAIT_UNTIL = const(6)  # wait until a route_stopwatch time, keeps a fleet leg on its schedule
+
+_TRANSFER_SENSED_MS: int = const(200)  # time the sensor must read full/empty for, falling balls pass through it
+_TRANSFER_TIMEOUT_MS: int = const(2000)  # longest time to reach a station, the transfer is given up after it
+_UNREACHABLE = const(255)  # distance field value for tiles that cannot reach the station
+
+# path planning, see _lowest_cost_path_to_grid_tile
+_PLAN_COST_UNIT_MS = const(10)  # costs are held in 16 bits in units of this
+_PLAN_NOT_REACHED = const(255)  # came from value of a state not reached yet
+_PLAN_FROM_START = const(4)  # came from value of a state entered from the start tile
+_CLUSTER_SIZE = const(8)  # grids wider or taller than this are planned cluster by cluster
+_CLUSTER_PATH_CACHE = const(8)  # abstract paths kept for reuse, auto-drive repeats the same legs
+_RESUME_MARGIN = const(2)  # tiles around the cart and the waypoint searched when resuming a route
+
+# ODV fleet, see ODVFleet
+_FLEET_WAIT_STEPS = const(24)  # most tile steps a fleet leg can spend waiting for other ODVs
+_FLEET_TIME_UNIT_MS = const(100)  # broadcast reservation times are 1 byte in units of this
+_FLEET_FOREVER = const(255)  # broadcast reservation end of a tile held until the ODV plans again
+_FLEET_FOREVER_MS = const(1 << 30)
+_FLEET_PAGE_ENTRIES = const(5)  # reservations per broadcast, 3 + 5 * 4 bytes fits a broadcast
+_FLEET_BROADCAST_MS = const(100)  # time between broadcasts
+_FLEET_PEER_TIMEOUT_MS = const(5000)  # forget the reservations of an ODV not heard from for this long
+_FLEET_RETRY_MS = const(500)  # time between attempts to plan a blocked fleet leg
+_FLEET_YIELD_MS = const(2000)  # time a fleet leg can stay blocked before the cart leaves the station it waits in
 
 
 def position_from_direction(position: tuple[int, int], direction: int) -> tuple[int, int]:
@@ -478,72 +925,252 @@ def position_from_direction(position: tuple[int, int], direction: int) -> tuple[
     return position[0], position[1]
 
 
-class ODVBox:
-    def __init__(self, top_left: tuple[int, int], width: int, height: int):
-        self.width = 0
-        self.height = 0
-        self.top_left: tuple[int, int]
-        self.top_right: tuple[int, int]
-        self.bottom_right: tuple[int, int]
-        self.bottom_left: tuple[int, int]
-        self.upper_left: tuple[int, int]
-        self._update_dimensions_(top_left, width, height)
-
-    def _update_dimensions_(self, top_left: tuple[int, int], width: int, height: int):
-        self.width = width
-        self.height = height
-        self.top_left = top_left
-        self.top_right = (self.top_left[0] + self.width, self.top_left[1])
-        self.bottom_right = (self.top_right[0], self.top_left[1] + self.height)
-        self.bottom_left = (self.top_left[0], self.bottom_right[1])
-
-    def buffer(self, buffer: int):
-        new_tl = (self.top_left[0] - buffer, self.top_left[1] - buffer)
-        self._update_dimensions_(new_tl, self.width + (buffer * 2), self.height + (buffer * 2))
-
-    def __str__(self):
-        return f"[{self.top_left}, {self.top_right}]\n[{self.bottom_left}, {self.bottom_right}]"
+def collapse_tile_path(path: list[tuple[tuple[int, int], int]]) -> list[tuple[tuple[int, int], int]]:
+    """
+    Merge consecutive tiles travelled in the same direction so only corners are targeted
+    :param path: list of (tile, direction) as returned by the path planner
+    :return: the start tile, each tile where the direction changes and the end tile
+    """
+    if len(path) < 3:
+        return path
+    waypoints = [path[0]]
+    for i in range(1, len(path) - 1):
+        if path[i + 1][1] != path[i][1]:
+            waypoints.append(path[i])
+    waypoints.append(path[-1])
+    return waypoints
 
 
 class Queue:
     """ No Queue in micropython :("""
 
     def __init__(self) -> None:
-        self._queue: list[list[tuple[tuple[int, int], int]]] = []
+        self._queue: list = []
 
-    def put(self, item: list[tuple[tuple[int, int], int]]):
+    def put(self, item):
         self._queue.append(item)
 
     def empty(self):
         return len(self._queue) == 0
 
-    def get(self) -> list[tuple[tuple[int, int], int]]:
+    def get(self):
         first = self._queue[0]
         del self._queue[0]
         return first
 
 
+class ODVFleet:
+    """
+    Tile reservations shared between the ODVs on one grid over BLE broadcast/observe, each hub broadcasts
+    on its own channel and observes the others. A reservation is (tile index, start ms, end ms) on the
+    local stopwatch, times are sent relative to the moment of sending so the hubs need no common clock.
+    Reservations are sent a page at a time, a page being [sequence, page, pages] and up to
+    _FLEET_PAGE_ENTRIES of [tile index high, tile index low, start, end] in _FLEET_TIME_UNIT_MS
+    """
+
+    def __init__(self, channel: int, peer_channels: list[int], stopwatch: StopWatch):
+        self.channel = channel
+        self.peer_channels = peer_channels
+        self.stopwatch = stopwatch
+        self.reservations: list[tuple[int, int, int]] = []
+        self.sequence = 0
+        self.page = 0
+        self.next_broadcast_ms = 0
+        self.peer_reservations = {}
+        """reservations of the other ODVs, from the pages of their latest list received so far"""
+        self.peer_pages = {}
+        """latest reservation list of each other ODV, (sequence, {page: reservations})"""
+        self.peer_heard_ms = {}
+        for peer_channel in peer_channels:
+            self.peer_reservations[peer_channel] = []
+            self.peer_heard_ms[peer_channel] = 0
+
+    def reserve(self, reservations: list[tuple[int, int, int]]):
+        """replace this ODV's reservations, sent from the next broadcast"""
+        self.reservations = reservations
+        self.sequence = (self.sequence + 1) & 0xFF
+        self.page = 0
+        self.next_broadcast_ms = 0
+
+    def is_free(self, tile_index: int, start_ms: int, end_ms: int) -> bool:
+        """no other ODV has reserved the tile for any part of start_ms to end_ms"""
+        for reservations in self.peer_reservations.values():
+            for reservation in reservations:
+                if reservation[0] == tile_index and reservation[1] < end_ms and start_ms < reservation[2]:
+                    return False
+        return True
+
+    def is_held(self, tile_index: int) -> bool:
+        """another ODV stands on the tile, or is on its way to it, and holds it until it plans again"""
+        for reservations in self.peer_reservations.values():
+            for reservation in reservations:
+                if reservation[0] == tile_index and reservation[2] >= _FLEET_FOREVER_MS:
+                    return True
+        return False
+
+    def update(self) -> bool:
+        """
+        Broadcast the next page and read the other ODVs' broadcasts, called every loop
+        :return: True if another ODV's reservations changed
+        """
+        changed = False
+        now = self.stopwatch.time()
+        if now >= self.next_broadcast_ms:
+            self.next_broadcast_ms = now + _FLEET_BROADCAST_MS
+            self._broadcast_page_(now)
+        for peer_channel in self.peer_channels:
+            data = hub.ble.observe(peer_channel)
+            if data is None:
+                if now - self.peer_heard_ms[peer_channel] > _FLEET_PEER_TIMEOUT_MS:
+                    self.peer_reservations[peer_channel] = []
+                continue
+            self.peer_heard_ms[peer_channel] = now
+            changed = self._read_page_(peer_channel, data, now) or changed
+        return changed
+
+    def _broadcast_page_(self, now: int):
+        # past reservations are still sent, with an end of 0, so the pages of a sequence never change
+        pages = max((len(self.reservations) + _FLEET_PAGE_ENTRIES - 1) // _FLEET_PAGE_ENTRIES, 1)
+        self.page = self.page % pages
+        data = bytearray([self.sequence, self.page, pages])
+        for tile_index, start_ms, end_ms in self.reservations[self.page * _FLEET_PAGE_ENTRIES:
+                                                              (self.page + 1) * _FLEET_PAGE_ENTRIES]:
+            start = max(start_ms - now, 0) // _FLEET_TIME_UNIT_MS
+            if end_ms >= _FLEET_FOREVER_MS:
+                end = _FLEET_FOREVER
+            else:
+                # rounded up so the tile is never released early
+                end = (max(end_ms - now, 0) + _FLEET_TIME_UNIT_MS - 1) // _FLEET_TIME_UNIT_MS
+                end = min(end, _FLEET_FOREVER - 1)
+            data += bytes((tile_index >> 8, tile_index & 0xFF, min(start, _FLEET_FOREVER - 1), end))
+        hub.ble.broadcast(bytes(data))
+        self.page += 1
+
+    def _read_page_(self, peer_channel: int, data: bytes, now: int) -> bool:
+        """
+        The pages of a new reservation list replace the old list as they arrive, the nearest reservations
+        are sent first
+        :return: True if the page had not been received before
+        """
+        sequence, page = data[0], data[1]
+        if peer_channel not in self.peer_pages or self.peer_pages[peer_channel][0] != sequence:
+            self.peer_pages[peer_channel] = (sequence, {})
+        received = self.peer_pages[peer_channel][1]
+        is_new = page not in received
+        reservations = []
+        for i in range(3, len(data) - 3, 4):
+            end = _FLEET_FOREVER_MS if data[i + 3] == _FLEET_FOREVER else now + data[i + 3] * _FLEET_TIME_UNIT_MS
+            reservations.append(((data[i] << 8) | data[i + 1], now + data[i + 2] * _FLEET_TIME_UNIT_MS, end))
+        received[page] = reservations
+        self.peer_reservations[peer_channel] = [reservation for page_reservations in received.values()
+                                                for reservation in page_reservations]
+        return is_new
+
+    def must_give_way(self) -> bool:
+        """
+        A reservation of this ODV, still to come, clashes with one of an ODV on a lower channel, or with a
+        tile another ODV holds until it plans again
+        """
+        now = self.stopwatch.time()
+        for tile_index, start_ms, end_ms in self.reservations:
+            if end_ms <= now:
+                continue
+            for peer_channel, reservations in self.peer_reservations.items():
+                for reservation in reservations:
+                    if reservation[0] == tile_index and reservation[1] < end_ms and start_ms < reservation[2]:
+                        if peer_channel < self.channel or reservation[2] >= _FLEET_FOREVER_MS:
+                            return True
+        return False
+
+
 class RunODVMotors(MotorHelper):
     """
         Handles driving a skid steer model and reverses control when it flips over
     """
 
-    def __init__(self, error_flash_code_helper: ErrorFlashCodes, drive_speed: int, grid_layout: list[str]):
+    def __init__(self, error_flash_code_helper: ErrorFlashCodes, drive_speed: int, grid_layout: list[str],
+                 tile_cost_ms: int = 0, turn_cost_ms: int = 0, transfer_dwell_ms: int = 2000,
+                 transfer_sensor_port=None, transfer_sensor_full_distance: int = 40, fleet_channel: int = None,
+                 fleet_peer_channels: list[int] = None, gear_ratio_to_grid: tuple[int, int] = (80, 80),
+                 calibrate: bool = False, axis_travel_pitches: tuple[int, int] = (0, 0)):
 
         super().__init__(False, True)
         # grid setup
         self.motors_running = None
+        self.jog_direction = None
+        self.jog_braking = False
         self.home_tile: tuple[int, int] = (0, 0)
         self.unload_tile: tuple[int, int] = (0, 0)
         self.load_tile: tuple[int, int] = (0, 0)
+        """the station last picked by the scheduler, see _pick_station_"""
+        self.unload_tiles: list[tuple[int, int]] = []
+        self.load_tiles: list[tuple[int, int]] = []
+        self.station_distances = {}
+        """tiles to drive from each grid tile to a station, see _build_station_distances_"""
+        self.cluster_columns = 0
+        self.cluster_rows = 0
+        self.cluster_nodes: list[int] = []
+        """tile index of each cluster entrance, see _build_clusters_"""
+        self.cluster_node_edges: list[list[int]] = []
+        """for each entrance, pairs of entrance number and tiles to drive to it"""
+        self.cluster_members: list[list[int]] = []
+        """entrance numbers in each cluster"""
+        self.cluster_paths = {}
         self.last_fine_grid_position: tuple[int, int] = (0, 0)
         """current position"""
-        self.grid_tracks = []
         self.coarse_grid_width = 0
         self.coarse_grid_height = 0
+        self.tile_bits = bytearray(0)
+        """grid tiles, 2 bits per tile, see _get_tile_bits_"""
+        self.cell_grid_width = 0
+        self.cell_grid_height = 0
+        self.cell_bits = bytearray(0)
+        """where the cart can be, see _build_cell_bits_"""
         self._load_grid_(grid_layout)
 
         self.has_load = False
+        # auto-drive route, see advance_route
+        self.route_steps: list[tuple] = []
+        self.route_step_index = 0
+        self.route_step_started = False
+        self.route_step_end_ms = 0
+        self.route_step_arrived_ms = -1
+        self.transfer_sensed_ms = -1
+        self.transfer_timed_out = False
+        """the last load/unload never reached its station, _STEP_SET_LOAD leaves has_load as it was"""
+        self.route_end_tile: tuple[int, int] = self.home_tile
+        self.route_stopwatch = StopWatch()
+        self.route_step_target: tuple[int, int] = (0, 0)
+        self.route_checkpoint: list[tuple] = []
+        """steps left when the user took over, kept until resume_route or a new route replaces them"""
+        # other ODVs on the grid, see ODVFleet
+        self.fleet = None
+        if fleet_channel is not None:
+            self.fleet = ODVFleet(fleet_channel, fleet_peer_channels or [], self.route_stopwatch)
+            print(f"--fleet channel {fleet_channel}, other ODVs {fleet_peer_channels}")
+        self.fleet_leg_start_ms = 0
+        self.fleet_leg_end_index = -1
+        """route step index of the last step of the fleet leg being driven"""
+        self.fleet_leg_end_tile: tuple[int, int] = (0, 0)
+        self.fleet_retry_ms = 0
+        self.fleet_blocked_ms = -1
+        """route_stopwatch time the fleet leg at route_step_index was first blocked, -1 if it isn't"""
+        self.fleet_parked = False
+        # position confidence, see reset_homing
+        self.axis_homed = [False, False]
+        self.axis_drift = [0, 0]
+        self.homing_in_progress = False
+        # motor degrees per grid pitch on each axis, see calibrate
+        self.gear_ratio_to_grid = [gear_ratio_to_grid[0], gear_ratio_to_grid[1]]
+        self.calibrate_pending = calibrate
+        # the saved calibration, checked against the first homing's stops, see _check_calibration_
+        self.saved_calibration = None
+        self.calibration_measured = False
+        # homing puts the cart against the near stops at the home tile, the far stops are where the cart,
+        # _ODV_SIZE pitches across, reaches the far edges of the grid
+        self.axis_travel_pitches = [
+            axis_travel_pitches[0] or (self.coarse_grid_width - self.home_tile[0]) * _FINE_GRID_SIZE - _ODV_SIZE,
+            axis_travel_pitches[1] or (self.coarse_grid_height - self.home_tile[1]) * _FINE_GRID_SIZE - _ODV_SIZE]
         # motor setup
         self.error_flash_code = error_flash_code_helper
 
@@ -553,158 +1180,651 @@ class RunODVMotors(MotorHelper):
         self.drive_speed = drive_speed
 
         try:
-            self.motor_x = Motor(self.motor_x_port, Direction.COUNTERCLOCKWISE)
+            self.motor_x = Actuator(Motor(self.motor_x_port, Direction.COUNTERCLOCKWISE))
         except OSError as ex:
             if ex.errno == ENODEV:
                 print('Motor needs to be connected to ' + str(self.motor_x_port))
                 self.error_flash_code.set_error_no_motor_on_a()
             raise
         try:
-            self.motor_y = Motor(self.motor_y_port, Direction.CLOCKWISE)
+            self.motor_y = Actuator(Motor(self.motor_y_port, Direction.CLOCKWISE))
         except OSError as ex:
             if ex.errno == ENODEV:
                 print('Motor needs to be connected to ' + str(self.motor_y_port))
                 self.error_flash_code.set_error_no_motor_on_b()
             raise
 
+        # load/unload transfer
+        self.transfer_dwell_ms = transfer_dwell_ms
+        self.transfer_sensor_full_distance = transfer_sensor_full_distance
+        self.transfer_sensor = None
+        if transfer_sensor_port is not None:
+            try:
+                self.transfer_sensor = ColorDistanceSensor(transfer_sensor_port)
+                print('Found transfer sensor on ' + str(transfer_sensor_port))
+            except OSError as ex:
+                if ex.errno != ENODEV:
+                    raise
+                print('No transfer sensor on ' + str(transfer_sensor_port) + ', staying ' + str(transfer_dwell_ms) + 'ms')
+
+        self.acceleration = self.motor_x.control.limits()[1]
+        # route costs for the path planner
+        self.tile_cost_setting_ms = tile_cost_ms
+        if turn_cost_ms > 0:
+            self.turn_cost_ms = turn_cost_ms
+        else:
+            # stopping and restarting loses speed/acceleration seconds against driving straight through
+            self.turn_cost_ms = _MAX_MOTOR_ROT_SPEED * 1000 // self.acceleration
+        self.jog_speed = drive_speed * _MAX_MOTOR_ROT_SPEED // 100
+        self._apply_gear_ratio_()
+
         self.stop_motors()
 
+    def _apply_gear_ratio_(self):
+        """work out the settings that depend on gear_ratio_to_grid"""
+        print(f"--gear ratio {self.gear_ratio_to_grid[0]}, {self.gear_ratio_to_grid[1]} deg/pitch")
+        if self.tile_cost_setting_ms > 0:
+            self.tile_cost_ms = self.tile_cost_setting_ms
+        else:
+            self.tile_cost_ms = _FINE_GRID_SIZE * max(self.gear_ratio_to_grid) * 1000 // _MAX_MOTOR_ROT_SPEED
+        print(f"--route cost tile {self.tile_cost_ms}ms, turn {self.turn_cost_ms}ms")
+        # fleet legs are planned in steps of one tile, from a stop to a stop
+        self.fleet_step_ms = self.tile_cost_ms + self.turn_cost_ms
+        # manual jogging, brake when the fine grid ahead is clear for less than the stopping distance
+        # +2 for rounding and the fine position read lagging by a loop tick
+        self.jog_brake_steps = ((self.jog_speed * self.jog_speed // (2 * self.acceleration))
+                                // min(self.gear_ratio_to_grid) + 2)
+
     def _load_grid_(self, lines: list[str]):
-        # loop through grid lines
-        y = 0
         print('Loading grid')
         mem_info()
+        self.coarse_grid_height = len(lines)
+        for line in lines:
+            self.coarse_grid_width = max(self.coarse_grid_width, len(line.rstrip()))
+        self.tile_bits = bytearray((self.coarse_grid_width * self.coarse_grid_height + 3) // 4)
+        # loop through grid lines
         for y, line in enumerate(lines):
             print(f"line {y + 1}/{len(lines)}")
-            self.coarse_grid_width = const(len(line.rstrip()))
-            line = line.rstrip()
-            for x, character in enumerate(line):
-                print(f"line {y + 1} |col {x + 1}/{len(line)}|{character}")
-
-                if character in OK_MOVES:
-                    self.grid_tracks.append((x, y))
+            for x, character in enumerate(line.rstrip()):
+                if character == TRACK or character == HOME:
+                    self._set_tile_bits_(x, y, _TILE_TRACK)
                 # set load/unload points
                 if character == HOME:
-                    # print('----home_tile----')
-                    # mem_info()
-                    self.home_tile = const((x, y))  # mem_info()  # print('----home_tile----')
+                    self.home_tile = (x, y)
                 if character == LOAD:
-                    # print('----load_tile----')
-                    # mem_info()
-                    self.load_tile = const((x, y))  # mem_info()  # print('----load_tile----')
+                    self._set_tile_bits_(x, y, _TILE_LOAD)
+                    self.load_tiles.append((x, y))
                 if character == UNLOAD:
-                    # print('----unload_tile----')
-                    # mem_info()
-                    self.unload_tile = const((x, y))  # mem_info()  # print('----unload_tile----')
-
-            y += 1
-        self.coarse_grid_height = const(y)
+                    self._set_tile_bits_(x, y, _TILE_UNLOAD)
+                    self.unload_tiles.append((x, y))
         mem_info()
         print('Grid Loaded')
+        if self.load_tiles:
+            self.load_tile = self.load_tiles[0]
+        if self.unload_tiles:
+            self.unload_tile = self.unload_tiles[0]
         print(f"--home tile is {self.home_tile}")
-        print(f"--loads tile is {self.load_tile}")
-        print(f"--unload tile is {self.unload_tile}")
+        print(f"--load tiles are {self.load_tiles}")
+        print(f"--unload tiles are {self.unload_tiles}")
+        self._build_cell_bits_()
+        self._build_station_distances_()
+        self._build_clusters_()
         self._display_grid_()
 
+    def _tile_index_(self, x: int, y: int) -> int:
+        return y * self.coarse_grid_width + x
+
+    def _index_to_tile_(self, index: int) -> tuple[int, int]:
+        return index % self.coarse_grid_width, index // self.coarse_grid_width
+
+    def _set_tile_bits_(self, x: int, y: int, tile: int):
+        index = self._tile_index_(x, y)
+        shift = (index & 3) << 1
+        self.tile_bits[index >> 2] = (self.tile_bits[index >> 2] & ~(3 << shift)) | (tile << shift)
+
+    def _get_tile_bits_(self, x: int, y: int) -> int:
+        """
+        2 bit tile code, tiles off the grid are walls
+        :return: _TILE_WALL, _TILE_TRACK, _TILE_LOAD or _TILE_UNLOAD
+        """
+        if x < 0 or y < 0 or x >= self.coarse_grid_width or y >= self.coarse_grid_height:
+            return _TILE_WALL
+        index = self._tile_index_(x, y)
+        return (self.tile_bits[index >> 2] >> ((index & 3) << 1)) & 3
+
+    def _is_tile_open_(self, tile: tuple[int, int]) -> bool:
+        """the cart can drive onto the tile"""
+        return self._get_tile_bits_(tile[0], tile[1]) != _TILE_WALL
+
+    def _get_tile_type_(self, x: int, y: int) -> str:
+        tile = self._get_tile_bits_(x, y)
+        if tile == _TILE_TRACK:
+            return HOME if (x, y) == self.home_tile else TRACK
+        if tile == _TILE_LOAD:
+            return LOAD
+        if tile == _TILE_UNLOAD:
+            return UNLOAD
+        return WALL
+
+    def _build_station_distances_(self):
+        """
+        Precompute a distance field for each load/unload station, one byte per grid tile holding the number
+        of tiles to drive to the station, so the scheduler can compare stations without path planning
+        """
+        grid_window = (0, 0, self.coarse_grid_width, self.coarse_grid_height)
+        for station in self.load_tiles + self.unload_tiles:
+            self.station_distances[station] = self._distance_field_(station, grid_window)
+
+    def _distance_field_(self, start_tile: tuple[int, int], window: tuple[int, int, int, int]) -> bytearray:
+        """
+        Tiles to drive from start_tile to each tile of a window of the grid, without leaving the window
+        :param start_tile:
+        :param window: left, top, width, height in tiles
+        :return: one byte per window tile, row by row, _UNREACHABLE where it cannot be reached
+        """
+        left, top, width, height = window
+        distances = bytearray(bytes((_UNREACHABLE,)) * (width * height))
+        distances[(start_tile[1] - top) * width + start_tile[0] - left] = 0
+        queue: Queue = Queue()
+        queue.put((start_tile[1] - top) * width + start_tile[0] - left)
+        while not queue.empty():
+            window_index = queue.get()
+            distance = distances[window_index] + 1
+            for direction in [_EAST, _NORTH, _WEST, _SOUTH]:
+                new_pos = position_from_direction((left + window_index % width, top + window_index // width),
+                                                  direction)
+                if not (left <= new_pos[0] < left + width and top <= new_pos[1] < top + height):
+                    continue
+                if not self._is_tile_open_(new_pos):
+                    continue
+                index = (new_pos[1] - top) * width + new_pos[0] - left
+                if distances[index] == _UNREACHABLE:
+                    distances[index] = min(distance, _UNREACHABLE - 1)
+                    queue.put(index)
+        return distances
+
+    def _cluster_window_(self, tile: tuple[int, int]) -> tuple[int, int, int, int]:
+        """left, top, width, height of the cluster holding tile"""
+        left = tile[0] - tile[0] % _CLUSTER_SIZE
+        top = tile[1] - tile[1] % _CLUSTER_SIZE
+        return (left, top, min(_CLUSTER_SIZE, self.coarse_grid_width - left),
+                min(_CLUSTER_SIZE, self.coarse_grid_height - top))
+
+    def _cluster_of_(self, tile: tuple[int, int]) -> int:
+        return (tile[1] // _CLUSTER_SIZE) * self.cluster_columns + tile[0] // _CLUSTER_SIZE
+
+    def _add_cluster_node_(self, tile: tuple[int, int]) -> int:
+        tile_index = self._tile_index_(tile[0], tile[1])
+        if tile_index in self.cluster_nodes:
+            return self.cluster_nodes.index(tile_index)
+        self.cluster_nodes.append(tile_index)
+        self.cluster_node_edges.append([])
+        self.cluster_members[self._cluster_of_(tile)].append(len(self.cluster_nodes) - 1)
+        return len(self.cluster_nodes) - 1
+
+    def _add_cluster_entrance_(self, tile: tuple[int, int], other_tile: tuple[int, int]):
+        """an entrance is a pair of open tiles either side of a cluster border, one tile apart"""
+        node = self._add_cluster_node_(tile)
+        other_node = self._add_cluster_node_(other_tile)
+        self.cluster_node_edges[node] += [other_node, 1]
+        self.cluster_node_edges[other_node] += [node, 1]
+
+    def _add_border_entrances_(self, tile_pairs: list[tuple[tuple[int, int], tuple[int, int]]]):
+        """an entrance in the middle of each run of open tile pairs along a cluster border"""
+        run = []
+        for tile_pair in tile_pairs + [None]:
+            if tile_pair is not None and self._is_tile_open_(tile_pair[0]) and self._is_tile_open_(tile_pair[1]):
+                run.append(tile_pair)
+            elif len(run) > 0:
+                self._add_cluster_entrance_(run[len(run) // 2][0], run[len(run) // 2][1])
+                run = []
+
+    def _build_clusters_(self):
+        """
+        Split a big grid into _CLUSTER_SIZE square clusters. Each run of open tiles along a cluster border
+        gets an entrance in its middle, and the tiles to drive between the entrances of a cluster are
+        precomputed, so a route is planned over entrances and only the part inside one cluster is
+        planned tile by tile, see _cluster_path_to_grid_tile
+        """
+        if self.coarse_grid_width <= _CLUSTER_SIZE and self.coarse_grid_height <= _CLUSTER_SIZE:
+            return
+        self.cluster_columns = (self.coarse_grid_width + _CLUSTER_SIZE - 1) // _CLUSTER_SIZE
+        self.cluster_rows = (self.coarse_grid_height + _CLUSTER_SIZE - 1) // _CLUSTER_SIZE
+        self.cluster_members = [[] for _ in range(self.cluster_columns * self.cluster_rows)]
+        # entrances on vertical borders, then horizontal ones, a border per cluster
+        for border_x in range(_CLUSTER_SIZE, self.coarse_grid_width, _CLUSTER_SIZE):
+            for top in range(0, self.coarse_grid_height, _CLUSTER_SIZE):
+                self._add_border_entrances_([((border_x - 1, y), (border_x, y))
+                                             for y in range(top, min(top + _CLUSTER_SIZE, self.coarse_grid_height))])
+        for border_y in range(_CLUSTER_SIZE, self.coarse_grid_height, _CLUSTER_SIZE):
+            for left in range(0, self.coarse_grid_width, _CLUSTER_SIZE):
+                self._add_border_entrances_([((x, border_y - 1), (x, border_y))
+                                             for x in range(left, min(left + _CLUSTER_SIZE, self.coarse_grid_width))])
+        # tiles to drive between the entrances of each cluster
+        for members in self.cluster_members:
+            for node in members:
+                tile = self._index_to_tile_(self.cluster_nodes[node])
+                window = self._cluster_window_(tile)
+                distances = self._distance_field_(tile, window)
+                for other_node in members:
+                    other_tile = self._index_to_tile_(self.cluster_nodes[other_node])
+                    distance = distances[(other_tile[1] - window[1]) * window[2] + other_tile[0] - window[0]]
+                    if other_node != node and distance != _UNREACHABLE:
+                        self.cluster_node_edges[node] += [other_node, distance]
+        print(f"--{len(self.cluster_members)} clusters, {len(self.cluster_nodes)} entrances")
+
+    def _cluster_path_to_grid_tile(self, start_tile: tuple[int, int], end_tile: tuple[int, int]) -> list[
+        tuple[int, int]]:
+        """
+        Plan over the cluster entrances rather than every tile. The start and end tiles are joined to the
+        entrances of their clusters, then a Dijkstra search over the precomputed entrance distances gives
+        the entrances to drive through. The tiles between them are planned when the route gets there, see
+        _STEP_SEGMENT
+        :param start_tile:
+        :param end_tile:
+        :return: start tile, entrances, end tile, or an empty list if there is no path
+        """
+        key = (self._tile_index_(start_tile[0], start_tile[1]), self._tile_index_(end_tile[0], end_tile[1]))
+        if key in self.cluster_paths:
+            return self.cluster_paths[key]
+        print("---cluster_path_to_grid_tile---")
+        self.print_tile_pos("--start", start_tile)
+        self.print_tile_pos("--end", end_tile)
+        start_node = len(self.cluster_nodes)
+        end_node = start_node + 1
+        # join the end tile to the entrances of its cluster
+        end_window = self._cluster_window_(end_tile)
+        end_distances = self._distance_field_(end_tile, end_window)
+        to_end = {}
+        for node in self.cluster_members[self._cluster_of_(end_tile)]:
+            tile = self._index_to_tile_(self.cluster_nodes[node])
+            distance = end_distances[(tile[1] - end_window[1]) * end_window[2] + tile[0] - end_window[0]]
+            if distance != _UNREACHABLE:
+                to_end[node] = distance
+        # and the start tile to the entrances of its cluster, or straight to the end tile
+        start_window = self._cluster_window_(start_tile)
+        start_distances = self._distance_field_(start_tile, start_window)
+        start_edges = []
+        for node in self.cluster_members[self._cluster_of_(start_tile)]:
+            tile = self._index_to_tile_(self.cluster_nodes[node])
+            distance = start_distances[(tile[1] - start_window[1]) * start_window[2] + tile[0] - start_window[0]]
+            if distance != _UNREACHABLE:
+                start_edges += [node, distance]
+        if start_window == end_window:
+            distance = start_distances[
+                (end_tile[1] - start_window[1]) * start_window[2] + end_tile[0] - start_window[0]]
+            if distance != _UNREACHABLE:
+                start_edges += [end_node, distance]
+
+        # 2 bytes per entrance for the cost and the entrance it was reached from, 0xFFFF = not reached
+        costs = bytearray((end_node + 1) * 2)
+        came_from = bytearray(bytes((0xFF,)) * ((end_node + 1) * 2))
+        came_from[start_node * 2] = 0xFE
+        open_nodes = [start_node]
+        found = False
+        while open_nodes:
+            # take the cheapest open entrance, there are few enough not to need a heap
+            best = 0
+            best_cost = costs[open_nodes[0] * 2] | (costs[open_nodes[0] * 2 + 1] << 8)
+            for i in range(1, len(open_nodes)):
+                cost = costs[open_nodes[i] * 2] | (costs[open_nodes[i] * 2 + 1] << 8)
+                if cost < best_cost:
+                    best = i
+                    best_cost = cost
+            node = open_nodes.pop(best)
+            if node == end_node:
+                found = True
+                break
+            edges = start_edges if node == start_node else self.cluster_node_edges[node]
+            for i in range(0, len(edges) + 2, 2):
+                if i < len(edges):
+                    next_node, cost = edges[i], best_cost + edges[i + 1]
+                elif node in to_end:
+                    next_node, cost = end_node, best_cost + to_end[node]
+                else:
+                    break
+                reached = came_from[next_node * 2] != 0xFF or came_from[next_node * 2 + 1] != 0xFF
+                if reached and cost >= costs[next_node * 2] | (costs[next_node * 2 + 1] << 8):
+                    continue
+                if not reached:
+                    open_nodes.append(next_node)
+                costs[next_node * 2] = cost & 0xFF
+                costs[next_node * 2 + 1] = cost >> 8
+                came_from[next_node * 2] = node & 0xFF
+                came_from[next_node * 2 + 1] = node >> 8
+
+        waypoints = []
+        node = end_node if found else -1
+        while node >= 0:
+            if node == end_node:
+                waypoints.insert(0, end_tile)
+            elif node == start_node:
+                waypoints.insert(0, start_tile)
+                break
+            else:
+                waypoints.insert(0, self._index_to_tile_(self.cluster_nodes[node]))
+            node = came_from[node * 2] | (came_from[node * 2 + 1] << 8)
+        if len(waypoints) == 0:
+            print("no path found")
+        else:
+            print(f"--{costs[end_node * 2] | (costs[end_node * 2 + 1] << 8)} tiles")
+        print(waypoints)
+        print("---cluster_path_to_grid_tile---")
+        if len(self.cluster_paths) >= _CLUSTER_PATH_CACHE:
+            self.cluster_paths = {}
+        self.cluster_paths[key] = waypoints
+        return waypoints
+
+    def _refine_segment_(self, start_tile: tuple[int, int], end_tile: tuple[int, int]) -> list[
+        tuple[tuple[int, int], int]]:
+        """the tile path between two waypoints of a cluster path, inside the clusters they are in"""
+        start_window = self._cluster_window_(start_tile)
+        end_window = self._cluster_window_(end_tile)
+        left = min(start_window[0], end_window[0])
+        top = min(start_window[1], end_window[1])
+        window = (left, top, max(start_window[0] + start_window[2], end_window[0] + end_window[2]) - left,
+                  max(start_window[1] + start_window[3], end_window[1] + end_window[3]) - top)
+        return self._lowest_cost_path_to_grid_tile(start_tile, end_tile, window)
+
+    def _station_distance_(self, tile: tuple[int, int], station: tuple[int, int]) -> int:
+        return self.station_distances[station][self._tile_index_(tile[0], tile[1])]
+
+    def _pick_station_(self, start_tile: tuple[int, int], stations: list[tuple[int, int]],
+                       next_stations: list[tuple[int, int]]) -> tuple[int, int] | None:
+        """
+        Pick the station that keeps the cycle shortest, the drive to the station plus the drive from it
+        to the nearest station of the other kind
+        :param start_tile: where the cart will set off from
+        :param stations: the load or unload tiles to pick from
+        :param next_stations: the stations the cart visits after this one
+        :return: the station or None if none can be reached
+        """
+        best = None
+        best_distance = _UNREACHABLE * 2
+        if self.fleet is not None:
+            # leave stations to the other ODVs standing in them or on their way, a cart can't wait for a
+            # station another cart is waiting to swap with
+            free_stations = [station for station in stations
+                             if not self.fleet.is_held(self._tile_index_(station[0], station[1]))]
+            if len(free_stations) > 0:
+                stations = free_stations
+        for station in stations:
+            distance = self._station_distance_(start_tile, station)
+            if distance == _UNREACHABLE:
+                continue
+            next_distance = _UNREACHABLE
+            for next_station in next_stations:
+                next_distance = min(next_distance, self._station_distance_(station, next_station))
+            if distance + next_distance < best_distance:
+                best = station
+                best_distance = distance + next_distance
+        return best
+
+    def _build_cell_bits_(self):
+        """
+        Precompute where the cart can be on the fine grid.
+        The cart (shrunk by 1 to make moving smoother) covers either one tile or two neighbouring tiles on
+        each axis, so fine positions are grouped into cells, 2 cells per tile on each axis, with a 2 bit
+        code per cell: _CELL_BLOCKED, _CELL_FREE, _CELL_LOAD or _CELL_UNLOAD
+        """
+        self.cell_grid_width = self.coarse_grid_width * 2 - 1
+        self.cell_grid_height = self.coarse_grid_height * 2 - 1
+        self.cell_bits = bytearray((self.cell_grid_width * self.cell_grid_height + 3) // 4)
+        for cell_y in range(self.cell_grid_height):
+            for cell_x in range(self.cell_grid_width):
+                # tiles under the cart corners
+                tl = self._get_tile_type_(cell_x // 2, cell_y // 2)
+                tr = self._get_tile_type_((cell_x + 1) // 2, cell_y // 2)
+                br = self._get_tile_type_((cell_x + 1) // 2, (cell_y + 1) // 2)
+                bl = self._get_tile_type_(cell_x // 2, (cell_y + 1) // 2)
+
+                # most tiles support universal movement
+                # TRACK - any direction
+                # LOAD - only on left
+                # UNLOAD - only on right
+                # HOME - can only be moved into from bottom or right
+                can_move = (tl in OK_MOVES and tr in OK_MOVES and br in OK_MOVES and bl in OK_MOVES)
+                # handle home tile only supporting 2 directions
+                if not can_move and HOME in [tl, tr, bl, br]:
+                    # cart in home tile
+                    if tl == tr == br == bl == HOME:
+                        can_move = True
+                    # moving NW into tile
+                    elif tl == HOME and tr == br == bl == TRACK:
+                        can_move = True
+                    # moving N or S
+                    elif tl == tr == HOME and br == bl == TRACK:
+                        can_move = True
+                    # moving E or W
+                    elif tl == bl == HOME and tr == br == TRACK:
+                        can_move = True
+
+                if tl == tr == br == bl == LOAD:
+                    cell = _CELL_LOAD
+                elif tl == tr == br == bl == UNLOAD:
+                    cell = _CELL_UNLOAD
+                elif can_move:
+                    cell = _CELL_FREE
+                else:
+                    continue
+                index = cell_y * self.cell_grid_width + cell_x
+                self.cell_bits[index >> 2] |= cell << ((index & 3) << 1)
+
+    def _get_fine_cell_(self, fine_x: int, fine_y: int) -> int:
+        """
+        Collision cell code for the cart at a fine grid position
+        :return: _CELL_BLOCKED, _CELL_FREE, _CELL_LOAD or _CELL_UNLOAD
+        """
+        if fine_x < 0 or fine_y < 0:
+            return _CELL_BLOCKED
+        # cart corners are 1 and _ODV_SIZE - 1 in from the position
+        cell_x = (fine_x + 1) // _FINE_GRID_SIZE + (fine_x + _ODV_SIZE - 1) // _FINE_GRID_SIZE
+        cell_y = (fine_y + 1) // _FINE_GRID_SIZE + (fine_y + _ODV_SIZE - 1) // _FINE_GRID_SIZE
+        if cell_x >= self.cell_grid_width or cell_y >= self.cell_grid_height:
+            return _CELL_BLOCKED
+        index = cell_y * self.cell_grid_width + cell_x
+        return (self.cell_bits[index >> 2] >> ((index & 3) << 1)) & 3
+
     def _display_grid_(self, position_x_y: tuple = None):
         # Display the maze:
         for y in range(self.coarse_grid_height):
             for x in range(self.coarse_grid_width):
                 if position_x_y is not None and (x, y) == position_x_y:
                     print("R", end='')
-                elif (x, y) == self.home_tile:
-                    print(HOME, end='')
-                elif (x, y) == self.load_tile:
-                    print(LOAD, end='')
-                elif (x, y) == self.unload_tile:
-                    print(UNLOAD, end='')
-                elif (x, y) in self.grid_tracks:
-                    print(TRACK, end='')
                 else:
-                    print(WALL, end='')
+                    print(self._get_tile_type_(x, y), end='')
             print()  # Print a newline after printing the row.
 
     def reset_homing(self) -> None:
+        """
+        End of session, only axes that have drifted more than a pitch are re-homed by the next do_homing
+        """
+        for i in range(2):
+            if self.axis_drift[i] > self.gear_ratio_to_grid[i]:
+                print(f"--axis {i} drifted {self.axis_drift[i]}, re-homing")
+                self.axis_homed[i] = False
         self.reset_is_homed()
 
-    def do_homing(self):
-        # Slowly move until the motor stalls (hits a physical stop),
+    def _add_drift_(self, axis: int, drift: int):
+        """record a position error against an axis"""
+        self.axis_drift[axis] += drift
+        print(f"--axis {axis} drift {self.axis_drift[axis]}")
+
+    def _check_stalls_(self) -> bool:
+        """
+        An axis that stalls while it is being driven has hit something the grid says isn't there,
+        so its position can't be trusted
+        :return: an axis is stalled
+        """
+        stalled = False
+        for i, motor in enumerate((self.motor_x, self.motor_y)):
+            if motor.stalled():
+                stalled = True
+                if self.axis_drift[i] <= self.gear_ratio_to_grid[i]:
+                    self._add_drift_(i, self.gear_ratio_to_grid[i] + 1)
+        return stalled
+
+    def _check_target_error_(self, target_x: int, target_y: int):
+        """compare where the axes were sent to where they ended up"""
+        error = abs(self.motor_x.angle() - target_x)
+        if error > _TARGET_TOLERANCE:
+            self._add_drift_(0, error)
+        error = abs(self.motor_y.angle() - target_y)
+        if error > _TARGET_TOLERANCE:
+            self._add_drift_(1, error)
+
+    async def do_homing(self):
+        # Slowly move the axes that need it until the motors stall (hit a physical stop),
         # then move forward by an offset distance and set that as the zero origin.
+        # the control and auto-drive tasks can both ask for homing, the second waits for the first
+        while self.homing_in_progress:
+            await wait(_HOMING_POLL_MS)
         if self.mh_is_homed:
             return
-        # Homing axis Y
-        self.motor_y.run_until_stalled(-_HOMING_MOTOR_ROT_SPEED, duty_limit=_HOMING_DUTY)
-        wait(200)
+        self.homing_in_progress = True
+        try:
+            await self._home_axes_()
+        finally:
+            self.homing_in_progress = False
+
+    async def _home_axes_(self):
+        if self.calibrate_pending:
+            self.saved_calibration = load_calibration(_CALIBRATION_ODV, _ODV_CALIBRATION_LAYOUT)
+            if self.saved_calibration is None:
+                await self.calibrate()
+            else:
+                print("--using saved calibration")
+                self.calibrate_pending = False
+                self.gear_ratio_to_grid[0], self.gear_ratio_to_grid[1] = self.saved_calibration[:2]
+                self._apply_gear_ratio_()
+        motors = (self.motor_x, self.motor_y)
         home_tile_angle = self._tile_to_angle(self.home_tile)
-        self.motor_y.reset_angle(home_tile_angle[1])
-        self.motor_y.run_angle(_MAX_MOTOR_ROT_SPEED, _GEAR_RATIO_TO_GRID)
-        wait(200)
+        homing = [not self.axis_homed[0], not self.axis_homed[1]]
+        if not (homing[0] or homing[1]):
+            print("--position trusted, homing skipped")
+            self.set_is_homed()
+            return
 
-        # Homing axis X
-        self.motor_x.run_until_stalled(-_HOMING_MOTOR_ROT_SPEED, duty_limit=_HOMING_DUTY)
-        wait(200)
-        self.motor_x.reset_angle(home_tile_angle[0])
-        self.motor_x.run_angle(_MAX_MOTOR_ROT_SPEED, _GEAR_RATIO_TO_GRID)
-        wait(200)
+        await self._run_until_stalled_(homing, -_HOMING_MOTOR_ROT_SPEED)
+        if not await self._check_calibration_(homing):
+            return
+        for i, motor in enumerate(motors):
+            if homing[i]:
+                motor.reset_angle(home_tile_angle[i])
+                motor.run_target(_MAX_MOTOR_ROT_SPEED, home_tile_angle[i] + self.gear_ratio_to_grid[i], wait=False)
+                self.axis_homed[i] = True
+                self.axis_drift[i] = 0
+        while not (self.motor_x.done() and self.motor_y.done()):
+            await wait(_HOMING_POLL_MS)
+        await self._wait_until_settled_()
 
         self.set_is_homed()
         self._display_grid_(self.home_tile)
 
-    def _can_move_in_direction_(self, direction: int) -> tuple[bool, bool, bool]:
-        if direction not in [_NORTH, _NORTH_EAST, _EAST, _SOUTH_EAST, _SOUTH, _SOUTH_WEST, _WEST, _NORTH_WEST]:
-            return False, False, False
-
-        # work out cart dimensions
-        cart = ODVBox(self.last_fine_grid_position, _ODV_SIZE, _ODV_SIZE)
-        # shrink the cart to make moving smoother
-        cart.buffer(-1)
-
-        # print("Cart", cart)
-
-        tl = self._get_grid_tile_type_from_fine_xy_(position_from_direction(cart.top_left, direction), False)
-        tr = self._get_grid_tile_type_from_fine_xy_(position_from_direction(cart.top_right, direction), False)
-        br = self._get_grid_tile_type_from_fine_xy_(position_from_direction(cart.bottom_right, direction), False)
-        bl = self._get_grid_tile_type_from_fine_xy_(position_from_direction(cart.bottom_left, direction), False)
-
-        # most tiles support universal movement
-        # TRACK - any direction
-        # LOAD - only on left
-        # UNLOAD - only on right
-        # HOME - can only be moved into from bottom or right
-
-        can_move = (tl in OK_MOVES and tr in OK_MOVES and br in OK_MOVES and bl in OK_MOVES)
-        # handle home tile only supporting 2 directions
-        if not can_move and HOME in [tl, tr, bl, br]:
-            # cart in home tile
-            if tl == tr == br == bl == HOME:
-                can_move = True
-            # moving NW into tile
-            elif tl == HOME and tr == br == bl == TRACK:
-                can_move = True
-            # moving N or S
-            elif tl == tr == HOME and br == bl == TRACK:
-                can_move = True
-            # moving E or W
-            elif tl == bl == HOME and tr == br == TRACK:
-                can_move = True
-
-        can_load = tl == tr == br == bl == LOAD
-        can_unload = tl == tr == br == bl == UNLOAD
-
-        # print("Cart", direction, can_move)
-        return can_move, can_load, can_unload
+    async def _run_until_stalled_(self, axes: list[bool], speed: int):
+        """
+        Drive the axes at speed with limited torque, like run_until_stalled's duty_limit, and stop each
+        as soon as it stalls against a physical stop
+        :param axes: x, y axis to drive
+        :param speed: deg/s
+        """
+        motors = (self.motor_x, self.motor_y)
+        motor_limits = [motor.control.limits() for motor in motors]
+        try:
+            for i, motor in enumerate(motors):
+                if axes[i]:
+                    # limits can only be changed while stopped
+                    motor.stop()
+                    speed_limit, acceleration, torque = motor_limits[i]
+                    motor.control.limits(speed_limit, acceleration, torque * _HOMING_DUTY // 100)
+                    motor.run(speed)
+
+            stalling = [axes[0], axes[1]]
+            while stalling[0] or stalling[1]:
+                await wait(_HOMING_POLL_MS)
+                for i, motor in enumerate(motors):
+                    if stalling[i] and motor.stalled():
+                        motor.stop()
+                        stalling[i] = False
+            await self._wait_until_settled_()
+        finally:
+            # full torque again even if homing is cancelled, e.g. by the user taking over
+            for i, motor in enumerate(motors):
+                if axes[i]:
+                    motor.stop()
+                    motor.control.limits(*motor_limits[i])
+
+    async def _check_calibration_(self, homing: list[bool]) -> bool:
+        """
+        The first homing after calibrating, or after boot with a saved calibration, is still at the motors'
+        absolute angles. Saves the home stops with a new calibration, or checks them against the saved one and
+        calibrates again if they have moved
+        :param homing: the axes at their home stops
+        :return False if homing has to start again:
+        """
+        if not (self.calibration_measured or self.saved_calibration is not None) or not (homing[0] and homing[1]):
+            return True
+        home = (self.motor_x.angle(), self.motor_y.angle())
+        saved = self.saved_calibration
+        self.saved_calibration = None
+        if self.calibration_measured:
+            self.calibration_measured = False
+            save_calibration(_CALIBRATION_ODV, _ODV_CALIBRATION_LAYOUT, self.gear_ratio_to_grid[0],
+                             self.gear_ratio_to_grid[1], home[0] % 360, home[1] % 360)
+            return True
+        if angles_match(home[0], saved[2]) and angles_match(home[1], saved[3]):
+            return True
+        print("--home stops have moved, calibrating again")
+        await self.calibrate()
+        await self._home_axes_()
+        return False
 
-    def _get_fine_grid_position_(self) -> tuple[int, int]:
+    async def calibrate(self):
+        """
+        Measure gear_ratio_to_grid, the travel between the physical ends of each axis over
+        axis_travel_pitches. The cart ends against the far stops so both axes are homed again after
+        """
+        self.calibrate_pending = False
+        print("calibrating..")
+        await self._run_until_stalled_([True, True], -_HOMING_MOTOR_ROT_SPEED)
+        start = (self.motor_x.angle(), self.motor_y.angle())
+        await self._run_until_stalled_([True, True], _HOMING_MOTOR_ROT_SPEED)
+        end = (self.motor_x.angle(), self.motor_y.angle())
+        for i in range(2):
+            travel = end[i] - start[i]
+            print(f"--axis {i} travel {travel} deg over {self.axis_travel_pitches[i]} pitches")
+            self.gear_ratio_to_grid[i] = (travel + self.axis_travel_pitches[i] // 2) // self.axis_travel_pitches[i]
+            self.axis_homed[i] = False
+        self._apply_gear_ratio_()
+        self.calibration_measured = True
+        print(f"ODV_GEAR_RATIO_TO_GRID = ({self.gear_ratio_to_grid[0]}, {self.gear_ratio_to_grid[1]})")
+
+    async def _wait_until_settled_(self):
+        """wait until both axes have stopped moving"""
+        settled_count = 0
+        while settled_count < _SETTLE_COUNT:
+            await wait(_HOMING_POLL_MS)
+            if abs(self.motor_x.speed()) < _SETTLE_SPEED and abs(self.motor_y.speed()) < _SETTLE_SPEED:
+                settled_count += 1
+            else:
+                settled_count = 0
 
-        x_grid = int(self.motor_x.angle() / _GEAR_RATIO_TO_GRID)
-        y_grid = int(self.motor_y.angle() / _GEAR_RATIO_TO_GRID)
-        fine_grid_position = (x_grid, y_grid)
-        print("fine_grid_position", fine_grid_position)
-        return fine_grid_position
+    def _get_cell_in_direction_(self, direction: int) -> int:
+        """
+        Collision cell the cart moves into with one fine grid step in a direction
+        :param direction:
+        :return: _CELL_BLOCKED, _CELL_FREE, _CELL_LOAD or _CELL_UNLOAD
+        """
+        if direction < _NORTH_WEST or direction > _WEST:
+            return _CELL_BLOCKED
+        return self._get_fine_cell_(self.last_fine_grid_position[0] + _DIRECTION_DX[direction],
+                                    self.last_fine_grid_position[1] + _DIRECTION_DY[direction])
 
-    def _get_grid_tile_type_from_fine_xy_(self, fine_position: tuple[int, int], use_fuzzy:bool) -> str:
-        tile_position, tile_type = self._get_grid_tile_from_fine_xy_(fine_position, use_fuzzy)
-        return tile_type
+    def _get_fine_grid_position_(self) -> tuple[int, int]:
+
+        x_grid = int(self.motor_x.angle() / self.gear_ratio_to_grid[0])
+        y_grid = int(self.motor_y.angle() / self.gear_ratio_to_grid[1])
+        return x_grid, y_grid
 
     def _get_grid_tile_position_from_fine_xy_(self, fine_position: tuple[int, int], use_fuzzy:bool) -> tuple[int, int]:
         tile_position, tile_type = self._get_grid_tile_from_fine_xy_(fine_position, use_fuzzy)
@@ -722,7 +1842,7 @@ class RunODVMotors(MotorHelper):
         if fine_position[0] < 1 or fine_position[
             1] < 1 or x_grid < 0 or y_grid < 0 or x_grid > self.coarse_grid_width or y_grid > self.coarse_grid_height:
             return tile, WALL
-        if (x_grid, y_grid) in self.grid_tracks:
+        if tile != self.home_tile and self._is_tile_open_(tile):
             return tile, TRACK
 
         return tile, WALL
@@ -733,121 +1853,585 @@ class RunODVMotors(MotorHelper):
             print('Invalid direction')
             return False
 
-        if direction in [_NORTH, _NORTH_EAST, _NORTH_WEST]:
-            self.motor_y.dc(-self.drive_speed)
-        if direction in [_SOUTH, _SOUTH_EAST, _SOUTH_WEST]:
-            self.motor_y.dc(self.drive_speed)
-
-        if direction in [_EAST, _NORTH_EAST, _SOUTH_EAST]:
-            self.motor_x.dc(self.drive_speed)
-        if direction in [_WEST, _NORTH_WEST, _SOUTH_WEST]:
-            self.motor_x.dc(-self.drive_speed)
+        if _DIRECTION_DY[direction] != 0:
+            self.motor_y.run(_DIRECTION_DY[direction] * self.jog_speed)
+        if _DIRECTION_DX[direction] != 0:
+            self.motor_x.run(_DIRECTION_DX[direction] * self.jog_speed)
 
         self.motors_running = True
         return True
 
+    def _get_nearby_station_(self, stations: list[tuple[int, int]]) -> tuple[int, int] | None:
+        """the station on or next to the cart's tile, if any"""
+        tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
+        for station in stations:
+            if tile == station or self._distance(tile, station) <= 1:
+                return station
+        print(f'{tile} is too far away from stations {stations}')
+        return None
+
     def _do_load_(self):
+        # the user has changed the load, an interrupted route no longer applies
+        self.route_checkpoint = []
         if self.has_load:
             print('Already loaded')
             return
-        tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
-        if tile != self.load_tile and self._distance(tile, self.load_tile) > 1:
-            print(f'{tile} is too far away from load_tile {self.load_tile}')
-            return
-        tile_angle = self._navigate_to_grid_tile(self.load_tile)
-        wait(200)
-        # do load
-        self.motor_x.run_target(_MAX_MOTOR_ROT_SPEED, tile_angle[0] - (_GEAR_RATIO_TO_GRID * 3))
-        wait(2000)
-        print("loading..")
-        self._navigate_to_grid_tile(self.load_tile)
-        wait(200)
-        self.has_load = True
-        print("ready to go")
+        station = self._get_nearby_station_(self.load_tiles)
+        if station is not None:
+            self._queue_load_(station)
 
     def _do_unload_(self):
-
-        tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
-        if tile != self.unload_tile and self._distance(tile, self.unload_tile) > 1:
-            print(f'{tile} is too far away from unload_tile {self.load_tile}')
-            return
-
-        tile_angle = self._navigate_to_grid_tile(self.unload_tile)
-        wait(200)
-        print("unloading..")
-        self.motor_x.run_target(_MAX_MOTOR_ROT_SPEED, tile_angle[0] + (_GEAR_RATIO_TO_GRID * 4))
-        wait(2000)
-        self._navigate_to_grid_tile(self.unload_tile)
-        wait(200)
-        self.has_load = False
-        print("ready to go")
-
-    @staticmethod
-    def _tile_to_angle(tile: tuple[int, int]) -> tuple[int, int]:
+        self.route_checkpoint = []
+        station = self._get_nearby_station_(self.unload_tiles)
+        if station is not None:
+            self._queue_unload_(station)
+
+    def _queue_load_(self, station: tuple[int, int]):
+        # drive into the load station and back out again
+        self.load_tile = station
+        tile_angle = self._tile_to_angle(station)
+        self._queue_route_step_(_STEP_TILE, station)
+        self._queue_route_step_(_STEP_LOAD, tile_angle[0] - (self.gear_ratio_to_grid[0] * 3))
+        self._queue_route_step_(_STEP_TILE, station)
+        self._queue_route_step_(_STEP_SET_LOAD, 1)
+
+    def _queue_unload_(self, station: tuple[int, int]):
+        # drive into the unload station and back out again
+        self.unload_tile = station
+        tile_angle = self._tile_to_angle(station)
+        self._queue_route_step_(_STEP_TILE, station)
+        self._queue_route_step_(_STEP_UNLOAD, tile_angle[0] + (self.gear_ratio_to_grid[0] * 4))
+        self._queue_route_step_(_STEP_TILE, station)
+        self._queue_route_step_(_STEP_SET_LOAD, 0)
+
+    def _tile_to_angle(self, tile: tuple[int, int]) -> tuple[int, int]:
         """
         Convert grid tile to angle
         :param tile: tuple[int,int]
         :return: ODVAnglePosition
         """
-        tile_angle_x = tile[0] * _FINE_GRID_SIZE * _GEAR_RATIO_TO_GRID
-        tile_angle_y = (tile[1] * _FINE_GRID_SIZE * _GEAR_RATIO_TO_GRID)
+        tile_angle_x = tile[0] * _FINE_GRID_SIZE * self.gear_ratio_to_grid[0]
+        tile_angle_y = (tile[1] * _FINE_GRID_SIZE * self.gear_ratio_to_grid[1])
         return tile_angle_x, tile_angle_y
 
-    def _navigate_to_grid_tile(self, tile: tuple[int, int], stop=Stop.HOLD) -> tuple[int, int]:
-        print(f"navigating to tile {tile}")
-        tile_angle_x = tile[0] * _FINE_GRID_SIZE * _GEAR_RATIO_TO_GRID
-        tile_angle_y = (tile[1] * _FINE_GRID_SIZE * _GEAR_RATIO_TO_GRID) + _GEAR_RATIO_TO_GRID
-        self.motor_y.run_target(_MAX_MOTOR_ROT_SPEED, tile_angle_y, then=stop)
-        self.motor_x.run_target(_MAX_MOTOR_ROT_SPEED, tile_angle_x, then=stop)
-        return tile_angle_x, tile_angle_y
+    def _queue_route_step_(self, step_type: int, value):
+        """
+        Add a step to the route, see advance_route
+        :param step_type: _STEP_TILE, _STEP_LOAD, _STEP_UNLOAD, _STEP_SET_LOAD, _STEP_SEGMENT or _STEP_FLEET_LEG
+        :param value: tile, station angle, 1/0 for has_load, (start tile, end tile) or end tile
+        """
+        self.route_steps.append((step_type, value))
+        if step_type == _STEP_TILE or step_type == _STEP_FLEET_LEG:
+            self.route_end_tile = value
+        elif step_type == _STEP_SEGMENT:
+            self.route_end_tile = value[1]
+        self.mh_route_active = True
+
+    def _queue_path_to_grid_tile_(self, end_tile: tuple[int, int]):
+        """
+        Plan a path from the end of the active route, or from the cart if there isn't one, and queue it
+        with straight runs driven as one move
+        :param end_tile:
+        """
+        if self.fleet is not None:
+            # planned when it is reached, around where the other ODVs will be by then
+            self._queue_route_step_(_STEP_FLEET_LEG, end_tile)
+            return
+        start_tile = self._route_start_tile_()
+        if self.cluster_columns > 0:
+            # big grid, drive from entrance to entrance and plan the tiles in between on the way
+            waypoints = self._cluster_path_to_grid_tile(start_tile, end_tile)
+            if len(waypoints) > 0:
+                self._queue_route_step_(_STEP_TILE, start_tile)
+            for i in range(1, len(waypoints)):
+                self._queue_route_step_(_STEP_SEGMENT, (waypoints[i - 1], waypoints[i]))
+            return
+        path = self._lowest_cost_path_to_grid_tile(start_tile, end_tile)
+        for waypoint in collapse_tile_path(path):
+            self._queue_route_step_(_STEP_TILE, waypoint[0])
+
+    def cancel_route(self):
+        self.route_steps = []
+        self.route_step_index = 0
+        self.route_step_started = False
+        self.mh_route_active = False
+
+    def _start_route_step_(self, step: tuple):
+        if step[0] == _STEP_TILE:
+            tile_angle = self._tile_to_angle(step[1])
+            print(f"navigating to tile {step[1]}")
+            self.route_step_target = (tile_angle[0], tile_angle[1] + self.gear_ratio_to_grid[1])
+            self.motor_y.run_target(_MAX_MOTOR_ROT_SPEED, self.route_step_target[1], wait=False)
+            self.motor_x.run_target(_MAX_MOTOR_ROT_SPEED, self.route_step_target[0], wait=False)
+            self.motors_running = True
+        elif step[0] == _STEP_LOAD or step[0] == _STEP_UNLOAD:
+            print("loading.." if step[0] == _STEP_LOAD else "unloading..")
+            self.motor_x.run_target(_MAX_MOTOR_ROT_SPEED, step[1], wait=False)
+            self.motors_running = True
+            self.route_step_end_ms = self.route_stopwatch.time() + _TRANSFER_TIMEOUT_MS
+            self.route_step_arrived_ms = -1
+            self.transfer_timed_out = False
+        elif step[0] == _STEP_SET_LOAD:
+            if self.transfer_timed_out:
+                # nothing was transferred, auto-drive goes back for it
+                print("transfer failed")
+                self.transfer_timed_out = False
+            else:
+                self.has_load = step[1] == 1
+                print("ready to go")
+
+    def _is_route_step_done_(self, step: tuple) -> bool:
+        if step[0] == _STEP_LOAD or step[0] == _STEP_UNLOAD:
+            return self._is_transfer_done_(step[0] == _STEP_LOAD)
+        if step[0] == _STEP_WAIT_UNTIL:
+            return self.route_stopwatch.time() >= step[1]
+        if step[0] == _STEP_SET_LOAD:
+            return True
+        # tile moves are on open track, so missed targets mean the position is off
+        if not (self.motor_x.done() and self.motor_y.done()):
+            return False
+        self._check_target_error_(self.route_step_target[0], self.route_step_target[1])
+        return True
 
-    def _navigate_grid_tile_path(self, grid_tile_path: list[tuple[tuple[int, int], int]]) -> bool:
+    def _is_transfer_done_(self, loading: bool) -> bool:
         """
-        Navigates robot through list of tuple[int,int]
-        :param grid_tile_path:
-        :return: succeeded
+        The cart is in the station and has stayed transfer_dwell_ms, or with a sensor it has read the cart
+        full/empty for _TRANSFER_SENSED_MS. A station not reached within _TRANSFER_TIMEOUT_MS is given up
+        and the transfer is not counted, see transfer_timed_out
+        :param loading:
+        :return: the cart can leave the station
         """
-        for i, path in enumerate(grid_tile_path):
-            # if user takes over break
-            if self.mh_auto_drive and not self.mh__remote_disabled and len(remote.buttons.pressed()) > 0:
-                self.disable_auto_drive()
-                self.stop_motors()
+        now = self.route_stopwatch.time()
+        # in the station once the move is done or the cart is pushing against the station
+        if self.route_step_arrived_ms < 0:
+            # arrival first, a late poll, e.g. after a remote scan, still finds the cart there
+            if not (self.motor_x.done() or self.motor_x.stalled()):
+                if now >= self.route_step_end_ms:
+                    print("transfer timed out")
+                    self.transfer_timed_out = True
+                    return True
                 return False
+            self.route_step_arrived_ms = now
+            self.transfer_sensed_ms = -1
+        if now - self.route_step_arrived_ms >= self.transfer_dwell_ms:
+            return True
+        if self.transfer_sensor is None:
+            return False
+        is_full = self.transfer_sensor.distance() <= self.transfer_sensor_full_distance
+        if is_full != loading:
+            self.transfer_sensed_ms = -1
+            return False
+        if self.transfer_sensed_ms < 0:
+            self.transfer_sensed_ms = now
+        return now - self.transfer_sensed_ms >= _TRANSFER_SENSED_MS
 
-            if path[1] is not None and i < (len(grid_tile_path) - 1) and grid_tile_path[i + 1][1] is not None and \
-                    grid_tile_path[i + 1][1] == path[1]:
-                self._navigate_to_grid_tile(path[0], Stop.NONE)
-            else:
-                self._navigate_to_grid_tile(path[0])
+    def advance_route(self):
+        """
+        Moves the route on without blocking, called once per main loop. Motor moves are started with
+        wait=False and polled with done(), so user take over and the countdown are handled every loop
+        """
+        if self.fleet is not None:
+            self._update_fleet_()
+        if not self.mh_route_active:
+            return
+        # if user takes over break
+        if self.mh_auto_drive and not self.mh__remote_disabled and remote_input.buttons:
+            self.disable_auto_drive()
+            # keep the rest of the route, including the step in progress, for resume_route. a load/unload
+            # keeps the drive to its station too, the user may move the cart away from it
+            step_index = self.route_step_index
+            if self.route_steps[step_index][0] in (_STEP_LOAD, _STEP_UNLOAD):
+                step_index -= 1
+            self.route_checkpoint = self.route_steps[step_index:]
+            self.cancel_route()
+            self.stop_motors()
+            return
 
+        while True:
+            step = self.route_steps[self.route_step_index]
+            if self.route_step_started and step[0] == _STEP_TILE and self._check_stalls_():
+                # blocked on open track, give up the route and re-home the drifted axis before the next one
+                print("route blocked")
+                self.cancel_route()
+                self.stop_motors()
+                self.reset_homing()
+                return
+            if step[0] == _STEP_SEGMENT:
+                # plan the tiles for this part of the route only now it is reached
+                path = self._refine_segment_(step[1][0], step[1][1])
+                if len(path) == 0:
+                    print("route blocked")
+                    self.cancel_route()
+                    self.stop_motors()
+                    return
+                self.route_steps[self.route_step_index:self.route_step_index + 1] = [
+                    (_STEP_TILE, waypoint[0]) for waypoint in collapse_tile_path(path)[1:]]
+                if self.route_step_index >= len(self.route_steps):
+                    self.cancel_route()
+                    return
+                continue
+            if step[0] == _STEP_FLEET_LEG:
+                if self.route_stopwatch.time() < self.fleet_retry_ms or not self._expand_fleet_leg_():
+                    return
+                if self.route_step_index >= len(self.route_steps):
+                    self.cancel_route()
+                    return
+                continue
+            if (step[0] == _STEP_WAIT_UNTIL and not self.route_step_started and step[1] > self.fleet_leg_start_ms
+                    and self.route_stopwatch.time() > step[1] + self.fleet_step_ms // 2):
+                # behind schedule, the reservations no longer match where the cart will be
+                print("fleet leg late")
+                self._replan_fleet_leg_(self.route_step_index)
+                continue
+            if not self.route_step_started:
+                self._start_route_step_(step)
+                self.route_step_started = True
+            if not self._is_route_step_done_(step):
+                return
+            # step done, start the next one straight away
+            self.route_step_index += 1
+            self.route_step_started = False
+            if self.route_step_index >= len(self.route_steps):
+                self.cancel_route()
+                return
+
+    def resume_route(self) -> bool:
+        """
+        Continue the route the user interrupted. Rather than planning the whole route again, the cart
+        rejoins it at the waypoint, before the next load/unload, that is cheapest to drive to and finish
+        from, with a path planned only around the cart and that waypoint
+        :return: True if a route was resumed
+        """
+        if len(self.route_checkpoint) == 0 or not self.mh_is_homed:
+            return False
+        steps = self.route_checkpoint
+        self.route_checkpoint = []
+        cart_tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
+        # a load/unload finished just before the user took over
+        while len(steps) > 0 and steps[0][0] == _STEP_SET_LOAD:
+            self._queue_route_step_(steps[0][0], steps[0][1])
+            steps = steps[1:]
+        # waypoints up to the first load/unload
+        waypoints = []
+        for i, step in enumerate(steps):
+            if step[0] == _STEP_TILE or step[0] == _STEP_FLEET_LEG:
+                waypoints.append((i, step[1]))
+            elif step[0] == _STEP_SEGMENT:
+                waypoints.append((i, step[1][1]))
+            elif step[0] != _STEP_WAIT_UNTIL:
+                break
+        if len(waypoints) == 0:
+            return self.mh_route_active
+        if self.fleet is not None:
+            # the schedule has passed, plan the drive to the last waypoint again around the other ODVs
+            step_index, waypoint = waypoints[-1]
+            print(f"resuming route at {waypoint} from {cart_tile}")
+            self._queue_route_step_(_STEP_FLEET_LEG, waypoint)
+            for step in steps[step_index + 1:]:
+                self._queue_route_step_(step[0], step[1])
+            return True
+        # the tiles left to drive from each waypoint to the last one
+        best = 0
+        best_cost = -1
+        remaining = 0
+        for i in range(len(waypoints) - 1, -1, -1):
+            if i < len(waypoints) - 1:
+                remaining += self._manhattan_(waypoints[i][1], waypoints[i + 1][1])
+            cost = self._manhattan_(cart_tile, waypoints[i][1]) + remaining
+            if best_cost < 0 or cost < best_cost:
+                best = i
+                best_cost = cost
+        step_index, waypoint = waypoints[best]
+        print(f"resuming route at {waypoint} from {cart_tile}")
+
+        # local correction, in a window around the cart and the waypoint
+        left = max(min(cart_tile[0], waypoint[0]) - _RESUME_MARGIN, 0)
+        top = max(min(cart_tile[1], waypoint[1]) - _RESUME_MARGIN, 0)
+        right = min(max(cart_tile[0], waypoint[0]) + _RESUME_MARGIN + 1, self.coarse_grid_width)
+        bottom = min(max(cart_tile[1], waypoint[1]) + _RESUME_MARGIN + 1, self.coarse_grid_height)
+        path = self._lowest_cost_path_to_grid_tile(cart_tile, waypoint, (left, top, right - left, bottom - top))
+        if len(path) == 0:
+            # walled off locally, fall back to a full plan to the waypoint
+            self._queue_path_to_grid_tile_(waypoint)
+        else:
+            for tile_waypoint in collapse_tile_path(path):
+                self._queue_route_step_(_STEP_TILE, tile_waypoint[0])
+        for step in steps[step_index + 1:]:
+            self._queue_route_step_(step[0], step[1])
+        return True
+
+    def _update_fleet_(self):
+        """
+        Share reservations with the other ODVs. When a fleet leg clashes with theirs the ODV on the higher
+        channel gives way and plans the rest of its leg again, an ODV holding a tile until it plans again
+        can't give way so the other one always does. An ODV without a route holds its tile
+        """
+        if self.fleet.update() and self.mh_route_active and self.fleet_leg_end_index >= self.route_step_index:
+            if self.fleet.must_give_way():
+                print("giving way")
+                # the move in progress stops at the next tile it can, the tiles of a move are all reserved
+                step_index = self.route_step_index
+                if self.route_step_started and self.route_steps[step_index][0] == _STEP_TILE:
+                    self._shorten_move_()
+                    step_index += 1
+                self._replan_fleet_leg_(step_index)
+        if not self.mh_route_active and not self.fleet_parked and self.mh_is_homed:
+            tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
+            self.fleet.reserve([(self._tile_index_(tile[0], tile[1]), 0, _FLEET_FOREVER_MS)])
+            self.fleet_parked = True
+
+    def _shorten_move_(self):
+        """stop the straight run being driven at the first tile the cart can still brake for"""
+        end_tile = self.route_steps[self.route_step_index][1]
+        tile = [end_tile[0], end_tile[1]]
+        for axis, motor in enumerate((self.motor_x, self.motor_y)):
+            travel = self.route_step_target[axis] - motor.angle()
+            if abs(travel) <= _TARGET_TOLERANCE:
+                continue
+            braking = motor.speed() * motor.speed() // (2 * motor.control.limits()[1])
+            pitch = _FINE_GRID_SIZE * self.gear_ratio_to_grid[axis]
+            position = motor.angle() - axis * self.gear_ratio_to_grid[axis]
+            if travel > 0:
+                tile[axis] = min(-(-(position + braking) // pitch), end_tile[axis])
+            else:
+                tile[axis] = max((position - braking) // pitch, end_tile[axis])
+        if (tile[0], tile[1]) != end_tile:
+            self.route_steps[self.route_step_index] = (_STEP_TILE, (tile[0], tile[1]))
+            self._start_route_step_(self.route_steps[self.route_step_index])
+
+    def _replan_fleet_leg_(self, step_index: int):
+        """replace the steps of the fleet leg being driven, from step_index, with the leg to plan again"""
+        self.route_steps[step_index:self.fleet_leg_end_index + 1] = [(_STEP_FLEET_LEG, self.fleet_leg_end_tile)]
+        self.fleet_leg_end_index = -1
+        if step_index == self.route_step_index:
+            self.route_step_started = False
+
+    def _expand_fleet_leg_(self) -> bool:
+        """
+        Plan the fleet leg at route_step_index around the other ODVs' reservations, reserve the tiles and
+        replace it with the moves, each after a wait for its start time so the cart keeps to the plan
+        :return: False if there is no path yet, the leg is tried again after _FLEET_RETRY_MS
+        """
+        start_tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
+        end_tile = self._repick_station_(start_tile, self.route_steps[self.route_step_index][1])
+        now = self.route_stopwatch.time()
+        path = self._fleet_path_(start_tile, end_tile, now)
+        if len(path) == 0 and 0 <= self.fleet_blocked_ms <= now - _FLEET_YIELD_MS and \
+                (start_tile in self.load_tiles or start_tile in self.unload_tiles):
+            # the cart may be in the way of the ODV it waits for, two carts each waiting in the only way
+            # in to the other's station never move, so wait out of the station
+            end_tile, path = self._fleet_parking_path_(start_tile, now)
+            if len(path) > 0:
+                print(f"leaving the station for {end_tile}")
+                self.route_steps.insert(self.route_step_index, (_STEP_FLEET_LEG, end_tile))
+        if len(path) == 0:
+            print(f"fleet leg to {end_tile} blocked, waiting")
+            self.fleet.reserve([(self._tile_index_(start_tile[0], start_tile[1]), 0, _FLEET_FOREVER_MS)])
+            self.fleet_retry_ms = now + _FLEET_RETRY_MS
+            if self.fleet_blocked_ms < 0:
+                self.fleet_blocked_ms = now
+            return False
+        self.fleet_blocked_ms = -1
+        # a tile is reserved from the start of the move onto it to the end of the move off it, the last
+        # one until the ODV plans again. straight runs without a wait are driven as one move, so a tile
+        # can be reached early, as long as it is free from the start of the run
+        visits = []
+        for i, tile_index in enumerate(path):
+            if i == 0 or tile_index != path[i - 1]:
+                visits.append([tile_index, i, i])
+            else:
+                visits[-1][2] = i
+        step_ms = self.fleet_step_ms
+        steps = []
+        reservations = []
+        run_start_ms = now
+        for i, (tile_index, first, last) in enumerate(visits):
+            if i > 0:
+                move_ms = now + (first - 1) * step_ms
+                if not (i > 1 and visits[i - 1][1] == visits[i - 1][2]
+                        and tile_index - visits[i - 1][0] == visits[i - 1][0] - visits[i - 2][0]
+                        and self.fleet.is_free(tile_index, run_start_ms, move_ms)):
+                    run_start_ms = move_ms
+                    steps.append((_STEP_WAIT_UNTIL, run_start_ms))
+                    steps.append((_STEP_TILE, self._index_to_tile_(tile_index)))
+                else:
+                    steps[-1] = (_STEP_TILE, self._index_to_tile_(tile_index))
+            end_ms = now + (last + 1) * step_ms if i < len(visits) - 1 else _FLEET_FOREVER_MS
+            reservations.append((tile_index, run_start_ms, end_ms))
+        self.fleet.reserve(reservations)
+        self.fleet_parked = False
+        self.fleet_leg_start_ms = now
+        self.route_steps[self.route_step_index:self.route_step_index + 1] = steps
+        self.fleet_leg_end_index = self.route_step_index + len(steps) - 1
+        self.fleet_leg_end_tile = end_tile
         return True
 
+    def _repick_station_(self, start_tile: tuple[int, int], end_tile: tuple[int, int]) -> tuple[int, int]:
+        """
+        Stations are picked when the route is queued, by the time the leg to one is planned another ODV may
+        have taken it. Pick again and move the transfer to the new station
+        :param start_tile: where the leg sets off from
+        :param end_tile: the end of the fleet leg at route_step_index
+        :return: the end of the leg
+        """
+        if end_tile in self.load_tiles:
+            stations, next_stations = self.load_tiles, self.unload_tiles
+        elif end_tile in self.unload_tiles:
+            stations, next_stations = self.unload_tiles, self.load_tiles
+        else:
+            return end_tile
+        if not self.fleet.is_held(self._tile_index_(end_tile[0], end_tile[1])):
+            return end_tile
+        station = self._pick_station_(start_tile, stations, next_stations)
+        if station is None or station == end_tile:
+            return end_tile
+        print(f"station {end_tile} taken, going to {station}")
+        shift = self._tile_to_angle(station)[0] - self._tile_to_angle(end_tile)[0]
+        for i in range(self.route_step_index, len(self.route_steps)):
+            step_type, value = self.route_steps[i]
+            if (step_type == _STEP_TILE or step_type == _STEP_FLEET_LEG) and value == end_tile:
+                self.route_steps[i] = (step_type, station)
+            elif step_type == _STEP_LOAD or step_type == _STEP_UNLOAD:
+                self.route_steps[i] = (step_type, value + shift)
+            elif step_type == _STEP_SET_LOAD:
+                break
+        if stations is self.load_tiles:
+            self.load_tile = station
+        else:
+            self.unload_tile = station
+        if self.route_end_tile == end_tile:
+            self.route_end_tile = station
+        return station
+
+    def _fleet_parking_path_(self, start_tile: tuple[int, int], now: int) -> tuple[tuple[int, int], list[int]]:
+        """
+        Path to the nearest tile that isn't a station and no other ODV has reserved, to wait on. Tiles off
+        the shortest drives between load and unload stations come first, a cart waiting there is in no
+        one's way
+        :param start_tile:
+        :param now: route_stopwatch time of step 0
+        :return: the tile and the path as _fleet_path_, [] if there isn't one
+        """
+        distances = self._distance_field_(start_tile, (0, 0, self.coarse_grid_width, self.coarse_grid_height))
+        tiles = [index for index, distance in enumerate(distances)
+                 if distance != _UNREACHABLE and self.fleet.is_free(index, now, _FLEET_FOREVER_MS)]
+        in_the_way = bytearray(len(distances))
+        for load_tile in self.load_tiles:
+            load_distances = self.station_distances[load_tile]
+            for unload_tile in self.unload_tiles:
+                unload_distances = self.station_distances[unload_tile]
+                cycle = unload_distances[self._tile_index_(load_tile[0], load_tile[1])]
+                if cycle == _UNREACHABLE:
+                    continue
+                for index in tiles:
+                    if load_distances[index] + unload_distances[index] == cycle:
+                        in_the_way[index] = 1
+        tiles.sort(key=lambda index: in_the_way[index] * _UNREACHABLE + distances[index])
+        for index in tiles:
+            tile = self._index_to_tile_(index)
+            if tile in self.load_tiles or tile in self.unload_tiles:
+                continue
+            path = self._fleet_path_(start_tile, tile, now)
+            if len(path) > 0:
+                return tile, path
+        return start_tile, []
+
+    def _fleet_path_(self, start_tile: tuple[int, int], end_tile: tuple[int, int], now: int) -> list[int]:
+        """
+        Earliest arrival path that keeps clear of the other ODVs' reservations, a breadth first search over
+        tile and time, one layer per fleet step, where the cart can also wait a step on its tile. A tile is
+        used at a step if no one else has it from one step before to one step after, and the end tile must
+        be free from then on. Tiles that can't reach the end within _FLEET_WAIT_STEPS of the shortest path
+        are not searched
+        :param start_tile:
+        :param end_tile:
+        :param now: route_stopwatch time of step 0
+        :return: tile index at each step from start_tile to end_tile, [] if there isn't one
+        """
+        if end_tile in self.station_distances:
+            distances = self.station_distances[end_tile]
+        else:
+            distances = self._distance_field_(end_tile, (0, 0, self.coarse_grid_width, self.coarse_grid_height))
+        start = self._tile_index_(start_tile[0], start_tile[1])
+        end = self._tile_index_(end_tile[0], end_tile[1])
+        if distances[start] == _UNREACHABLE:
+            return []
+        step_ms = self.fleet_step_ms
+        if start == end and self.fleet.is_free(end, now, _FLEET_FOREVER_MS):
+            return [start]
+        horizon = distances[start] + _FLEET_WAIT_STEPS
+        # each layer holds the tile index of a state plus the position of the state it came from << 16
+        layers = [[start]]
+        seen = bytearray((len(distances) + 7) >> 3)
+        for step in range(1, horizon + 1):
+            seen[:] = bytes(len(seen))
+            layer = []
+            step_at_ms = now + step * step_ms
+            for position, state in enumerate(layers[-1]):
+                tile = self._index_to_tile_(state & 0xFFFF)
+                for direction in [-1, _EAST, _NORTH, _WEST, _SOUTH]:
+                    new_pos = tile if direction < 0 else position_from_direction(tile, direction)
+                    if not self._is_tile_open_(new_pos):
+                        continue
+                    index = self._tile_index_(new_pos[0], new_pos[1])
+                    if seen[index >> 3] & (1 << (index & 7)) or step + distances[index] > horizon:
+                        continue
+                    if not self.fleet.is_free(index, step_at_ms - step_ms, step_at_ms + step_ms):
+                        continue
+                    seen[index >> 3] |= 1 << (index & 7)
+                    layer.append(index | (position << 16))
+                    if index == end and self.fleet.is_free(end, step_at_ms - step_ms, _FLEET_FOREVER_MS):
+                        path = [end]
+                        while position >= 0 and len(layers) > 0:
+                            state = layers.pop()[position]
+                            path.append(state & 0xFFFF)
+                            position = state >> 16 if len(layers) > 0 else -1
+                        path.reverse()
+                        return path
+            if len(layer) == 0:
+                break
+            layers.append(layer)
+        return []
+
+    @staticmethod
+    def _manhattan_(start_tile: tuple[int, int], end_tile: tuple[int, int]) -> int:
+        return abs(start_tile[0] - end_tile[0]) + abs(start_tile[1] - end_tile[1])
+
     def auto_home(self):
         if not self.mh_is_homed:
             return
+        # the end of a session replaces a route the user interrupted
+        self.route_checkpoint = []
         print('getting path to home')
-        tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
-        path = self._bfs_path_to_grid_tile(tile, self.home_tile)
-        self._navigate_grid_tile_path(path)
-        print('homed')
+        self._queue_path_to_grid_tile_(self.home_tile)
+
+    def _route_start_tile_(self) -> tuple[int, int]:
+        """where the next queued path sets off from"""
+        if self.mh_route_active:
+            return self.route_end_tile
+        return self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
 
     def auto_load(self):
         if not self.mh_is_homed:
             return
-        print('getting path to load')
-        tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
-        path = self._bfs_path_to_grid_tile(tile, self.load_tile)
-        self._navigate_grid_tile_path(path)
-        self._do_load_()
+        station = self._pick_station_(self._route_start_tile_(), self.load_tiles, self.unload_tiles)
+        if station is None:
+            print('no load station can be reached')
+            return
+        print(f'getting path to load {station}')
+        self._queue_path_to_grid_tile_(station)
+        self._queue_load_(station)
 
     def auto_unload(self):
         if not self.mh_is_homed:
             return
-        print('getting path to unload')
-        tile = self._get_grid_tile_position_from_fine_xy_(self._get_fine_grid_position_(), True)
-        path = self._bfs_path_to_grid_tile(tile, self.unload_tile)
-        self._navigate_grid_tile_path(path)
-        self._do_unload_()
+        station = self._pick_station_(self._route_start_tile_(), self.unload_tiles, self.load_tiles)
+        if station is None:
+            print('no unload station can be reached')
+            return
+        print(f'getting path to unload {station}')
+        self._queue_path_to_grid_tile_(station)
+        self._queue_unload_(station)
 
     @staticmethod
     def _distance(start_tile: tuple[int, int], end_tile: tuple[int, int]) -> int:
@@ -856,174 +2440,379 @@ class RunODVMotors(MotorHelper):
     def print_tile_pos(self, tile_name: str, tile: tuple[int, int]):
         print(f"tile {tile_name} at {tile}, {self._tile_to_angle(tile)}")
 
-    def _bfs_path_to_grid_tile(self, start_tile: tuple[int, int], end_tile: tuple[int, int]) -> list[
+    def _path_cost_ms(self, grid_tile_path: list[tuple[tuple[int, int], int]]) -> int:
+        """
+        Estimated time to drive a path
+        :param grid_tile_path:
+        :return: tiles * tile cost + turns * turn cost
+        """
+        if len(grid_tile_path) < 2:
+            return 0
+        turns = len(collapse_tile_path(grid_tile_path)) - 2
+        return (len(grid_tile_path) - 1) * self.tile_cost_ms + max(turns, 0) * self.turn_cost_ms
+
+    def _lowest_cost_path_to_grid_tile(self, start_tile: tuple[int, int], end_tile: tuple[int, int],
+                                       window: tuple[int, int, int, int] = None) -> list[
         tuple[tuple[int, int], int]]:
-        print("---bfs_path_to_grid_tile---")
-        self._display_grid_()
+        """
+        Dijkstra search over (tile, direction of travel) so turns can be charged, returns the path with the
+        lowest estimated travel time rather than the fewest tiles
+        :param start_tile:
+        :param end_tile:
+        :param window: left, top, width, height in tiles to search inside, default the whole grid
+        :return: list of (tile, direction), the start tile has direction -1
+        """
+        print("---lowest_cost_path_to_grid_tile---")
         self.print_tile_pos("--start", start_tile)
         self.print_tile_pos("--end", end_tile)
-        print("--grid_tracks", self.grid_tracks)
-        self.print_tile_pos("--home_tile", self.home_tile)
-        self.print_tile_pos("--load_tile", self.load_tile)
-        self.print_tile_pos("--unload_tile", self.unload_tile)
-        # mem_info()
-        queue: Queue = Queue()
-        queue.put([(start_tile, -1)])  # Enqueue the start position
+        # a state is window tile index * 4 + direction // 2, the direction the tile was entered in, the
+        # start tile is expanded directly so it needs no state. costs are 2 bytes per state, came from is
+        # the previous state's direction // 2 or _PLAN_FROM_START
+        if window is None:
+            window = (0, 0, self.coarse_grid_width, self.coarse_grid_height)
+        left, top, width, height = window
+        tile_cost = max(self.tile_cost_ms // _PLAN_COST_UNIT_MS, 1)
+        turn_cost = self.turn_cost_ms // _PLAN_COST_UNIT_MS
+        state_count = width * height * 4
+        costs = bytearray(state_count * 2)
+        came_from = bytearray(bytes((_PLAN_NOT_REACHED,)) * state_count)
+        open_states = []
+        done = -1
+        state = -1
+        state_tile = start_tile
+        while True:
+            state_cost = 0 if state < 0 else costs[state * 2] | (costs[state * 2 + 1] << 8)
+            for direction in [_EAST, _NORTH, _WEST, _SOUTH]:  # Possible movements
+                new_pos = position_from_direction(state_tile, direction)
+                if not (left <= new_pos[0] < left + width and top <= new_pos[1] < top + height):
+                    continue
+                if not self._is_tile_open_(new_pos) or new_pos == start_tile:
+                    continue
+                cost = state_cost + tile_cost
+                if state >= 0 and (state & 3) != direction >> 1:
+                    cost += turn_cost
+                new_state = ((new_pos[1] - top) * width + new_pos[0] - left) * 4 + (direction >> 1)
+                if came_from[new_state] == _PLAN_NOT_REACHED:
+                    open_states.append(new_state)
+                elif cost >= costs[new_state * 2] | (costs[new_state * 2 + 1] << 8):
+                    continue
+                costs[new_state * 2] = cost & 0xFF
+                costs[new_state * 2 + 1] = cost >> 8
+                came_from[new_state] = _PLAN_FROM_START if state < 0 else state & 3
+            if not open_states:
+                break
+            # take the cheapest open state, a linear scan rather than a heap to keep memory down
+            best = 0
+            best_cost = costs[open_states[0] * 2] | (costs[open_states[0] * 2 + 1] << 8)
+            for i in range(1, len(open_states)):
+                cost = costs[open_states[i] * 2] | (costs[open_states[i] * 2 + 1] << 8)
+                if cost < best_cost:
+                    best = i
+                    best_cost = cost
+            state = open_states.pop(best)
+            state_tile = (left + (state >> 2) % width, top + (state >> 2) // width)
+            if state_tile == end_tile:
+                done = state
+                break
 
         path = []
-        visited = [start_tile]
-        while not queue.empty():
-            path = queue.get()  # Dequeue the path
-            current_path = path[-1]  # Current position is the last element of the path
-            # print(path)
-            if current_path[0] == end_tile:
+        if start_tile == end_tile:
+            path.append((start_tile, -1))
+        while done >= 0:
+            direction = ((done & 3) << 1) | 1
+            tile = (left + (done >> 2) % width, top + (done >> 2) // width)
+            path.insert(0, (tile, direction))
+            previous = came_from[done]
+            tile = position_from_direction(tile, (direction + 4) % 8)
+            if previous == _PLAN_FROM_START:
+                path.insert(0, (tile, -1))
                 break
-
-            for direction in [_EAST, _NORTH, _WEST, _SOUTH]:  # Possible movements
-                new_pos = position_from_direction(current_path[0], direction)
-                if new_pos in visited:
-                    continue
-                if new_pos in self.grid_tracks or new_pos == self.home_tile:
-                    visited.append(new_pos)
-                    new_path = list(path)
-                    new_path.append((new_pos, direction))
-                    queue.put(new_path)  # Enqueue the new path
+            done = ((tile[1] - top) * width + tile[0] - left) * 4 + previous
         if len(path) == 0:
             print("no path found")
-        # mem_info()
+        else:
+            print(f"--estimated {self._path_cost_ms(path)}ms")
         print(path)
-        print("---bfs_path_to_grid_tile---")
+        print("---lowest_cost_path_to_grid_tile---")
         return path
 
     def handle_remote_press(self):
         """
             handle remote button clicks
         """
-        if self.mh__remote_disabled:
+        if self.mh__remote_disabled or self.mh_route_active:
             return
-        # Check which remote_buttons are pressed.
-        remote_buttons_pressed = remote.buttons.pressed()
+        # the buttons input_task read this tick
+        buttons = remote_input.buttons
         #  handle button press
         # left +      North
         # right - West    East  right +
         # left -      South
-        if len(remote_buttons_pressed) == 0 or Button.RIGHT in remote_buttons_pressed or Button.LEFT in remote_buttons_pressed:
+        if buttons == 0 or buttons & _BUTTON_STOP:
             self.stop_motors()
             return
 
-        fine_grid_pos = self._get_fine_grid_position_()
-        if fine_grid_pos != self.last_fine_grid_position:
-            self.last_fine_grid_position = fine_grid_pos
-        elif self.motors_running:
-            return
-
         direction = None
-        if Button.LEFT_PLUS in remote_buttons_pressed and Button.RIGHT_PLUS in remote_buttons_pressed:
+        if buttons & _BUTTON_LEFT_PLUS and buttons & _BUTTON_RIGHT_PLUS:
             direction = _NORTH_EAST
-        elif Button.LEFT_PLUS in remote_buttons_pressed and Button.RIGHT_MINUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_LEFT_PLUS and buttons & _BUTTON_RIGHT_MINUS:
             direction = _NORTH_WEST
-        elif Button.LEFT_MINUS in remote_buttons_pressed and Button.RIGHT_PLUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_LEFT_MINUS and buttons & _BUTTON_RIGHT_PLUS:
             direction = _SOUTH_EAST
-        elif Button.LEFT_MINUS in remote_buttons_pressed and Button.RIGHT_MINUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_LEFT_MINUS and buttons & _BUTTON_RIGHT_MINUS:
             direction = _SOUTH_WEST
-        elif Button.LEFT_PLUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_LEFT_PLUS:
             direction = _NORTH
-        elif Button.LEFT_MINUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_LEFT_MINUS:
             direction = _SOUTH
-        elif Button.RIGHT_PLUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_RIGHT_PLUS:
             direction = _EAST
-        elif Button.RIGHT_MINUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_RIGHT_MINUS:
             direction = _WEST
 
-        self.stop_motors()
-
-        if direction not in [_NORTH, _NORTH_EAST, _EAST, _SOUTH_EAST, _SOUTH, _SOUTH_WEST, _WEST, _NORTH_WEST]:
+        if direction is None:
             print('Invalid direction')
+            self.stop_motors()
             return
 
-        # print(direction)
-        can_move, can_load, can_unload = self._can_move_in_direction_(direction)
-        if can_load and direction == _WEST:
+        self._jog_(direction)
+
+    def _is_jog_clear_(self, fine_x: int, fine_y: int, direction: int) -> bool:
+        """the cart can jog through this fine position without stopping"""
+        cell = self._get_fine_cell_(fine_x, fine_y)
+        if cell == _CELL_LOAD:
+            return direction != _WEST
+        if cell == _CELL_UNLOAD:
+            return direction != _EAST
+        return cell != _CELL_BLOCKED
+
+    def _jog_(self, direction: int):
+        """
+        Keeps the motors running while the fine grid ahead is clear, only sending motor commands
+        when the direction changes or when a wall or tile restriction is within braking distance
+        :param direction:
+        """
+        self.last_fine_grid_position = self._get_fine_grid_position_()
+
+        cell = self._get_cell_in_direction_(direction)
+        if cell == _CELL_LOAD and direction == _WEST:
+            self.stop_motors()
             self._do_load_()
             return
-        if can_unload and direction == _EAST:
+        if cell == _CELL_UNLOAD and direction == _EAST:
+            self.stop_motors()
             self._do_unload_()
             return
 
-        if not can_move:
+        if direction != self.jog_direction:
+            self.stop_motors()
+            self.jog_direction = direction
+            if cell != _CELL_BLOCKED:
+                self._move_in_direction_(direction)
+            return
+
+        if not self.motors_running:
+            return
+        self._check_stalls_()
+        if self.jog_braking:
+            return
+
+        # look ahead for the stopping distance
+        dx = _DIRECTION_DX[direction]
+        dy = _DIRECTION_DY[direction]
+        fine_x = self.last_fine_grid_position[0]
+        fine_y = self.last_fine_grid_position[1]
+        clear_steps = 0
+        while clear_steps < self.jog_brake_steps and self._is_jog_clear_(fine_x + dx, fine_y + dy, direction):
+            fine_x += dx
+            fine_y += dy
+            clear_steps += 1
+        if clear_steps == self.jog_brake_steps:
             return
 
-        self._move_in_direction_(direction)
+        # brake to the last clear position, mid way through the fine grid step
+        self.jog_braking = True
+        ratio_x, ratio_y = self.gear_ratio_to_grid
+        if dx != 0:
+            self.motor_x.run_target(self.jog_speed, fine_x * ratio_x + ratio_x // 2, wait=False)
+        if dy != 0:
+            self.motor_y.run_target(self.jog_speed, fine_y * ratio_y + ratio_y // 2, wait=False)
 
     # stop all motors
     def stop_motors(self):
         self.motor_x.stop()
         self.motor_y.stop()
         self.motors_running = False
+        self.jog_direction = None
+        self.jog_braking = False
+
+
+
+
+##################################################################################
+# Tasks, each runs at its own rate and awaits between runs so none holds up the others
+##################################################################################
+
+_INPUT_TASK_MS: int = const(10)
+_STATUS_TASK_MS: int = const(20)
+_CONTROL_TASK_MS: int = const(10)
+_AUTO_DRIVE_TASK_MS: int = const(10)
+# between visitors, every task runs at this rate
+_IDLE_TASK_MS: int = const(100)
+_IDLE_AFTER_MS: int = const(5000)
+
+
+class LoopRate:
+    """
+    The tasks run at their own rate while the vehicle is in use, and all slow down to _IDLE_TASK_MS when the
+    hub has been waiting for the next visitor for _IDLE_AFTER_MS, no countdown running, no buttons held and
+    nothing driving
+    """
+
+    def __init__(self, countdown_timer: CountdownTimer, drive_motors: MotorHelper):
+        self.countdown_timer = countdown_timer
+        self.drive_motors = drive_motors
+        self.stopwatch = StopWatch()
+        self.busy_until_time = _IDLE_AFTER_MS
+        self.idle = False
+
+    def update(self):
+        """
+            checks if the hub is in use, call once per input tick
+        """
+        if (remote_input.buttons or _ACTIVE <= self.countdown_timer.countdown_status <= _FINAL_20_SECS or
+                self.drive_motors.mh_route_active or self.drive_motors.mh_auto_drive):
+            self.busy_until_time = self.stopwatch.time() + _IDLE_AFTER_MS
+            self.idle = False
+        elif not self.idle and self.stopwatch.time() > self.busy_until_time:
+            self.idle = True
+
+    def tick_ms(self, busy_ms: int) -> int:
+        """
+        :param busy_ms: the task's own rate
+        :return ms to wait before the task runs again:
+        """
+        return _IDLE_TASK_MS if self.idle else busy_ms
+
+
+async def input_task(countdown_timer: CountdownTimer, loop_rate: LoopRate):
+    """
+    reads the remote once per tick for every handler, then the countdown start and reset buttons. Looks for
+    the remote again when it is lost
+    """
+    while True:
+        if REMOTE_DISABLED:
+            pass
+        elif remote_input.connected:
+            remote_input.sample()
+            countdown_timer.check_remote_buttons()
+        else:
+            lost_ms = remote_input.reconnect()
+            if lost_ms:
+                countdown_timer.resume(lost_ms)
+            else:
+                await wait(_REMOTE_RETRY_MS)
+        loop_rate.update()
+        await wait(loop_rate.tick_ms(_INPUT_TASK_MS))
+
+
+async def status_task(countdown_timer: CountdownTimer, loop_rate: LoopRate):
+    """countdown lights"""
+    while True:
+        countdown_timer.show_status()
+        await wait(loop_rate.tick_ms(_STATUS_TASK_MS))
+
+
+async def control_task(countdown_timer: CountdownTimer, drive_motors: MotorHelper, loop_rate: LoopRate):
+    """driving by remote while the countdown runs, and stopping the vehicle when it ends"""
+    while True:
+        if drive_motors.mh_auto_drive:
+            # auto_drive_task has the vehicle, the countdown still runs down and ends, leaving the cart to it
+            if not countdown_timer.has_time_remaining():
+                countdown_timer.has_session_ended()
+        # if there is no remote, then there is no point in a countdown
+        elif countdown_timer.has_time_remaining() or REMOTE_DISABLED:
+            # the end of session route finishes before homing, as it does before the remote drives
+            if drive_motors.mh_supports_homing and not drive_motors.mh_route_active:
+                await drive_motors.do_homing()
+            if drive_motors.mh_supports_flip:
+                drive_motors.handle_flip()
+            if not REMOTE_DISABLED:
+                drive_motors.handle_remote_press()
+        elif not drive_motors.mh_route_active:
+            drive_motors.stop_motors()
+            # unload and go home once when the countdown ends, not every time the cart is idle
+            if countdown_timer.has_session_ended() and drive_motors.mh_supports_homing and drive_motors.mh_is_homed:
+                drive_motors.auto_unload()
+                drive_motors.auto_home()
+                drive_motors.reset_homing()
+
+        if REMOTE_DISABLED and ODV_AUTO_DRIVE_TIMEOUT_SECS == 0:
+            print("No remote or auto drive exiting")
+            raise SystemExit
+        await wait(loop_rate.tick_ms(_CONTROL_TASK_MS))
+
+
+async def auto_drive_task(countdown_timer: CountdownTimer, drive_motors: MotorHelper, loop_rate: LoopRate):
+    """ODV routes and the automatic load/unload cycles"""
+    if not drive_motors.mh_supports_homing:
+        return
+    while True:
+        if not drive_motors.mh_auto_drive and ODV_AUTO_DRIVE_TIMEOUT_SECS > 0 and countdown_timer.remote_button_press_timed_out():
+            drive_motors.enable_auto_drive()
+        drive_motors.advance_route()
 
+        if drive_motors.mh_auto_drive and not drive_motors.mh_route_active:
+            await drive_motors.do_homing()
+            if drive_motors.mh_is_homed and not drive_motors.resume_route():
+                drive_motors.auto_unload()
+                drive_motors.auto_load()
+        await wait(loop_rate.tick_ms(_AUTO_DRIVE_TASK_MS))
 
 
+async def start_up(countdown_timer: CountdownTimer, drive_motors: MotorHelper, boot_timeline: BootTimeline):
+    """the motors start up while the remote is found, then the tasks run"""
+    if REMOTE_DISABLED:
+        print('--no remote')
+        await start_up_motors(drive_motors, boot_timeline)
+    else:
+        print('--setup remote')
+        await multitask(start_up_motors(drive_motors, boot_timeline), connect_remote(boot_timeline))
+    await wait_until_ready(boot_timeline)
+
+    print('SETUP complete')
+    boot_timeline.print_timeline()
+
+    countdown_timer.reset()
+    mem_info()
+    loop_rate = LoopRate(countdown_timer, drive_motors)
+    await multitask(input_task(countdown_timer, loop_rate), status_task(countdown_timer, loop_rate),
+                    control_task(countdown_timer, drive_motors, loop_rate),
+                    auto_drive_task(countdown_timer, drive_motors, loop_rate))
+
 
 def main():
+    boot_timeline = BootTimeline()
     error_flash_code = ErrorFlashCodes()
     print('SETUP')
     print('--setup hub')
+    boot_timeline.start('hub')
     setup_hub()
+    boot_timeline.end('hub')
     try:
         print("--setup countdown")
         countdown_timer = CountdownTimer()
         print("--setup motors")
-        drive_motors = RunODVMotors(error_flash_code, ODV_SPEED, ODV_GRID)
+        boot_timeline.start('motors')
+        drive_motors = RunODVMotors(error_flash_code, ODV_SPEED, ODV_GRID, ODV_TILE_COST_MS, ODV_TURN_COST_MS,
+                            ODV_TRANSFER_DWELL_MS, ODV_TRANSFER_SENSOR_PORT, ODV_TRANSFER_SENSOR_FULL_DISTANCE,
+                            ODV_FLEET_CHANNEL, ODV_FLEET_PEER_CHANNELS, ODV_GEAR_RATIO_TO_GRID, ODV_CALIBRATE,
+                            ODV_AXIS_TRAVEL_PITCHES)
 
+        boot_timeline.end('motors')
         drive_motors.mh__remote_disabled = REMOTE_DISABLED
 
-        if REMOTE_DISABLED:
-            print('--no remote')
-        else:
-            print('--setup remote')
-            setup_remote(error_flash_code)
-
-        # give everything a chance to warm up
-        wait(500)
-
-        print('SETUP complete')
-
-        countdown_timer.reset()
-        mem_info()
-        while True:
-            if not REMOTE_DISABLED:
-                countdown_timer.check_remote_buttons()
-
-            if drive_motors.mh_supports_homing:
-                if not drive_motors.mh_auto_drive and ODV_AUTO_DRIVE_TIMEOUT_SECS > 0 and countdown_timer.remote_button_press_timed_out():
-                    drive_motors.enable_auto_drive()
-
-                if drive_motors.mh_auto_drive and drive_motors.mh_is_homed:
-                    drive_motors.auto_unload()
-                    drive_motors.auto_load()
-
-            # if there is no remote, then there is no point in a countdown
-            elif countdown_timer.has_time_remaining() or REMOTE_DISABLED:
-                if drive_motors.mh_supports_homing:
-                    drive_motors.do_homing()
-                if drive_motors.mh_supports_flip:
-                    drive_motors.handle_flip()
-                if not REMOTE_DISABLED:
-                    drive_motors.handle_remote_press()
-            else:
-                drive_motors.stop_motors()
-                if drive_motors.mh_supports_homing:
-                    drive_motors.auto_unload()
-                    drive_motors.auto_home()
-                    drive_motors.reset_homing()
-
-            countdown_timer.show_status()
-            # add a small delay to keep the loop stable and allow for events to occur
-            wait(10)
-
-            if REMOTE_DISABLED and ODV_AUTO_DRIVE_TIMEOUT_SECS == 0:
-                print("No remote or auto drive exiting")
-                raise SystemExit
+        run_task(start_up(countdown_timer, drive_motors, boot_timeline))
 
     except Exception as e:
         print(e)
@@ -2,9 +2,10 @@
 # Copyright Etendut
 # licence MIT
 from micropython import const, mem_info
-from pybricks.parameters import Color, Button
+from pybricks.parameters import Color, Button, Stop
 from pybricks.pupdevices import Remote
-from pybricks.tools import wait, StopWatch
+from pybricks.tools import wait, StopWatch, multitask, run_task
+from ustruct import calcsize, pack_into, unpack_from
 
 try:
     from typing import TYPE_CHECKING
@@ -30,7 +31,9 @@ print('Version 2.1.0')
 COUNTDOWN_LIMIT_MINUTES: int = const(
     3)  # run for (x) minutes, min 1 minute, max up to you. the default of 3 minutes is play tested :).
 # c = center button, + = + button, - = - button
+# a space between chords makes a code of several steps, e.g. '+,,+ -,,- c,c,c'
 COUNTDOWN_RESET_CODE = 'c,c,c'  # left center button, center button, right center button
+COUNTDOWN_RESET_CODE_STEP_SECS: int = const(3)  # time allowed between the steps of the code
 
 # How many seconds to wait before doing a load/unload automatically. 0 = disabled
 ODV_AUTO_DRIVE_TIMEOUT_SECS: int = const(30)
@@ -38,6 +41,11 @@ ODV_AUTO_DRIVE_TIMEOUT_SECS: int = const(30)
 # for debugging or ODV full auto
 REMOTE_DISABLED = False
 
+# ODVs sharing a grid, each hub broadcasts its tile reservations on its own channel (0-255) and observes the
+# others, e.g. ODV_FLEET_CHANNEL = 1, ODV_FLEET_PEER_CHANNELS = [2, 3]. None = a single ODV
+ODV_FLEET_CHANNEL = None
+ODV_FLEET_PEER_CHANNELS = []
+
 
 # skid steer dual motor settings
 SKID_STEER_SPEED: int = const(80)  # set between 50 and 100
@@ -63,9 +71,6 @@ class ErrorFlashCodes:
     def set_error_no_motor_on_b(self):
         self.flash_count = 3
 
-    def set_error_no_remote(self):
-        self.flash_count = 4
-
     def flash_error_code(self):
         """
             this flashes the remote led
@@ -90,12 +95,17 @@ class MotorHelper:
         self.mh__remote_disabled = False
         self.mh_auto_drive = False
         self.mh_is_homed = False
+        self.mh_route_active = False
 
     def handle_flip(self):
         """Tracked racer only"""
         pass
 
-    def do_homing(self):
+    async def start_up(self):
+        """Calibration run at boot while the remote is found, servo only"""
+        pass
+
+    async def do_homing(self):
         """ODV only"""
         pass
 
@@ -115,6 +125,15 @@ class MotorHelper:
         """ODV only"""
         pass
 
+    def advance_route(self):
+        """Moves the active route on by one step without blocking, ODV only"""
+        pass
+
+    def resume_route(self) -> bool:
+        """Continues a route interrupted by the user, ODV only
+        :return: True if there was a route to continue"""
+        return False
+
     def enable_auto_drive(self):
         """enable mh_auto_drive, ODV only"""
         if self.mh_auto_drive:
@@ -153,30 +172,324 @@ class MotorHelper:
 
 
 ##################################################################################
-# Countdown helper
+# Actuator helper
 ##################################################################################
 
-def wait_for_no_pressed_buttons():
-    if REMOTE_DISABLED:
-        return
-    remote_buttons_pressed = remote.buttons.pressed()
-    while remote_buttons_pressed:
-        remote_buttons_pressed = remote.buttons.pressed()
-        wait(100)
+_COMMAND_NONE: int = const(0)
+_COMMAND_DC: int = const(1)
+_COMMAND_STOP: int = const(2)
+_COMMAND_RUN_TARGET: int = const(3)
+_COMMAND_LIGHT: int = const(4)
+
+
+class Actuator:
+    """
+    Wraps a motor or light and drops a command that repeats the last one sent to it. Other commands are
+    passed on and clear the last command, anything else, angle() and the like, comes straight from the device
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.last_command = _COMMAND_NONE
+        self.last_value = 0
+        self.last_speed = 0
+        self.commands_sent = 0
+        self.commands_saved = 0
+
+    def __getattr__(self, name):
+        # only called for names the actuator does not have, keep them so the next look up is direct
+        value = getattr(self.device, name)
+        setattr(self, name, value)
+        return value
+
+    def __repeats__(self, command: int, value: int, speed: int = 0) -> bool:
+        """
+            records a coalesced command
+        :return True if it is the same as the last one and need not be sent:
+        """
+        if command == self.last_command and value == self.last_value and speed == self.last_speed:
+            self.commands_saved += 1
+            return True
+        self.last_command = command
+        self.last_value = value
+        self.last_speed = speed
+        self.commands_sent += 1
+        return False
+
+    def __forget__(self):
+        """records a command that is always sent"""
+        self.last_command = _COMMAND_NONE
+        self.commands_sent += 1
+
+    def dc(self, duty: int):
+        if not self.__repeats__(_COMMAND_DC, duty):
+            self.device.dc(duty)
+
+    def stop(self):
+        if not self.__repeats__(_COMMAND_STOP, 0):
+            self.device.stop()
+
+    def run_target(self, speed: int, target_angle: int, then=Stop.HOLD, wait: bool = True):
+        # a waiting move is always sent, the caller may await it
+        if wait or then != Stop.HOLD:
+            self.__forget__()
+            return self.device.run_target(speed, target_angle, then, wait)
+        if not self.__repeats__(_COMMAND_RUN_TARGET, target_angle, speed):
+            self.device.run_target(speed, target_angle, then, False)
+
+    def run(self, speed: int):
+        self.__forget__()
+        self.device.run(speed)
+
+    def run_until_stalled(self, speed: int, duty_limit: int = None):
+        self.__forget__()
+        if duty_limit is None:
+            return self.device.run_until_stalled(speed)
+        return self.device.run_until_stalled(speed, duty_limit=duty_limit)
+
+    def reset_angle(self, angle: int):
+        self.__forget__()
+        self.device.reset_angle(angle)
+
+    def on(self, brightness: int = 100):
+        if not self.__repeats__(_COMMAND_LIGHT, brightness):
+            self.device.on(brightness)
+
+    def off(self):
+        if not self.__repeats__(_COMMAND_LIGHT, 0):
+            self.device.off()
+
+
+##################################################################################
+# Calibration storage
+##################################################################################
+
+# saved calibration, in the hub's user storage from offset 0:
+# magic byte, vehicle kind byte, the vehicle's values packed with its ustruct layout, checksum byte
+_CALIBRATION_MAGIC: int = const(0x4C)
+_CALIBRATION_SERVO: int = const(1)
+_CALIBRATION_ODV: int = const(2)
+# how far apart two absolute encoder readings can be and still count as the same place
+_CALIBRATION_TOLERANCE: int = const(20)
+
+
+def load_calibration(kind: int, layout: str):
+    """
+    Reads the calibration saved by save_calibration
+    :param kind: _CALIBRATION_SERVO or _CALIBRATION_ODV
+    :param layout: ustruct format of the values
+    :return the values, None if there are none for this vehicle or they fail the check:
+    """
+    global hub
+    size = calcsize(layout) + 3
+    try:
+        data = hub.system.storage(0, read=size)
+    except (AttributeError, ValueError, OSError):
+        # no user storage on this firmware
+        return None
+    if data[0] != _CALIBRATION_MAGIC or data[1] != kind or sum(data[:-1]) & 0xFF != data[-1]:
+        return None
+    return unpack_from(layout, data, 2)
+
+
+def save_calibration(kind: int, layout: str, *values):
+    """
+    Keeps calibration values in the hub's user storage so the next boot can check them instead of calibrating
+    :param kind: _CALIBRATION_SERVO or _CALIBRATION_ODV
+    :param layout: ustruct format of the values
+    :param values:
+    """
+    global hub
+    data = bytearray(calcsize(layout) + 3)
+    data[0] = _CALIBRATION_MAGIC
+    data[1] = kind
+    pack_into(layout, data, 2, *values)
+    data[-1] = sum(data[:-1]) & 0xFF
+    try:
+        hub.system.storage(0, write=data)
+    except (AttributeError, ValueError, OSError):
+        print('--calibration not saved')
+
+
+def angles_match(angle: int, saved_angle: int) -> bool:
+    """two absolute encoder readings are the same place, the encoder wraps every turn"""
+    return abs((angle - saved_angle + 180) % 360 - 180) <= _CALIBRATION_TOLERANCE
+
+
+##################################################################################
+# Remote input
+##################################################################################
+
+# one bit per remote button
+_BUTTON_LEFT_PLUS: int = const(1)
+_BUTTON_LEFT_MINUS: int = const(2)
+_BUTTON_LEFT: int = const(4)
+_BUTTON_CENTER: int = const(8)
+_BUTTON_RIGHT_PLUS: int = const(16)
+_BUTTON_RIGHT_MINUS: int = const(32)
+_BUTTON_RIGHT: int = const(64)
+_BUTTON_STOP: int = const(68)  # either red button
+
+# a scan covers finding the remote, connecting and discovering its services, boot scans long enough for all
+# of it while the motors start up by themselves. A scan blocks every task, so a remote lost while driving is
+# looked for in scans that start short and double each time one fails, up to a full scan, with a gap between
+# them for the other tasks
+_REMOTE_SCAN_MS: int = const(2000)
+_REMOTE_RESCAN_MS: int = const(250)
+_REMOTE_RETRY_MS: int = const(400)
+
+_BUTTON_BITS = ((Button.LEFT_PLUS, _BUTTON_LEFT_PLUS), (Button.LEFT_MINUS, _BUTTON_LEFT_MINUS),
+                (Button.LEFT, _BUTTON_LEFT), (Button.CENTER, _BUTTON_CENTER),
+                (Button.RIGHT_PLUS, _BUTTON_RIGHT_PLUS), (Button.RIGHT_MINUS, _BUTTON_RIGHT_MINUS),
+                (Button.RIGHT, _BUTTON_RIGHT))
+
+
+class RemoteInput:
+    """
+    The remote buttons, read once per tick by input_task and shared by the countdown and the vehicle
+    """
+
+    def __init__(self):
+        self.buttons = 0  # held this tick
+        self.pressed = 0  # went down since the last tick
+        self.released = 0  # went up since the last tick
+        self.connected = True
+        self.stopwatch = StopWatch()
+        self.lost_time = 0
+        self.scan_ms = _REMOTE_RESCAN_MS
+
+    def sample(self):
+        """
+            read the remote buttons into the bitmasks, a lost remote reads as no buttons held
+        """
+        try:
+            remote_buttons_pressed = remote.buttons.pressed()
+        except OSError:
+            self.lose()
+            remote_buttons_pressed = ()
+        buttons = 0
+        for button in remote_buttons_pressed:
+            for remote_button, bit in _BUTTON_BITS:
+                if button == remote_button:
+                    buttons |= bit
+                    break
+        self.pressed = buttons & ~self.buttons
+        self.released = self.buttons & ~buttons
+        self.buttons = buttons
+
+    def lose(self):
+        """
+            the remote has gone, input_task looks for it again in the background
+        """
+        if not self.connected:
+            return
+        print('--remote lost')
+        self.connected = False
+        self.lost_time = self.stopwatch.time()
+        self.scan_ms = _REMOTE_RESCAN_MS
+
+    def connect(self, scan_ms: int = _REMOTE_SCAN_MS) -> bool:
+        """
+            look for the remote for scan_ms, this blocks but moving motors and the hub light carry on
+            by themselves
+        :return True if the remote was found:
+        """
+        global remote
+        try:
+            remote = Remote(timeout=scan_ms)
+        except OSError:
+            return False
+        print('--remote connected.')
+        self.connected = True
+        return True
+
+    def reconnect(self) -> int:
+        """
+            look for a lost remote, for longer each time it is not found
+        :return ms the remote was lost for, 0 if it was not found:
+        """
+        if not self.connect(self.scan_ms):
+            self.scan_ms = min(self.scan_ms * 2, _REMOTE_SCAN_MS)
+            return 0
+        return max(self.stopwatch.time() - self.lost_time, 1)
+
+
+remote_input = RemoteInput()
 
 
-def convert_millis_hours_minutes_seconds(millis: int):
+##################################################################################
+# Status lights
+##################################################################################
+
+class StatusLights:
     """
-        utility for making milliseconds hours/minutes/seconds
-    :param millis:
-    :return hours, minutes, seconds:
+    The hub and remote lights. The hub light flashes by itself once given a pattern, the remote light can only
+    be switched on and off so it is flashed from here, but only sent a color when it changes
     """
-    hours = int((millis / (1000 * 60 * 60)) % 24)
-    minutes = int((millis / (1000 * 60)) % 60)
-    seconds = int((millis / 1000) % 60)
 
-    return hours, minutes, seconds
+    def __init__(self):
+        self.stopwatch = StopWatch()
+        self.color = None
+        self.durations = None
+        self.period = 0
+        self.pattern_start_time = 0
+        self.remote_color = None
 
+    def show(self, color, durations: list[int] = None):
+        """
+            show a color, steady or flashing, call every tick so the remote keeps flashing
+        :param color:
+        :param durations: on and off times in ms, as for hub.light.blink, None for a steady color
+        """
+        global hub
+        global remote
+        if color != self.color or durations is not self.durations:
+            self.color = color
+            self.durations = durations
+            self.pattern_start_time = self.stopwatch.time()
+            if durations:
+                self.period = sum(durations)
+                hub.light.blink(color, durations)
+            else:
+                hub.light.on(color)
+
+        if REMOTE_DISABLED or not remote_input.connected:
+            return
+        remote_color = color
+        if durations:
+            # find the step of the pattern the remote is on, even steps are on, odd ones off
+            elapsed = (self.stopwatch.time() - self.pattern_start_time) % self.period
+            step = 0
+            while elapsed >= durations[step]:
+                elapsed -= durations[step]
+                step += 1
+            if step % 2:
+                remote_color = Color.NONE
+        if remote_color != self.remote_color:
+            self.remote_color = remote_color
+            try:
+                remote.light.on(remote_color)
+            except OSError:
+                remote_input.lose()
+
+
+# flash patterns, on and off times in ms
+_READY_FLASH = [500, 500]
+_FINAL_MINUTE_FLASH = [500, 250]
+_FINAL_20_SECS_FLASH = [200, 100]
+LED_FLASHING_SEQUENCE = [75] * 5 + [1000]
+
+
+##################################################################################
+# Countdown helper
+##################################################################################
+
+# the countdown changes phase or prints a message every _COUNTDOWN_EVENT_MS in its last minute
+_COUNTDOWN_EVENT_MS: int = const(10000)
+_COUNTDOWN_EVENT_SECS: int = const(10)
+_FINAL_MINUTE_MS: int = const(60000)
+_FINAL_MINUTE_SECS: int = const(60)
+_FINAL_20_SECS_MS: int = const(20000)
 
 _READY: int = const(0)
 _ACTIVE: int = const(10)
@@ -193,16 +506,19 @@ class CountdownTimer:
 
     def __init__(self):
         # assign external objects to properties of the class
-        self.last_countdown_message: str = ''
         self.countdown_status: int = _UNKNOWN
 
         # Start a timer.
         self.stopwatch = StopWatch()
-        self.led_flash_sw_time = 0
+        self.lights = StatusLights()
         self.end_time = 0
+        self.next_event_time = 0
+        # set when the countdown ends, see has_session_ended
+        self.session_ended = False
         # remote timing
         self.remote_buttons_time_out_ms = 0
         self.reset_time_since_last_remote_press()
+        self.reset_code = ButtonSequence(COUNTDOWN_RESET_CODE, COUNTDOWN_RESET_CODE_STEP_SECS * 1000)
 
     def reset_time_since_last_remote_press(self):
         self.remote_buttons_time_out_ms = self.stopwatch.time() + (ODV_AUTO_DRIVE_TIMEOUT_SECS * 1000)
@@ -217,32 +533,48 @@ class CountdownTimer:
         """
         if self.countdown_status == _ENDED or self.countdown_status == _READY:
             return False
+        # paused while the remote is lost
+        if not remote_input.connected:
+            return True
+        # nothing changes until the next phase or message
+        if self.stopwatch.time() < self.next_event_time:
+            return True
+        return self.__next_countdown_event__()
 
-        # calculate remaining_time time
+    def __next_countdown_event__(self) -> bool:
+        """
+            move the countdown on to its current phase and work out when the next one is due
+        :return True if there is time remaining:
+        """
         remaining_time = self.end_time - self.stopwatch.time()
-
-        # print a friendly console message
-        con_hour, con_min, con_sec = convert_millis_hours_minutes_seconds(int(remaining_time))
-
-        if con_sec % 10 == 0 and con_min < 1:
-            countdown_message = 'countdown ending in: {}:{:02}'.format(con_min, con_sec)
-            if self.last_countdown_message != countdown_message:
-                self.last_countdown_message = countdown_message
-                print(self.last_countdown_message)  # when time has run out end countdown
+        # round up to the event just passed, a tick can run a little after it
+        event_secs = (remaining_time + _COUNTDOWN_EVENT_MS - 1) // _COUNTDOWN_EVENT_MS * _COUNTDOWN_EVENT_SECS
+        if event_secs < _FINAL_MINUTE_SECS:
+            print('countdown ending in: 0:{:02}'.format(max(event_secs, 0)))
         if remaining_time <= 0:
             self.countdown_status = _ENDED
-            self.show_status()
-            return False
-        # in last 25s slow flash a warning
-        if remaining_time < (1000 * 20):
+            self.session_ended = True
+        elif remaining_time <= _FINAL_20_SECS_MS:
+            # in last 20s fast flash a warning
             self.countdown_status = _FINAL_20_SECS
-            self.show_status()
-
+        elif remaining_time <= _FINAL_MINUTE_MS:
             # in last minute slow flash a warning
-        if remaining_time < (1000 * 60):
             self.countdown_status = _FINAL_MINUTE
-            self.show_status()
+        self.show_status()
+        if self.countdown_status == _ENDED:
+            return False
 
+        events_left = min((remaining_time - 1) // _COUNTDOWN_EVENT_MS, _FINAL_MINUTE_MS // _COUNTDOWN_EVENT_MS)
+        self.next_event_time = self.end_time - events_left * _COUNTDOWN_EVENT_MS
+        return True
+
+    def has_session_ended(self) -> bool:
+        """
+            True the first time it is asked after the countdown ends, so the end of a session is handled once
+        """
+        if not self.session_ended:
+            return False
+        self.session_ended = False
         return True
 
     def __start_countdown__(self):
@@ -253,6 +585,7 @@ class CountdownTimer:
         self.countdown_status = _ACTIVE
         self.show_status()
         self.end_time = self.stopwatch.time() + (COUNTDOWN_LIMIT_MINUTES * 60 * 1000)
+        self.next_event_time = self.end_time - _FINAL_MINUTE_MS
 
     def reset(self):
         if REMOTE_DISABLED:
@@ -262,6 +595,19 @@ class CountdownTimer:
         self.countdown_status = _READY
         self.reset_time_since_last_remote_press()
 
+    def resume(self, lost_ms: int):
+        """
+            carry on once a lost remote is back, the countdown was paused while it was gone
+        :param lost_ms:
+        """
+        print('countdown resumed')
+        if _ACTIVE <= self.countdown_status <= _FINAL_20_SECS:
+            self.end_time += lost_ms
+            self.next_event_time += lost_ms
+        # the new remote's light is not showing anything yet
+        self.lights.remote_color = None
+        self.reset_time_since_last_remote_press()
+
     def check_remote_buttons(self):
         """
             check countdown time buttons
@@ -269,106 +615,106 @@ class CountdownTimer:
         if REMOTE_DISABLED:
             return
 
-        remote_buttons_pressed = remote.buttons.pressed()
-        if len(remote_buttons_pressed) == 0:
+        if not remote_input.buttons:
             return
 
         self.reset_time_since_last_remote_press()
+        # only a button going down counts, so a held button does not start the countdown straight after a reset
+        if not remote_input.pressed:
+            return
 
-        if self.countdown_status == _READY and Button.CENTER in remote_buttons_pressed:
+        if self.countdown_status == _READY and remote_input.pressed & _BUTTON_CENTER:
             self.__start_countdown__()
-            wait_for_no_pressed_buttons()
 
         # if reset sequence pressed reset the countdown timer
-        if all(i in remote_buttons_pressed for i in PROGRAM_RESET_CODE_PRESSED) and not any(
-                i in remote_buttons_pressed for i in PROGRAM_RESET_CODE_NOT_PRESSED):
+        if self.reset_code.press(remote_input.buttons, self.stopwatch.time()):
             self.reset()
-            wait_for_no_pressed_buttons()
 
     def show_status(self):
-        global hub
-        global remote
-        if self.countdown_status == _READY:
-            self.__flash_remote_and_hub_light__(Color.GREEN, 500, Color.NONE, 500)
+        if not remote_input.connected:
+            self.lights.show(Color.WHITE, LED_FLASHING_SEQUENCE)
+        elif self.countdown_status == _READY:
+            self.lights.show(Color.GREEN, _READY_FLASH)
         elif self.countdown_status == _ACTIVE:
-            hub.light.on(Color.GREEN)
-            if not REMOTE_DISABLED:
-                remote.light.on(Color.GREEN)
+            self.lights.show(Color.GREEN)
         elif self.countdown_status == _FINAL_20_SECS:
-            self.__flash_remote_and_hub_light__(Color.ORANGE, 200, Color.NONE, 100)
+            self.lights.show(Color.ORANGE, _FINAL_20_SECS_FLASH)
         elif self.countdown_status == _FINAL_MINUTE:
-            self.__flash_remote_and_hub_light__(Color.ORANGE, 500, Color.NONE, 250)
+            self.lights.show(Color.ORANGE, _FINAL_MINUTE_FLASH)
         elif self.countdown_status == _ENDED:
-            hub.light.on(Color.ORANGE)
-            if not REMOTE_DISABLED:
-                remote.light.on(Color.ORANGE)
-
-    def __flash_remote_and_hub_light__(self, on_color, on_msec: int, off_color, off_msec: int):
-        """
-            this flashes the remote led
-        :param on_color:
-        :param on_msec:
-        :param off_color:
-        :param off_msec:
-        """
-        global hub
-        # we use a timer to make it a non-blocking call
-        if self.stopwatch.time() > (on_msec + off_msec + self.led_flash_sw_time):
-            self.led_flash_sw_time = self.stopwatch.time()
-            if not REMOTE_DISABLED:
-                remote.light.on(off_color)
-            hub.light.on(off_color)
-        elif self.stopwatch.time() > (off_msec + self.led_flash_sw_time):
-            if not REMOTE_DISABLED:
-                remote.light.on(on_color)
-            hub.light.on(on_color)
+            self.lights.show(Color.ORANGE)
 
 
 ##################################################################################
 # Code helper
 ##################################################################################
 
-def code_to_button_press_hash(button_code):
+def code_to_button_press_hash(button_code) -> int:
     """
-    Returns the button needed to match a given code
+    Returns the buttons of one chord of a code, any other button held means no match
     :param button_code:
-    :return buttons_that_are_pressed[], buttons_that_should_not_pressed[]:
+    :return buttons bitmask:
     """
     code_items = button_code.split(',')
-    buttons_that_should_not_pressed = [Button.LEFT_PLUS, Button.LEFT_MINUS, Button.LEFT, Button.CENTER,
-                                       Button.RIGHT_PLUS, Button.RIGHT_MINUS, Button.RIGHT]
-    buttons_that_are_pressed = []
+    buttons = 0
     # left code
     if '+' in code_items[0]:
-        buttons_that_are_pressed.append(Button.LEFT_PLUS)
-        buttons_that_should_not_pressed.remove(Button.LEFT_PLUS)
+        buttons |= _BUTTON_LEFT_PLUS
     if '-' in code_items[0]:
-        buttons_that_are_pressed.append(Button.LEFT_MINUS)
-        buttons_that_should_not_pressed.remove(Button.LEFT_MINUS)
+        buttons |= _BUTTON_LEFT_MINUS
     if 'c' in code_items[0]:
-        buttons_that_are_pressed.append(Button.LEFT)
-        buttons_that_should_not_pressed.remove(Button.LEFT)
+        buttons |= _BUTTON_LEFT
 
     # middle code
     if 'c' in code_items[1]:
-        buttons_that_are_pressed.append(Button.CENTER)
-        buttons_that_should_not_pressed.remove(Button.CENTER)
+        buttons |= _BUTTON_CENTER
 
     # right code
     if '+' in code_items[2]:
-        buttons_that_are_pressed.append(Button.RIGHT_PLUS)
-        buttons_that_should_not_pressed.remove(Button.RIGHT_PLUS)
+        buttons |= _BUTTON_RIGHT_PLUS
     if '-' in code_items[2]:
-        buttons_that_are_pressed.append(Button.RIGHT_MINUS)
-        buttons_that_should_not_pressed.remove(Button.RIGHT_MINUS)
+        buttons |= _BUTTON_RIGHT_MINUS
     if 'c' in code_items[2]:
-        buttons_that_are_pressed.append(Button.RIGHT)
-        buttons_that_should_not_pressed.remove(Button.RIGHT)
+        buttons |= _BUTTON_RIGHT
 
-    return buttons_that_are_pressed, buttons_that_should_not_pressed
+    if buttons == 0:
+        raise ValueError('no buttons in code ' + button_code)
+    return buttons
 
 
-PROGRAM_RESET_CODE_PRESSED, PROGRAM_RESET_CODE_NOT_PRESSED = code_to_button_press_hash(COUNTDOWN_RESET_CODE)
+class ButtonSequence:
+    """
+    A code of button chords separated by spaces, pressed one after another. Only moves on when a button goes
+    down, so a code costs nothing on the ticks in between
+    """
+
+    def __init__(self, code: str, step_timeout_ms: int):
+        self.steps = bytearray([code_to_button_press_hash(step) for step in code.split()])
+        self.step_timeout_ms = step_timeout_ms
+        self.step_index = 0
+        self.step_deadline_ms = 0
+
+    def press(self, buttons: int, now_ms: int) -> bool:
+        """
+            moves the code on, call when a button has gone down
+        :param buttons: the buttons held
+        :param now_ms:
+        :return True when the last chord of the code is matched:
+        """
+        if self.step_index and now_ms > self.step_deadline_ms:
+            self.step_index = 0
+        if buttons & ~self.steps[self.step_index]:
+            # a button that is not part of the chord, start the code again
+            self.step_index = 0
+        if buttons != self.steps[self.step_index]:
+            # not wrong yet, the rest of the chord may still be on its way
+            return False
+        self.step_index += 1
+        self.step_deadline_ms = now_ms + self.step_timeout_ms
+        if self.step_index < len(self.steps):
+            return False
+        self.step_index = 0
+        return True
 
 ##################################################################################
 # Main program
@@ -382,17 +728,20 @@ remote: "MockRemote"
 def setup_hub():
     global hub
 
+    hub_options = {}
+    if ODV_FLEET_CHANNEL is not None:
+        hub_options = {'broadcast_channel': ODV_FLEET_CHANNEL, 'observe_channels': ODV_FLEET_PEER_CHANNELS}
     try:
         # this import will fail if the city hub is not connected.
         from pybricks.hubs import CityHub
-        hub = CityHub()
+        hub = CityHub(**hub_options)
         print('Lego City Hub found')
         return False
     except ImportError as ex1:
         print(ex1)
         try:
             from pybricks.hubs import TechnicHub
-            hub = TechnicHub()
+            hub = TechnicHub(**hub_options)
             print('Lego Technic Hub found')
             return True
 
@@ -401,33 +750,67 @@ def setup_hub():
             raise Exception('This program only support Lego City hub and Lego Technic hub')
 
 
-LED_FLASHING_SEQUENCE = [75] * 5 + [1000]
+class BootTimeline:
+    """
+    When each part of start up began and ended, printed once the hub is ready to show what holds up the boot
+    """
 
+    def __init__(self):
+        self.stopwatch = StopWatch()
+        self.phases = []
+
+    def start(self, name: str):
+        self.phases.append([name, self.stopwatch.time(), -1])
+
+    def end(self, name: str):
+        for phase in self.phases:
+            if phase[0] == name:
+                phase[2] = self.stopwatch.time()
+
+    def print_timeline(self):
+        print('--boot timeline ms')
+        for name, start, end in self.phases:
+            print('  {:<10}{:>6} -{:>6}{:>7}'.format(name, start, end, end - start))
+
+
+# boot gives up looking for the remote after this many scans, input_task carries on looking with full scans
+_BOOT_REMOTE_SCANS: int = const(5)
+_READY_TIMEOUT_MS: int = const(500)
 
-def setup_remote(error_flash_code_helper, retry=5):
-    global hub
-    global remote
 
+async def connect_remote(boot_timeline: BootTimeline):
+    """looks for the remote in short scans, the motors start up in between"""
+    global hub
+    boot_timeline.start('remote')
     # Flashing led while waiting connection
     hub.light.blink(Color.WHITE, LED_FLASHING_SEQUENCE)
+    for remote_retry_count in range(1, _BOOT_REMOTE_SCANS + 1):
+        print("--looking for remote try " + str(remote_retry_count))
+        if remote_input.connect():
+            break
+        await wait(0)
+    else:
+        # carry on without it, input_task keeps looking
+        remote_input.lose()
+    boot_timeline.end('remote')
 
-    # try to connect to remote multiple times
-    remote_retry_count = 1
 
-    while True:
-        # noinspection PyBroadException
-        try:
-            print("--looking for remote try " + str(remote_retry_count))
-            # Connect to the remote
-            remote = Remote()
-            print("--remote connected.")
-            break
-        except:
-            if remote_retry_count >= retry:
-                error_flash_code_helper.set_error_no_remote()
-                raise  # ignore first 20 errors
-        remote_retry_count += 1
-        wait(50)
+async def start_up_motors(drive_motors: MotorHelper, boot_timeline: BootTimeline):
+    """the vehicle's calibration"""
+    boot_timeline.start('calibrate')
+    await drive_motors.start_up()
+    boot_timeline.end('calibrate')
+
+
+async def wait_until_ready(boot_timeline: BootTimeline):
+    """waits for the hub's motion sensor to settle, a City hub has none"""
+    global hub
+    boot_timeline.start('ready')
+    imu = getattr(hub, 'imu', None)
+    stopwatch = StopWatch()
+    while imu is not None and not imu.ready() and stopwatch.time() < _READY_TIMEOUT_MS:
+        await wait(10)
+    boot_timeline.end('ready')
 
 
 ##################################################################################
@@ -465,14 +848,14 @@ class RunSkidSteerMotors(MotorHelper):
         self.drive_speed = drive_speed
         self.last_side = None
         try:
-            self.left_motor = DCMotor(self.left_motor_port, positive_direction=self.left_motor_direction)
+            self.left_motor = Actuator(DCMotor(self.left_motor_port, positive_direction=self.left_motor_direction))
         except OSError as ex:
             if ex.errno == ENODEV:
                 print('Motor needs to be connected to ' + str(self.left_motor_port))
                 self.error_flash_code.set_error_no_motor_on_a()
             raise
         try:
-            self.right_motor = DCMotor(self.right_motor_port, positive_direction=self.right_motor_direction)
+            self.right_motor = Actuator(DCMotor(self.right_motor_port, positive_direction=self.right_motor_direction))
         except OSError as ex:
             if ex.errno == ENODEV:
                 print('Motor needs to be connected to ' + str(self.right_motor_port))
@@ -498,13 +881,13 @@ class RunSkidSteerMotors(MotorHelper):
         # normal side up
         if up_side == Side.TOP:
             print('--Top Up')
-            self.right_motor = DCMotor(self.right_motor_port, positive_direction=self.right_motor_direction)
-            self.left_motor = DCMotor(self.left_motor_port, positive_direction=self.left_motor_direction)
+            self.right_motor = Actuator(DCMotor(self.right_motor_port, positive_direction=self.right_motor_direction))
+            self.left_motor = Actuator(DCMotor(self.left_motor_port, positive_direction=self.left_motor_direction))
         # upside down
         if up_side == Side.BOTTOM:
             print('--Bottom Up')
-            self.right_motor = DCMotor(self.left_motor_port, positive_direction=self.right_motor_direction)
-            self.left_motor = DCMotor(self.right_motor_port, positive_direction=self.left_motor_direction)
+            self.right_motor = Actuator(DCMotor(self.left_motor_port, positive_direction=self.right_motor_direction))
+            self.left_motor = Actuator(DCMotor(self.right_motor_port, positive_direction=self.left_motor_direction))
 
     def handle_remote_press(self):
         """
@@ -512,27 +895,31 @@ class RunSkidSteerMotors(MotorHelper):
         """
         if self.mh__remote_disabled:
             return
-        # Check which remote_buttons are pressed.
-        remote_buttons_pressed = remote.buttons.pressed()
-        if len(remote_buttons_pressed) == 0 or Button.RIGHT in remote_buttons_pressed or Button.LEFT in remote_buttons_pressed:
+        # the buttons input_task read this tick
+        buttons = remote_input.buttons
+        if buttons == 0 or buttons & _BUTTON_STOP:
             self.stop_motors()
             return
-        # stop motors as this is bang-bang mode where a button
-        #  needs to be held down for racer to run
-        self.stop_motors()
+        # this is bang-bang mode where a button needs to be held down for racer to run,
+        #  a side with no button held stops
+        left_speed = 0
+        right_speed = 0
 
         #  handle button press
-        if Button.LEFT_PLUS in remote_buttons_pressed:
-            self.left_motor.dc(self.drive_speed)
+        if buttons & _BUTTON_LEFT_PLUS:
+            left_speed = self.drive_speed
+
+        if buttons & _BUTTON_LEFT_MINUS:
+            left_speed = -self.drive_speed
 
-        if Button.LEFT_MINUS in remote_buttons_pressed:
-            self.left_motor.dc(-self.drive_speed)
+        if buttons & _BUTTON_RIGHT_PLUS:
+            right_speed = self.drive_speed
 
-        if Button.RIGHT_PLUS in remote_buttons_pressed:
-            self.right_motor.dc(self.drive_speed)
+        if buttons & _BUTTON_RIGHT_MINUS:
+            right_speed = -self.drive_speed
 
-        if Button.RIGHT_MINUS in remote_buttons_pressed:
-            self.right_motor.dc(-self.drive_speed)
+        self.left_motor.dc(left_speed)
+        self.right_motor.dc(right_speed)
 
     # stop all motors
     def stop_motors(self):
@@ -542,67 +929,168 @@ class RunSkidSteerMotors(MotorHelper):
 
 
 
+##################################################################################
+# Tasks, each runs at its own rate and awaits between runs so none holds up the others
+##################################################################################
+
+_INPUT_TASK_MS: int = const(10)
+_STATUS_TASK_MS: int = const(20)
+_CONTROL_TASK_MS: int = const(10)
+_AUTO_DRIVE_TASK_MS: int = const(10)
+# between visitors, every task runs at this rate
+_IDLE_TASK_MS: int = const(100)
+_IDLE_AFTER_MS: int = const(5000)
+
+
+class LoopRate:
+    """
+    The tasks run at their own rate while the vehicle is in use, and all slow down to _IDLE_TASK_MS when the
+    hub has been waiting for the next visitor for _IDLE_AFTER_MS, no countdown running, no buttons held and
+    nothing driving
+    """
+
+    def __init__(self, countdown_timer: CountdownTimer, drive_motors: MotorHelper):
+        self.countdown_timer = countdown_timer
+        self.drive_motors = drive_motors
+        self.stopwatch = StopWatch()
+        self.busy_until_time = _IDLE_AFTER_MS
+        self.idle = False
+
+    def update(self):
+        """
+            checks if the hub is in use, call once per input tick
+        """
+        if (remote_input.buttons or _ACTIVE <= self.countdown_timer.countdown_status <= _FINAL_20_SECS or
+                self.drive_motors.mh_route_active or self.drive_motors.mh_auto_drive):
+            self.busy_until_time = self.stopwatch.time() + _IDLE_AFTER_MS
+            self.idle = False
+        elif not self.idle and self.stopwatch.time() > self.busy_until_time:
+            self.idle = True
+
+    def tick_ms(self, busy_ms: int) -> int:
+        """
+        :param busy_ms: the task's own rate
+        :return ms to wait before the task runs again:
+        """
+        return _IDLE_TASK_MS if self.idle else busy_ms
+
+
+async def input_task(countdown_timer: CountdownTimer, loop_rate: LoopRate):
+    """
+    reads the remote once per tick for every handler, then the countdown start and reset buttons. Looks for
+    the remote again when it is lost
+    """
+    while True:
+        if REMOTE_DISABLED:
+            pass
+        elif remote_input.connected:
+            remote_input.sample()
+            countdown_timer.check_remote_buttons()
+        else:
+            lost_ms = remote_input.reconnect()
+            if lost_ms:
+                countdown_timer.resume(lost_ms)
+            else:
+                await wait(_REMOTE_RETRY_MS)
+        loop_rate.update()
+        await wait(loop_rate.tick_ms(_INPUT_TASK_MS))
+
+
+async def status_task(countdown_timer: CountdownTimer, loop_rate: LoopRate):
+    """countdown lights"""
+    while True:
+        countdown_timer.show_status()
+        await wait(loop_rate.tick_ms(_STATUS_TASK_MS))
+
+
+async def control_task(countdown_timer: CountdownTimer, drive_motors: MotorHelper, loop_rate: LoopRate):
+    """driving by remote while the countdown runs, and stopping the vehicle when it ends"""
+    while True:
+        if drive_motors.mh_auto_drive:
+            # auto_drive_task has the vehicle, the countdown still runs down and ends, leaving the cart to it
+            if not countdown_timer.has_time_remaining():
+                countdown_timer.has_session_ended()
+        # if there is no remote, then there is no point in a countdown
+        elif countdown_timer.has_time_remaining() or REMOTE_DISABLED:
+            # the end of session route finishes before homing, as it does before the remote drives
+            if drive_motors.mh_supports_homing and not drive_motors.mh_route_active:
+                await drive_motors.do_homing()
+            if drive_motors.mh_supports_flip:
+                drive_motors.handle_flip()
+            if not REMOTE_DISABLED:
+                drive_motors.handle_remote_press()
+        elif not drive_motors.mh_route_active:
+            drive_motors.stop_motors()
+            # unload and go home once when the countdown ends, not every time the cart is idle
+            if countdown_timer.has_session_ended() and drive_motors.mh_supports_homing and drive_motors.mh_is_homed:
+                drive_motors.auto_unload()
+                drive_motors.auto_home()
+                drive_motors.reset_homing()
+
+        if REMOTE_DISABLED and ODV_AUTO_DRIVE_TIMEOUT_SECS == 0:
+            print("No remote or auto drive exiting")
+            raise SystemExit
+        await wait(loop_rate.tick_ms(_CONTROL_TASK_MS))
+
+
+async def auto_drive_task(countdown_timer: CountdownTimer, drive_motors: MotorHelper, loop_rate: LoopRate):
+    """ODV routes and the automatic load/unload cycles"""
+    if not drive_motors.mh_supports_homing:
+        return
+    while True:
+        if not drive_motors.mh_auto_drive and ODV_AUTO_DRIVE_TIMEOUT_SECS > 0 and countdown_timer.remote_button_press_timed_out():
+            drive_motors.enable_auto_drive()
+        drive_motors.advance_route()
+
+        if drive_motors.mh_auto_drive and not drive_motors.mh_route_active:
+            await drive_motors.do_homing()
+            if drive_motors.mh_is_homed and not drive_motors.resume_route():
+                drive_motors.auto_unload()
+                drive_motors.auto_load()
+        await wait(loop_rate.tick_ms(_AUTO_DRIVE_TASK_MS))
+
+
+async def start_up(countdown_timer: CountdownTimer, drive_motors: MotorHelper, boot_timeline: BootTimeline):
+    """the motors start up while the remote is found, then the tasks run"""
+    if REMOTE_DISABLED:
+        print('--no remote')
+        await start_up_motors(drive_motors, boot_timeline)
+    else:
+        print('--setup remote')
+        await multitask(start_up_motors(drive_motors, boot_timeline), connect_remote(boot_timeline))
+    await wait_until_ready(boot_timeline)
+
+    print('SETUP complete')
+    boot_timeline.print_timeline()
+
+    countdown_timer.reset()
+    mem_info()
+    loop_rate = LoopRate(countdown_timer, drive_motors)
+    await multitask(input_task(countdown_timer, loop_rate), status_task(countdown_timer, loop_rate),
+                    control_task(countdown_timer, drive_motors, loop_rate),
+                    auto_drive_task(countdown_timer, drive_motors, loop_rate))
+
+
 def main():
+    boot_timeline = BootTimeline()
     error_flash_code = ErrorFlashCodes()
     print('SETUP')
     print('--setup hub')
+    boot_timeline.start('hub')
     setup_hub()
+    boot_timeline.end('hub')
     try:
         print("--setup countdown")
         countdown_timer = CountdownTimer()
         print("--setup motors")
+        boot_timeline.start('motors')
         drive_motors = RunSkidSteerMotors(error_flash_code, SKID_STEER_SPEED, SKID_STEER_SWAP_MOTOR_SIDES,
                                   SKID_STEER_REVERSE_LEFT_MOTOR, SKID_STEER_REVERSE_RIGHT_MOTOR)
 
+        boot_timeline.end('motors')
         drive_motors.mh__remote_disabled = REMOTE_DISABLED
 
-        if REMOTE_DISABLED:
-            print('--no remote')
-        else:
-            print('--setup remote')
-            setup_remote(error_flash_code)
-
-        # give everything a chance to warm up
-        wait(500)
-
-        print('SETUP complete')
-
-        countdown_timer.reset()
-        mem_info()
-        while True:
-            if not REMOTE_DISABLED:
-                countdown_timer.check_remote_buttons()
-
-            if drive_motors.mh_supports_homing:
-                if not drive_motors.mh_auto_drive and ODV_AUTO_DRIVE_TIMEOUT_SECS > 0 and countdown_timer.remote_button_press_timed_out():
-                    drive_motors.enable_auto_drive()
-
-                if drive_motors.mh_auto_drive and drive_motors.mh_is_homed:
-                    drive_motors.auto_unload()
-                    drive_motors.auto_load()
-
-            # if there is no remote, then there is no point in a countdown
-            elif countdown_timer.has_time_remaining() or REMOTE_DISABLED:
-                if drive_motors.mh_supports_homing:
-                    drive_motors.do_homing()
-                if drive_motors.mh_supports_flip:
-                    drive_motors.handle_flip()
-                if not REMOTE_DISABLED:
-                    drive_motors.handle_remote_press()
-            else:
-                drive_motors.stop_motors()
-                if drive_motors.mh_supports_homing:
-                    drive_motors.auto_unload()
-                    drive_motors.auto_home()
-                    drive_motors.reset_homing()
-
-            countdown_timer.show_status()
-            # add a small delay to keep the loop stable and allow for events to occur
-            wait(10)
-
-            if REMOTE_DISABLED and ODV_AUTO_DRIVE_TIMEOUT_SECS == 0:
-                print("No remote or auto drive exiting")
-                raise SystemExit
+        run_task(start_up(countdown_timer, drive_motors, boot_timeline))
 
     except Exception as e:
         print(e)
@@ -0,0 +1,289 @@
+"""
+Offline analysis of an ODV_GRID layout, to compare candidate layouts before building them.
+
+Checks that home, every load and every unload station can reach each other, plans the routes the ODV
+would drive with the program's own planner and station scheduler, and estimates the auto-drive
+unload/load cycle time from the motor speed, acceleration and gear ratio constants in vehicle_odv.py.
+An annotated PNG in the style of images/odv_grid_*.png shows the cycle route and how long the cart spends
+on each tile per cycle. Run compile_pybricks_files first.
+
+    cd modules && python analyze_odv_grid.py                      # ODV_GRID from vehicle_odv.py
+    cd modules && python analyze_odv_grid.py "H##X" "LX#U" "###X" --output candidate.png
+"""
+import argparse
+import contextlib
+import math
+import struct
+import zlib
+from pathlib import Path
+
+from benchmark_odv_grid_memory import DiscardOutput
+from pybricks_simulator import load_program
+
+LOOP_MS = 10  # main loop tick, each route step waits up to one tick to start
+
+TILE_PX = 40
+MARGIN_PX = 8
+FONT_SCALE = 2
+BORDER = (0, 0, 0)
+BACKGROUND = (255, 255, 255)
+TRACK_FILL = (208, 208, 208)
+LOAD_FILL = (146, 208, 80)
+UNLOAD_FILL = (237, 125, 49)
+TEXT = (0, 0, 0)
+ROUTE = (31, 78, 160)
+HEAT_COOL = (255, 242, 204)
+HEAT_HOT = (232, 96, 72)
+
+# 3x5 pixel glyphs
+FONT = {
+    '0': ["###", "#.#", "#.#", "#.#", "###"], '1': [".#.", "##.", ".#.", ".#.", "###"],
+    '2': ["###", "..#", "###", "#..", "###"], '3': ["###", "..#", "###", "..#", "###"],
+    '4': ["#.#", "#.#", "###", "..#", "..#"], '5': ["###", "#..", "###", "..#", "###"],
+    '6': ["###", "#..", "###", "#.#", "###"], '7': ["###", "..#", "..#", "..#", "..#"],
+    '8': ["###", "#.#", "###", "#.#", "###"], '9': ["###", "#.#", "###", "..#", "###"],
+    '.': ["...", "...", "...", "...", ".#."], 'H': ["#.#", "#.#", "###", "#.#", "#.#"],
+    'L': ["#..", "#..", "#..", "#..", "###"], 'U': ["#.#", "#.#", "#.#", "#.#", "###"],
+}
+
+
+class MoveModel:
+    """trapezoid speed profile of one axis move, as driven by run_target"""
+
+    def __init__(self, max_speed: float, acceleration: float):
+        self.max_speed = max_speed
+        self.acceleration = acceleration
+
+    def time_at(self, position: float, distance: float) -> float:
+        """
+            seconds from the start of a move of distance degrees until the cart is at position degrees
+        """
+        position = min(max(position, 0.0), distance)
+        ramp = min(self.max_speed ** 2 / (2 * self.acceleration), distance / 2)
+        peak_speed = math.sqrt(2 * self.acceleration * ramp)
+        ramp_time = peak_speed / self.acceleration
+        if position <= ramp:
+            return math.sqrt(2 * position / self.acceleration)
+        if position <= distance - ramp:
+            return ramp_time + (position - ramp) / peak_speed
+        remaining = distance - position
+        return 2 * ramp_time + (distance - 2 * ramp) / peak_speed - math.sqrt(2 * remaining / self.acceleration)
+
+    def move_ms(self, distance: float) -> float:
+        return self.time_at(distance, distance) * 1000
+
+
+class GridAnalysis:
+    def __init__(self, program, grid: list[str]):
+        self.program = program
+        self.grid = grid
+        with contextlib.redirect_stdout(DiscardOutput()):
+            self.odv = program.RunODVMotors(program.ErrorFlashCodes(), program.ODV_SPEED, grid,
+                                            gear_ratio_to_grid=program.ODV_GEAR_RATIO_TO_GRID)
+        self.model = MoveModel(program._MAX_MOTOR_ROT_SPEED, self.odv.motor_x.control.limits()[1])
+        # the slower axis, as the route planner assumes
+        self.tile_deg = program._FINE_GRID_SIZE * max(self.odv.gear_ratio_to_grid)
+        self.tile_ms = {}
+        """estimated ms the cart spends on each tile per cycle"""
+
+    def reachability(self) -> list[tuple[str, tuple[int, int], str, tuple[int, int], int]]:
+        """
+        :return (name, tile, name, tile, tiles to drive) for home to every station and every load to every
+        unload station, tiles is program._UNREACHABLE if there is no path:
+        """
+        odv = self.odv
+        pairs = [('H', odv.home_tile, 'U', station) for station in odv.unload_tiles]
+        pairs += [('H', odv.home_tile, 'L', station) for station in odv.load_tiles]
+        pairs += [('L', load, 'U', unload) for load in odv.load_tiles for unload in odv.unload_tiles]
+        return [(a, tile_a, b, tile_b, odv._station_distance_(tile_a, tile_b)) for a, tile_a, b, tile_b in pairs]
+
+    def route(self, start_tile: tuple[int, int], end_tile: tuple[int, int]) -> list[tuple[tuple[int, int], int]]:
+        with contextlib.redirect_stdout(DiscardOutput()):
+            return self.odv._lowest_cost_path_to_grid_tile(start_tile, end_tile)
+
+    def drive_ms(self, path: list[tuple[tuple[int, int], int]], record: bool) -> float:
+        """
+            estimated time to drive a path as the route executor does, one move per straight run
+        :param record: add the time spent on each tile to tile_ms
+        """
+        total = 0.0
+        waypoints = self.program.collapse_tile_path(path)
+        tile_index = 0
+        for i in range(1, len(waypoints)):
+            tiles = abs(waypoints[i][0][0] - waypoints[i - 1][0][0]) + abs(waypoints[i][0][1] - waypoints[i - 1][0][1])
+            distance = tiles * self.tile_deg
+            total += LOOP_MS + self.model.move_ms(distance)
+            if record:
+                # each tile gets the time the cart centre is within half a tile of its centre
+                for k in range(tiles + 1):
+                    spent = (self.model.time_at((k + 0.5) * self.tile_deg, distance)
+                             - self.model.time_at((k - 0.5) * self.tile_deg, distance)) * 1000
+                    self._record_(path[tile_index + k][0], spent)
+            tile_index += tiles
+        return total
+
+    def transfer_ms(self, station: tuple[int, int], loading: bool, record: bool) -> float:
+        """into the station, dwell and back out, without a sensor the whole dwell is waited"""
+        push = (3 if loading else 4) * self.odv.gear_ratio_to_grid[0]
+        total = 2 * (LOOP_MS + self.model.move_ms(push)) + self.program.ODV_TRANSFER_DWELL_MS
+        if record:
+            self._record_(station, total)
+        return total
+
+    def _record_(self, tile: tuple[int, int], ms: float):
+        self.tile_ms[tile] = self.tile_ms.get(tile, 0.0) + ms
+
+    def cycle(self) -> tuple[list, float, float]:
+        """
+            the stations the scheduler picks and the estimated steady state unload to unload cycle
+        :return legs as (start, end, path, ms), first drive from home ms, cycle ms:
+        """
+        odv = self.odv
+        first_unload = odv._pick_station_(odv.home_tile, odv.unload_tiles, odv.load_tiles)
+        if first_unload is None:
+            return [], 0.0, 0.0
+        load = odv._pick_station_(first_unload, odv.load_tiles, odv.unload_tiles)
+        if load is None:
+            return [], 0.0, 0.0
+        unload = odv._pick_station_(load, odv.unload_tiles, odv.load_tiles)
+        home_ms = self.drive_ms(self.route(odv.home_tile, first_unload), False)
+        legs = []
+        cycle_ms = 0.0
+        for start, end, loading in ((unload, load, True), (load, unload, False)):
+            path = self.route(start, end)
+            ms = self.drive_ms(path, True) + self.transfer_ms(end, loading, True)
+            legs.append((start, end, path, ms))
+            cycle_ms += ms
+        return legs, home_ms, cycle_ms
+
+
+class Image:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(BACKGROUND * (width * height))
+
+    def fill(self, left: int, top: int, width: int, height: int, colour: tuple[int, int, int]):
+        for y in range(max(top, 0), min(top + height, self.height)):
+            start = (y * self.width + max(left, 0)) * 3
+            end = (y * self.width + min(left + width, self.width)) * 3
+            self.pixels[start:end] = bytes(colour) * ((end - start) // 3)
+
+    def line(self, start: tuple[int, int], end: tuple[int, int], colour: tuple[int, int, int], thickness: int):
+        steps = max(abs(end[0] - start[0]), abs(end[1] - start[1]), 1)
+        for i in range(steps + 1):
+            x = start[0] + (end[0] - start[0]) * i // steps
+            y = start[1] + (end[1] - start[1]) * i // steps
+            self.fill(x - thickness // 2, y - thickness // 2, thickness, thickness, colour)
+
+    def text(self, left: int, top: int, text: str, colour: tuple[int, int, int]):
+        for character in text:
+            for row, bits in enumerate(FONT[character]):
+                for column, bit in enumerate(bits):
+                    if bit == '#':
+                        self.fill(left + column * FONT_SCALE, top + row * FONT_SCALE, FONT_SCALE, FONT_SCALE,
+                                  colour)
+            left += 4 * FONT_SCALE
+
+    def save(self, path: str):
+        raw = b''.join(b'\x00' + bytes(self.pixels[y * self.width * 3:(y + 1) * self.width * 3])
+                       for y in range(self.height))
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+        with open(path, 'wb') as png:
+            png.write(b'\x89PNG\r\n\x1a\n')
+            png.write(chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0)))
+            png.write(chunk(b'IDAT', zlib.compress(raw, 9)))
+            png.write(chunk(b'IEND', b''))
+
+
+def heat_colour(fraction: float) -> tuple[int, int, int]:
+    return tuple(int(cool + (hot - cool) * fraction) for cool, hot in zip(HEAT_COOL, HEAT_HOT))
+
+
+def render(analysis: GridAnalysis, legs: list, path: str):
+    odv = analysis.odv
+    image = Image(odv.coarse_grid_width * TILE_PX + 2 * MARGIN_PX, odv.coarse_grid_height * TILE_PX + 2 * MARGIN_PX)
+    # stations are coloured by type, the heatmap spreads the driven tiles from coolest to hottest
+    driven = [ms for tile, ms in analysis.tile_ms.items() if odv._get_tile_type_(*tile) not in 'LU'] or [0]
+    coolest = min(driven)
+    spread = max(max(driven) - coolest, 1)
+    for y in range(odv.coarse_grid_height):
+        for x in range(odv.coarse_grid_width):
+            tile_type = odv._get_tile_type_(x, y)
+            if tile_type == analysis.program.WALL:
+                continue
+            left = MARGIN_PX + x * TILE_PX
+            top = MARGIN_PX + y * TILE_PX
+            if tile_type == analysis.program.LOAD:
+                colour = LOAD_FILL
+            elif tile_type == analysis.program.UNLOAD:
+                colour = UNLOAD_FILL
+            elif (x, y) in analysis.tile_ms:
+                colour = heat_colour((analysis.tile_ms[(x, y)] - coolest) / spread)
+            else:
+                colour = TRACK_FILL
+            image.fill(left, top, TILE_PX + 1, TILE_PX + 1, BORDER)
+            image.fill(left + 1, top + 1, TILE_PX - 1, TILE_PX - 1, colour)
+
+    # route through the tile centres
+    for _, _, tile_path, _ in legs:
+        for i in range(1, len(tile_path)):
+            start, end = tile_path[i - 1][0], tile_path[i][0]
+            image.line((MARGIN_PX + start[0] * TILE_PX + TILE_PX // 2, MARGIN_PX + start[1] * TILE_PX + TILE_PX // 2),
+                       (MARGIN_PX + end[0] * TILE_PX + TILE_PX // 2, MARGIN_PX + end[1] * TILE_PX + TILE_PX // 2),
+                       ROUTE, 3)
+
+    # labels, the tile type and seconds spent on the tile per cycle
+    for y in range(odv.coarse_grid_height):
+        for x in range(odv.coarse_grid_width):
+            left = MARGIN_PX + x * TILE_PX
+            top = MARGIN_PX + y * TILE_PX
+            tile_type = odv._get_tile_type_(x, y)
+            if tile_type in 'HLU':
+                image.text(left + 4, top + 4, tile_type, TEXT)
+            if (x, y) in analysis.tile_ms:
+                image.text(left + 4, top + TILE_PX - 14, f"{analysis.tile_ms[(x, y)] / 1000:.1f}", TEXT)
+    image.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('rows', nargs='*', help="grid rows, default ODV_GRID in vehicle_odv.py")
+    parser.add_argument('--output', default=str(Path(Path(__file__).parent.resolve(), 'odv_grid_analysis.png')),
+                        help="annotated PNG to write, default odv_grid_analysis.png next to this script")
+    args = parser.parse_args()
+
+    program = load_program('odv')
+    grid = args.rows if args.rows else program.ODV_GRID
+    analysis = GridAnalysis(program, grid)
+    odv = analysis.odv
+    print(f"grid {grid}")
+    print(f"motor {program._MAX_MOTOR_ROT_SPEED} deg/s, {analysis.model.acceleration} deg/s/s, "
+          f"{odv.gear_ratio_to_grid[0]}, {odv.gear_ratio_to_grid[1]} deg/pitch, {analysis.tile_deg} deg/tile")
+
+    all_reachable = len(odv.load_tiles) > 0 and len(odv.unload_tiles) > 0
+    print("reachability")
+    for name, tile, other_name, other_tile, tiles in analysis.reachability():
+        reachable = tiles != program._UNREACHABLE
+        all_reachable = all_reachable and reachable
+        print(f"  {name} {tile} -> {other_name} {other_tile}: {f'{tiles} tiles' if reachable else 'NOT REACHABLE'}")
+    if not all_reachable:
+        print("layout cannot run auto-drive, every H, L and U must be reachable and there must be an L and a U")
+        return
+
+    legs, home_ms, cycle_ms = analysis.cycle()
+    print("routes")
+    print(f"  home -> first unload: {home_ms / 1000:.1f}s")
+    for start, end, tile_path, ms in legs:
+        turns = max(len(program.collapse_tile_path(tile_path)) - 2, 0)
+        print(f"  {start} -> {end}: {len(tile_path) - 1} tiles, {turns} turns, {ms / 1000:.1f}s with the transfer")
+    print(f"cycle {cycle_ms / 1000:.1f}s, {60000 / cycle_ms:.1f} loads a minute")
+    render(analysis, legs, args.output)
+    print(f"saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
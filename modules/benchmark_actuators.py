@@ -0,0 +1,89 @@
+"""
+Motor and light commands each vehicle sends while driven from the remote, against the commands the actuator
+wrappers dropped because they repeated the last one.
+
+Each vehicle runs the program's input and control tasks through a scripted minute of remote presses, held
+buttons, releases and idle time, with the countdown running. Run compile_pybricks_files first.
+"""
+import contextlib
+
+from benchmark_odv_grid_memory import DiscardOutput
+from pybricks_simulator import Button, clock, load_program, multitask, run_task
+
+# (buttons held, ms) repeated for the run
+REMOTE_SCRIPT = [
+    ((Button.LEFT_PLUS,), 2000),
+    ((), 1000),
+    ((Button.LEFT_PLUS, Button.RIGHT_PLUS), 1500),
+    ((Button.LEFT_MINUS,), 1000),
+    ((Button.RIGHT_MINUS,), 500),
+    ((), 3000),
+]
+RUN_MS = 60000
+ODV_GRID = ["H######", "L#####U", "#######"]
+
+
+def make_vehicle(program, vehicle: str):
+    """the vehicle's motor helper, set up as its DRIVE_SETUP section does"""
+    flash = program.ErrorFlashCodes()
+    if vehicle == 'servo':
+        return program.RunServoSteerMotors(flash, program.SERVO_STEER_SPEED, program.SERVO_STEER_TURN_ANGLE,
+                                           False, False)
+    if vehicle == 'train':
+        return program.RunTrainMotor(flash, program.TRAIN_MOTOR_MIN_SPEED, program.TRAIN_MOTOR_MAX_SPEED,
+                                     program.TRAIN_MOTOR_SPEED_STEP, False, True)
+    if vehicle == 'skid_steer':
+        return program.RunSkidSteerMotors(flash, program.SKID_STEER_SPEED, False, False, False)
+    odv = program.RunODVMotors(flash, program.ODV_SPEED, ODV_GRID)
+    tile_angle = odv._tile_to_angle((3, 1))
+    odv.motor_x.reset_angle(tile_angle[0])
+    odv.motor_y.reset_angle(tile_angle[1] + odv.gear_ratio_to_grid[1])
+    odv.set_is_homed()
+    return odv
+
+
+def actuators(drive_motors) -> list:
+    """the Actuator wrapped motors and lights of a vehicle"""
+    return [value for value in vars(drive_motors).values() if hasattr(value, 'commands_saved')]
+
+
+def run(vehicle: str) -> tuple[int, int, int]:
+    """
+        drive the vehicle through REMOTE_SCRIPT for RUN_MS
+    :return commands sent, commands saved, motor commands the simulated motors received:
+    """
+    clock.reset()
+    with contextlib.redirect_stdout(DiscardOutput()):
+        program = load_program(vehicle)
+        drive_motors = make_vehicle(program, vehicle)
+        countdown_timer = program.CountdownTimer()
+        countdown_timer.reset()
+        countdown_timer.__start_countdown__()
+        for actuator in actuators(drive_motors):
+            actuator.commands_sent = actuator.commands_saved = 0
+        motor_commands = clock.commands
+
+        async def remote_script():
+            while True:
+                for buttons, ms in REMOTE_SCRIPT:
+                    program.remote.buttons.held = buttons
+                    await program.wait(ms)
+
+        loop_rate = program.LoopRate(countdown_timer, drive_motors)
+        run_task(multitask(program.input_task(countdown_timer, loop_rate),
+                           program.control_task(countdown_timer, drive_motors, loop_rate), remote_script()),
+                 until_ms=clock.time + RUN_MS)
+    sent = sum(actuator.commands_sent for actuator in actuators(drive_motors))
+    saved = sum(actuator.commands_saved for actuator in actuators(drive_motors))
+    return sent, saved, clock.commands - motor_commands
+
+
+def main():
+    print(f"{'vehicle':<10} {'sent':>6} {'saved':>6} {'saved %':>7} {'motor commands':>14}")
+    for vehicle in ['servo', 'train', 'skid_steer', 'odv']:
+        sent, saved, motor_commands = run(vehicle)
+        print(f"{vehicle:<10} {sent:>6} {saved:>6} {100 * saved / (sent + saved):>6.1f}% {motor_commands:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Planning time and peak heap of the flat ODV path planners against the cluster planner on generated
+maze-like grids.
+
+Flat planners search every tile of the grid for each route. The cluster planner searches the precomputed
+cluster entrances and only plans tiles for the segment being driven, so the first segment is all that is
+needed before the cart can set off. Times and sizes are CPython ones, compare the columns rather than
+reading them as hub figures. Run compile_pybricks_files first.
+"""
+import contextlib
+import random
+import time
+
+from benchmark_odv_grid_memory import DiscardOutput, maze_grid, measure
+from benchmark_odv_paths import bfs_path_to_grid_tile
+from pybricks_simulator import clock, load_program
+
+GRID_SIZES = [20, 40, 60]
+ROUTES = 10  # random start and end tiles per grid
+
+
+def timed(function, *args) -> tuple[float, int, object]:
+    """
+        run function twice, once for the time and once for the peak heap, tracemalloc slows it down
+    :return ms, peak bytes, result:
+    """
+    start = time.perf_counter()
+    function(*args)
+    ms = (time.perf_counter() - start) * 1000
+    peak, result = measure(function, *args)
+    return ms, peak, result
+
+
+def plan_first_segment(odv, start_tile: tuple[int, int], end_tile: tuple[int, int]) -> list:
+    """what the cluster planner does before the cart sets off, the entrances then the first segment"""
+    odv.cluster_paths = {}
+    waypoints = odv._cluster_path_to_grid_tile(start_tile, end_tile)
+    return odv._refine_segment_(waypoints[0], waypoints[1]) if len(waypoints) > 1 else []
+
+
+def plan_all_segments(odv, start_tile: tuple[int, int], end_tile: tuple[int, int]) -> int:
+    """tiles driven once every segment of the cluster path has been planned"""
+    odv.cluster_paths = {}
+    waypoints = odv._cluster_path_to_grid_tile(start_tile, end_tile)
+    tiles = 0
+    for i in range(1, len(waypoints)):
+        tiles += len(odv._refine_segment_(waypoints[i - 1], waypoints[i])) - 1
+    return tiles
+
+
+def main():
+    program = load_program('odv')
+    rng = random.Random(1)
+    print(f"{'grid':<6} {'entrances':>9} {'setup ms':>8} | {'bfs ms':>7} {'bfs peak':>8} | "
+          f"{'cost ms':>7} {'cost peak':>9} | {'cluster ms':>10} {'peak':>6} | {'tiles +%':>8}")
+    for size in GRID_SIZES:
+        grid = maze_grid(size)
+        clock.reset()
+        with contextlib.redirect_stdout(DiscardOutput()):
+            start = time.perf_counter()
+            odv = program.RunODVMotors(program.ErrorFlashCodes(), program.ODV_SPEED, grid)
+            setup_ms = (time.perf_counter() - start) * 1000
+        tiles = [(x, y) for y in range(size) for x in range(size) if grid[y][x] != 'X']
+        totals = [0.0] * 6
+        flat_tiles = cluster_tiles = 0
+        for _ in range(ROUTES):
+            start_tile, end_tile = rng.sample(tiles, 2)
+            with contextlib.redirect_stdout(DiscardOutput()):
+                bfs_ms, bfs_peak, bfs_path = timed(bfs_path_to_grid_tile, program, odv, start_tile, end_tile)
+                cost_ms, cost_peak, _ = timed(odv._lowest_cost_path_to_grid_tile, start_tile, end_tile)
+                cluster_ms, cluster_peak, _ = timed(plan_first_segment, odv, start_tile, end_tile)
+                cluster_tiles += plan_all_segments(odv, start_tile, end_tile)
+            flat_tiles += len(bfs_path) - 1
+            for i, value in enumerate([bfs_ms, bfs_peak, cost_ms, cost_peak, cluster_ms, cluster_peak]):
+                totals[i] += value
+        bfs_ms, bfs_peak, cost_ms, cost_peak, cluster_ms, cluster_peak = [total / ROUTES for total in totals]
+        longer = 100 * (cluster_tiles - flat_tiles) / flat_tiles
+        print(f"{size}x{size:<3} {len(odv.cluster_nodes):>9} {setup_ms:>8.0f} | {bfs_ms:>7.1f} {bfs_peak:>8.0f} | "
+              f"{cost_ms:>7.1f} {cost_peak:>9.0f} | {cluster_ms:>10.1f} {cluster_peak:>6.0f} | {longer:>7.1f}%")
+
+
+if __name__ == '__main__':
+    main()
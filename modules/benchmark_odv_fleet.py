@@ -0,0 +1,101 @@
+"""
+Simulated load/unload cycles of one to three ODVs sharing a grid with two load and two unload stations, so the
+carts compete for stations and cross each other's drives.
+
+Each cart is its own copy of the program on its own simulated hub, broadcasting its tile reservations
+on its own channel and observing the others, all driven from one simulated main loop. Every loop the
+carts' positions are compared and two carts closer than a cart's size on both axes count as a collision.
+The carts without a fleet channel show what happens when they plan without each other. Motor commands
+of all the carts share the one simulated clock, so compare the rows rather than reading them as hub
+figures. Run compile_pybricks_files first.
+"""
+import contextlib
+
+from benchmark_odv_grid_memory import DiscardOutput
+from pybricks_simulator import clock, load_program, wait
+
+FLEET_GRID = ["L#####U", "#X#X#X#", "#######", "#X#X#X#", "L#####U"]
+START_TILES = [(3, 2), (0, 2), (6, 2)]
+RUN_MS = 300000
+LOOP_MS = 10
+
+
+def make_carts(count: int, use_fleet: bool, grid: list[str] = FLEET_GRID,
+               start_tiles: list[tuple[int, int]] = START_TILES) -> tuple[list, int]:
+    """
+        a RunODVMotors per cart, homed and standing on its start tile
+    :return carts, cart size in motor degrees:
+    """
+    carts = []
+    channels = list(range(1, count + 1))
+    for channel, start_tile in zip(channels, start_tiles):
+        peers = [peer for peer in channels if peer != channel]
+        hub_options = {'broadcast_channel': channel, 'observe_channels': peers} if use_fleet else {}
+        program = load_program('odv', **hub_options)
+        odv = program.RunODVMotors(program.ErrorFlashCodes(), program.ODV_SPEED, grid,
+                                   fleet_channel=channel if use_fleet else None, fleet_peer_channels=peers)
+        odv.mh__remote_disabled = True
+        tile_angle = odv._tile_to_angle(start_tile)
+        odv.motor_x.reset_angle(tile_angle[0])
+        odv.motor_y.reset_angle(tile_angle[1] + odv.gear_ratio_to_grid[1])
+        odv.set_is_homed()
+        carts.append(odv)
+    return carts, program._ODV_SIZE * max(carts[0].gear_ratio_to_grid)
+
+
+def drive(carts: list, cart_size: int, run_ms: int) -> tuple[list[int], int]:
+    """
+        drive the carts round load/unload cycles until the clock reaches run_ms
+    :return cycles of each cart, collisions:
+    """
+    cycles = [0] * len(carts)
+    collisions = 0
+    was_loaded = [False] * len(carts)
+    colliding = set()
+    while clock.time < run_ms:
+        for i, odv in enumerate(carts):
+            if not odv.mh_route_active:
+                odv.auto_unload()
+                odv.auto_load()
+            odv.advance_route()
+            if was_loaded[i] and not odv.has_load:
+                cycles[i] += 1
+            was_loaded[i] = odv.has_load
+        for i in range(len(carts)):
+            for j in range(i + 1, len(carts)):
+                close = (abs(carts[i].motor_x.angle() - carts[j].motor_x.angle()) < cart_size and
+                         abs(carts[i].motor_y.angle() - carts[j].motor_y.angle()) < cart_size)
+                # count each time two carts run into each other once
+                if close and (i, j) not in colliding:
+                    collisions += 1
+                    colliding.add((i, j))
+                elif not close:
+                    colliding.discard((i, j))
+        wait(LOOP_MS)
+    return cycles, collisions
+
+
+def run(count: int, use_fleet: bool) -> tuple[int, int]:
+    """
+        drive the carts round load/unload cycles for RUN_MS
+    :return cycles, collisions:
+    """
+    clock.reset()
+    with contextlib.redirect_stdout(DiscardOutput()):
+        cycles, collisions = drive(*make_carts(count, use_fleet), RUN_MS)
+    return sum(cycles), collisions
+
+
+def main():
+    print(f"{'carts':>5} {'fleet':>5} {'cycles':>6} {'per cart':>8} {'collisions':>10}")
+    for count in range(1, len(START_TILES) + 1):
+        for use_fleet in (False, True):
+            if count == 1 and use_fleet:
+                continue
+            cycles, collisions = run(count, use_fleet)
+            print(f"{count:>5} {'yes' if use_fleet else 'no':>5} {cycles:>6} {cycles / count:>8.1f} "
+                  f"{collisions:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Heap used by the ODV grid and path planners on generated maze-like grids of 8x8 to 40x40 tiles.
+
+Compares the previous representation, the ODV_GRID strings plus a list of (x, y) track tuples with a
+BFS that copies the path for every queued tile, against everything RunODVMotors now keeps for the grid:
+the 2 bit per tile bytearray, the collision cells, a distance field per station and the cluster entrance
+lists. The route peak is the planner the ODV uses on each grid, the lowest cost planner up to 8x8 tiles and
+the cluster entrances then each segment above that. Storage is measured with sys.getsizeof, with small ints
+counted in the list slot that holds them as on a hub, and planner peaks with tracemalloc, both on CPython where
+objects are larger than on a hub, so compare the columns rather than reading them as hub bytes. Run
+compile_pybricks_files first.
+"""
+import contextlib
+import random
+import sys
+import tracemalloc
+
+from pybricks_simulator import clock, load_program
+
+GRID_SIZES = [8, 10, 20, 40]
+
+
+def maze_grid(size: int, seed: int = 1, loop_chance: float = 0.2) -> list[str]:
+    """
+        a size x size maze, single tile corridors carved by a random depth first walk with some extra walls
+        knocked through so there is more than one route, home top left, load below it, unload bottom right
+    """
+    rng = random.Random(seed)
+    rows = [['X'] * size for _ in range(size)]
+    stack = [(0, 0)]
+    rows[0][0] = '#'
+    while stack:
+        x, y = stack[-1]
+        moves = [(dx, dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                 if 0 <= x + dx < size and 0 <= y + dy < size and rows[y + dy][x + dx] == 'X']
+        if not moves:
+            stack.pop()
+            continue
+        dx, dy = rng.choice(moves)
+        rows[y + dy // 2][x + dx // 2] = '#'
+        rows[y + dy][x + dx] = '#'
+        stack.append((x + dx, y + dy))
+    for y in range(1, size - 1):
+        for x in range(1, size - 1):
+            if rows[y][x] == 'X' and rng.random() < loop_chance:
+                rows[y][x] = '#'
+    # even sized grids leave the last row and column as wall, open them up as a perimeter track
+    for i in range(size):
+        rows[size - 1][i] = '#'
+        rows[i][size - 1] = '#'
+    rows[0][0] = 'H'
+    rows[1][0] = 'L'
+    rows[size - 1][size - 1] = 'U'
+    return [''.join(row) for row in rows]
+
+
+def legacy_grid_tracks(grid: list[str]) -> list[tuple[int, int]]:
+    """the previous grid representation, one tuple per driveable tile"""
+    tracks = []
+    for y, line in enumerate(grid):
+        for x, character in enumerate(line):
+            if character in '#LU':
+                tracks.append((x, y))
+    return tracks
+
+
+def legacy_bfs(grid_tracks: list[tuple[int, int]], home_tile: tuple[int, int], start_tile: tuple[int, int],
+               end_tile: tuple[int, int]) -> list[tuple[tuple[int, int], int]]:
+    """the previous BFS, each queued tile holds its own copy of the path to it"""
+    queue = [[(start_tile, -1)]]
+    path = []
+    visited = [start_tile]
+    while queue:
+        path = queue.pop(0)
+        if path[-1][0] == end_tile:
+            break
+        for direction, (dx, dy) in ((3, (1, 0)), (1, (0, -1)), (7, (-1, 0)), (5, (0, 1))):
+            new_pos = (path[-1][0][0] + dx, path[-1][0][1] + dy)
+            if new_pos in visited:
+                continue
+            if new_pos in grid_tracks or new_pos == home_tile:
+                visited.append(new_pos)
+                queue.append(path + [(new_pos, direction)])
+    return path
+
+
+class DiscardOutput:
+    """stdout that keeps nothing, so printing does not show up in the heap"""
+
+    def write(self, text: str):
+        pass
+
+    def flush(self):
+        pass
+
+
+def size_of(items: list) -> int:
+    """bytes held by a list and the items in it"""
+    return sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)
+
+
+def deep_size_of(item) -> int:
+    """bytes held by an object and, for lists, tuples and dicts, everything in it but small ints"""
+    if isinstance(item, int) and -(1 << 30) <= item < (1 << 30):
+        return 0
+    size = sys.getsizeof(item)
+    if isinstance(item, (list, tuple)):
+        size += sum(deep_size_of(member) for member in item)
+    elif isinstance(item, dict):
+        size += sum(deep_size_of(key) + deep_size_of(value) for key, value in item.items())
+    return size
+
+
+def grid_storage(odv) -> dict[str, int]:
+    """bytes of each grid structure RunODVMotors keeps between routes"""
+    return {
+        'tile bits': deep_size_of(odv.tile_bits),
+        'cells': deep_size_of(odv.cell_bits),
+        'stations': deep_size_of(odv.station_distances),
+        'clusters': (deep_size_of(odv.cluster_nodes) + deep_size_of(odv.cluster_node_edges) +
+                     deep_size_of(odv.cluster_members) + deep_size_of(odv.cluster_paths)),
+    }
+
+
+def plan_route(odv, start_tile: tuple[int, int], end_tile: tuple[int, int]) -> int:
+    """
+        plan a route as the ODV does, on a grid split into clusters the entrances then each segment as the
+        cart reaches it, keeping only one segment at a time
+    :return tiles on the route:
+    """
+    if odv.cluster_columns == 0:
+        return len(odv._lowest_cost_path_to_grid_tile(start_tile, end_tile))
+    odv.cluster_paths = {}
+    waypoints = odv._cluster_path_to_grid_tile(start_tile, end_tile)
+    tiles = 1
+    for i in range(1, len(waypoints)):
+        tiles += len(odv._refine_segment_(waypoints[i - 1], waypoints[i])) - 1
+    return tiles
+
+
+def measure(function, *args) -> tuple[int, object]:
+    """
+        peak heap while running function
+    :return peak bytes, result:
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    result = function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, result
+
+
+def main():
+    program = load_program('odv')
+    print(f"{'grid':<6} {'strings':>7} {'tracks':>7} | {'tile bits':>9} {'cells':>6} {'stations':>8} "
+          f"{'clusters':>8} {'total':>6} | {'old bfs peak':>12} {'route peak':>10} {'path':>5}")
+    for size in GRID_SIZES:
+        grid = maze_grid(size)
+        tracks = legacy_grid_tracks(grid)
+        clock.reset()
+        with contextlib.redirect_stdout(DiscardOutput()):
+            odv = program.RunODVMotors(program.ErrorFlashCodes(), program.ODV_SPEED, grid)
+            storage = grid_storage(odv)
+            start, end = odv.home_tile, odv.unload_tiles[0]
+            old_peak, old_path = measure(legacy_bfs, tracks, odv.home_tile, start, end)
+            route_peak, route_tiles = measure(plan_route, odv, start, end)
+        print(f"{size}x{size:<3} {size_of(grid):>7} {size_of(tracks):>7} | {storage['tile bits']:>9} "
+              f"{storage['cells']:>6} {storage['stations']:>8} {storage['clusters']:>8} "
+              f"{sum(storage.values()):>6} | {old_peak:>12} {route_peak:>10} {len(old_path)}/{route_tiles}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Simulated travel time of the ODV auto-drive routes for the README example grids.
+
+Compares driving a planned path one tile at a time (the previous behaviour) with driving the
+collapsed path, where straight runs are a single move, and the fewest tiles (BFS) planner, kept here as the
+baseline, with the turn penalised lowest cost planner the ODV uses. Run compile_pybricks_files first.
+"""
+import contextlib
+import io
+
+from pybricks_simulator import Stop, clock, load_program, wait
+
+README_GRIDS = {
+    'Example 1': ["H##X", "LX#U", "###X"],
+    'Example 2': ["H##X#XX", "LX###XU", "###X###"],
+    'Example 3': ["XL##XU", "H#X###"],
+}
+OPEN_GRIDS = {
+    'Open 4x7': ["H######", "L######", "#######", "######U"],
+    'Pillars': ["H###X##", "L#X####", "#####X#", "#X#####", "X####XU"],
+}
+
+
+def bfs_path_to_grid_tile(program, odv, start_tile, end_tile) -> list:
+    """
+        the fewest tiles breadth first search the ODV planned with before the lowest cost planner
+    :return (tile, direction it is entered in) from start_tile, -1 for start_tile, [] if there is no path:
+    """
+    # direction each tile was entered from, rather than a copy of the path per queued tile
+    came_from = bytearray(bytes((program._PLAN_NOT_REACHED,)) * (odv.coarse_grid_width * odv.coarse_grid_height))
+    came_from[odv._tile_index_(start_tile[0], start_tile[1])] = program._PLAN_FROM_START
+    queue = program.Queue()
+    queue.put(odv._tile_index_(start_tile[0], start_tile[1]))
+
+    found = False
+    while not queue.empty():
+        tile = odv._index_to_tile_(queue.get())
+        if tile == end_tile:
+            found = True
+            break
+        for direction in [program._EAST, program._NORTH, program._WEST, program._SOUTH]:
+            new_pos = program.position_from_direction(tile, direction)
+            if not odv._is_tile_open_(new_pos):
+                continue
+            index = odv._tile_index_(new_pos[0], new_pos[1])
+            if came_from[index] == program._PLAN_NOT_REACHED:
+                came_from[index] = direction
+                queue.put(index)
+
+    path = []
+    tile = end_tile
+    while found:
+        direction = came_from[odv._tile_index_(tile[0], tile[1])]
+        if direction == program._PLAN_FROM_START:
+            path.insert(0, (tile, -1))
+            break
+        path.insert(0, (tile, direction))
+        tile = program.position_from_direction(tile, (direction + 4) % 8)
+    return path
+
+
+def lowest_cost_path_to_grid_tile(program, odv, start_tile, end_tile) -> list:
+    """the ODV's own planner, with the same arguments as bfs_path_to_grid_tile"""
+    return odv._lowest_cost_path_to_grid_tile(start_tile, end_tile)
+
+
+def navigate_tile_by_tile(odv, program, grid_tile_path):
+    """the previous behaviour, one blocking run_target per axis per tile, chained with Stop.NONE while the
+    direction repeats"""
+    for i, path in enumerate(grid_tile_path):
+        stop = Stop.HOLD
+        if i < (len(grid_tile_path) - 1) and grid_tile_path[i + 1][1] == path[1]:
+            stop = Stop.NONE
+        tile_angle = odv._tile_to_angle(path[0])
+        odv.motor_y.run_target(program._MAX_MOTOR_ROT_SPEED, tile_angle[1] + odv.gear_ratio_to_grid[1],
+                               then=stop)
+        odv.motor_x.run_target(program._MAX_MOTOR_ROT_SPEED, tile_angle[0], then=stop)
+
+
+def navigate_collapsed(odv, program, grid_tile_path):
+    """queue the collapsed path and run the route executor as the main loop would"""
+    for waypoint in program.collapse_tile_path(grid_tile_path):
+        odv._queue_route_step_(program._STEP_TILE, waypoint[0])
+    while odv.mh_route_active:
+        odv.advance_route()
+        wait(10)
+
+
+def time_route(program, grid, legs, navigate, planner=bfs_path_to_grid_tile):
+    """
+        simulated time and motor command count to drive each leg in turn
+    :return total ms, commands, tiles, waypoints:
+    """
+    clock.reset()
+    odv = program.RunODVMotors(program.ErrorFlashCodes(), program.ODV_SPEED, grid)
+    odv.mh__remote_disabled = True
+    start = legs[0][0]
+    tile_angle = odv._tile_to_angle(getattr(odv, start))
+    odv.motor_x.reset_angle(tile_angle[0])
+    odv.motor_y.reset_angle(tile_angle[1] + odv.gear_ratio_to_grid[1])
+
+    total_ms = commands = tiles = waypoints = 0
+    for start_name, end_name in legs:
+        path = planner(program, odv, getattr(odv, start_name), getattr(odv, end_name))
+        tiles += len(path)
+        waypoints += len(program.collapse_tile_path(path))
+        start_ms, start_commands = clock.time, clock.commands
+        navigate(odv, program, path)
+        total_ms += clock.time - start_ms
+        commands += clock.commands - start_commands
+    return total_ms, commands, tiles, waypoints
+
+
+def main():
+    program = load_program('odv')
+    legs = [('home_tile', 'unload_tile'), ('unload_tile', 'load_tile'), ('load_tile', 'unload_tile')]
+    print(f"{'grid':<10} {'tiles':>5} {'moves':>5} {'per tile ms':>11} {'collapsed ms':>12} "
+          f"{'commands':>9} {'saved':>6}")
+    for name, grid in README_GRIDS.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            tile_ms, tile_commands, tiles, waypoints = time_route(program, grid, legs, navigate_tile_by_tile)
+            collapsed_ms, collapsed_commands, _, _ = time_route(program, grid, legs, navigate_collapsed)
+        saved = 100 * (tile_ms - collapsed_ms) / tile_ms
+        print(f"{name:<10} {tiles:>5} {waypoints:>5} {tile_ms:>11} {collapsed_ms:>12} "
+              f"{tile_commands:>4}/{collapsed_commands:<4} {saved:>5.1f}%")
+
+    print()
+    print(f"{'grid':<10} {'bfs tiles':>9} {'bfs ms':>7} {'cost tiles':>10} {'cost ms':>7} {'saved':>6}")
+    for name, grid in {**README_GRIDS, **OPEN_GRIDS}.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            bfs_ms, _, bfs_tiles, _ = time_route(program, grid, legs, navigate_collapsed)
+            cost_ms, _, cost_tiles, _ = time_route(program, grid, legs, navigate_collapsed,
+                                                   lowest_cost_path_to_grid_tile)
+        saved = 100 * (bfs_ms - cost_ms) / bfs_ms
+        print(f"{name:<10} {bfs_tiles:>9} {bfs_ms:>7} {cost_tiles:>10} {cost_ms:>7} {saved:>5.1f}%")
+
+
+if __name__ == '__main__':
+    main()
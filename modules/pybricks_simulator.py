@@ -0,0 +1,487 @@
+"""
+Host side simulation of the parts of the pybricks api used by the lego_vehicle_timer programs.
+
+install() registers simulated pybricks, micropython, uerrno and umath modules so the compiled
+lego_vehicle_timer_* files can be imported on a PC. Time is simulated, motors follow a trapezoidal
+speed profile and every motor command costs a small fixed overhead, so benchmarks can compare the
+time a sequence of commands would take on a hub. Inside run_task, waiting calls return awaitables as
+they do on a hub and the clock moves on once every task has had a turn.
+"""
+import importlib.util
+import math
+import struct
+import sys
+import types
+from pathlib import Path
+
+SIM_TICK_MS = 1  # simulation step
+SIM_ACCELERATION = 4000  # deg/s/s, close to the pybricks default for technic motors
+SIM_MAX_SPEED = 1500  # deg/s at 100% duty
+SIM_COMMAND_OVERHEAD_MS = 10  # time to issue one motor command from the program
+ENODEV = 19
+ETIMEDOUT = 110
+
+
+class SimClock:
+    def __init__(self):
+        self.time = 0
+        self.motors = []
+        self.commands = 0
+
+    def reset(self):
+        self.time = 0
+        SimRemote.in_range = True
+        SimRemote.switched_on_ms = 0
+        self.commands = 0
+        self.motors = []
+        _air.clear()
+
+    def advance(self, ms: int):
+        for _ in range(int(ms / SIM_TICK_MS)):
+            self.time += SIM_TICK_MS
+            for motor in self.motors:
+                motor.step(SIM_TICK_MS / 1000)
+
+    def command(self):
+        """a motor command was issued"""
+        self.commands += 1
+        self.advance(SIM_COMMAND_OVERHEAD_MS)
+
+
+clock = SimClock()
+_air = {}  # last broadcast on each channel
+
+
+class _Enum:
+    def __init__(self, name: str, *values: str):
+        for value in values:
+            setattr(self, value, f"{name}.{value}")
+
+
+Color = _Enum('Color', 'NONE', 'RED', 'ORANGE', 'YELLOW', 'GREEN', 'CYAN', 'BLUE', 'VIOLET', 'MAGENTA',
+              'WHITE')
+Button = _Enum('Button', 'LEFT_PLUS', 'LEFT_MINUS', 'LEFT', 'CENTER', 'RIGHT_PLUS', 'RIGHT_MINUS', 'RIGHT')
+Port = _Enum('Port', 'A', 'B', 'C', 'D')
+Direction = _Enum('Direction', 'CLOCKWISE', 'COUNTERCLOCKWISE')
+Stop = _Enum('Stop', 'COAST', 'BRAKE', 'HOLD', 'NONE')
+Side = _Enum('Side', 'TOP', 'BOTTOM', 'LEFT', 'RIGHT', 'FRONT', 'BACK')
+
+
+class SimAwaitable:
+    """
+        what a waiting pybricks call returns inside run_task, the program's task is suspended until done()
+        is true and the await gives result()
+    """
+
+    def __init__(self, done, result=lambda: None):
+        self.done = done
+        self.result = result
+
+    def __await__(self):
+        while not self.done():
+            yield
+        return self.result()
+
+
+_run_loop_active = False
+
+
+def wait(ms: int):
+    if _run_loop_active:
+        end = clock.time + ms
+        return SimAwaitable(lambda: clock.time >= end)
+    clock.advance(ms)
+
+
+async def multitask(*coroutines, race: bool = False):
+    """run the coroutines together, until all of them, or with race the first of them, have finished"""
+    results = [None] * len(coroutines)
+    running = list(range(len(coroutines)))
+    while True:
+        for i in list(running):
+            try:
+                coroutines[i].send(None)
+            except StopIteration as stop:
+                results[i] = stop.value
+                running.remove(i)
+                if race:
+                    for j in running:
+                        coroutines[j].close()
+                    return results
+        if len(running) == 0:
+            return results
+        await _NextTurn()
+
+
+class _NextTurn:
+    """hands back to run_task until every task has had a turn"""
+
+    def __await__(self):
+        yield
+
+
+def run_task(coroutine, until_ms: int = None):
+    """
+        run a coroutine with the simulated clock moving on SIM_TICK_MS each time every task has had a turn
+    :param until_ms: stop after this much simulated time, the program's tasks usually never end
+    """
+    global _run_loop_active
+    _run_loop_active = True
+    end = None if until_ms is None else clock.time + until_ms
+    try:
+        while end is None or clock.time < end:
+            try:
+                coroutine.send(None)
+            except StopIteration as stop:
+                return stop.value
+            clock.advance(SIM_TICK_MS)
+    finally:
+        _run_loop_active = False
+        coroutine.close()
+
+
+def run_task_for(coroutine, ms: int, until=None) -> bool:
+    """
+        run a coroutine as run_task does, but leave it to be run on later, e.g. the program's tasks between
+        changes to the remote buttons
+    :param ms: simulated time to run for
+    :param until: stop as soon as until() is true
+    :return True if until() became true, False if ms ran out or the coroutine finished:
+    """
+    global _run_loop_active
+    _run_loop_active = True
+    end = clock.time + ms
+    try:
+        while clock.time < end:
+            if until is not None and until():
+                return True
+            try:
+                coroutine.send(None)
+            except StopIteration:
+                return False
+            clock.advance(SIM_TICK_MS)
+    finally:
+        _run_loop_active = False
+    return until is not None and until()
+
+
+class StopWatch:
+    def __init__(self):
+        self._start = clock.time
+
+    def time(self) -> int:
+        return clock.time - self._start
+
+    def reset(self):
+        self._start = clock.time
+
+
+class SimControl:
+    def __init__(self):
+        self.speed = SIM_MAX_SPEED
+        self.acceleration = SIM_ACCELERATION
+        self.torque = 560
+
+    def limits(self, speed=None, acceleration=None, torque=None):
+        if speed is None and acceleration is None and torque is None:
+            return self.speed, self.acceleration, self.torque
+        self.speed = self.speed if speed is None else speed
+        self.acceleration = self.acceleration if acceleration is None else acceleration
+        self.torque = self.torque if torque is None else torque
+
+
+class SimMotor:
+    """
+        A motor on a linear axis. travel_limits are the physical ends of the axis in degrees,
+        the motor stalls when it reaches one.
+    """
+
+    def __init__(self, port=None, positive_direction=None, *args, **kwargs):
+        self.port = port
+        self.position = 0.0  # physical position, deg
+        self.offset = 0.0  # angle() - position
+        self.velocity = 0.0  # deg/s
+        self.travel_limits = (-math.inf, math.inf)
+        self._mode = 'idle'  # idle, target, run
+        self._target = 0.0
+        self._max_speed = 0.0
+        self._end_speed = 0.0
+        self._run_speed = 0.0
+        self._stalled = False
+        self._done = True
+        self.control = SimControl()
+        clock.motors.append(self)
+
+    # simulation
+    def place(self, position: float, angle: float = None):
+        """put the motor at a physical position, optionally setting the angle reported there"""
+        self.position = float(position)
+        self.offset = 0.0 if angle is None else angle - self.position
+
+    def step(self, dt: float):
+        if self._mode == 'target':
+            remaining = self._target - self.position
+            direction = 1 if remaining >= 0 else -1
+            cruise = self._max_speed * direction
+            if self._end_speed:
+                # Stop.NONE, drive through the target and keep going
+                wanted = cruise
+                if direction * (self.position + self.velocity * dt - self._target) >= 0:
+                    self._mode = 'run'
+                    self._run_speed = cruise
+                    self._done = True
+            else:
+                braking_distance = (self.velocity ** 2) / (2 * self.control.acceleration)
+                wanted = 0 if abs(remaining) <= braking_distance + abs(self.velocity) * dt else cruise
+                if abs(remaining) < 0.5 and abs(self.velocity) <= self.control.acceleration * dt:
+                    self.position = self._target
+                    self.velocity = 0.0
+                    self._mode = 'idle'
+                    self._done = True
+                    return
+        elif self._mode == 'run':
+            wanted = self._run_speed
+        else:
+            wanted = 0.0
+
+        max_change = self.control.acceleration * dt
+        self.velocity += max(-max_change, min(max_change, wanted - self.velocity))
+        new_position = self.position + self.velocity * dt
+        low, high = self.travel_limits
+        if new_position < low or new_position > high:
+            new_position = min(max(new_position, low), high)
+            self.velocity = 0.0
+            self._stalled = True
+        else:
+            self._stalled = False
+        self.position = new_position
+
+    def _wait_until_done(self):
+        while not self.done():
+            clock.advance(SIM_TICK_MS)
+
+    # pybricks api
+    def angle(self) -> int:
+        return int(round(self.position + self.offset))
+
+    def speed(self) -> int:
+        return int(self.velocity)
+
+    def reset_angle(self, angle=0):
+        self.offset = angle - self.position
+
+    def done(self) -> bool:
+        return self._done
+
+    def stalled(self) -> bool:
+        return self._stalled
+
+    def run_target(self, speed, target_angle, then=Stop.HOLD, wait=True):
+        clock.command()
+        self._mode = 'target'
+        self._target = target_angle - self.offset
+        self._max_speed = abs(speed)
+        # a move of no distance holds position whatever the stop type
+        moving = abs(self._target - self.position) >= 0.5
+        self._end_speed = self._max_speed if then == Stop.NONE and moving else 0
+        self._done = False
+        if wait:
+            if _run_loop_active:
+                return SimAwaitable(self.done)
+            self._wait_until_done()
+
+    def run_angle(self, speed, rotation_angle, then=Stop.HOLD, wait=True):
+        return self.run_target(speed, self.angle() + rotation_angle, then, wait)
+
+    def run(self, speed):
+        clock.command()
+        self._mode = 'run'
+        self._run_speed = speed
+        self._done = False
+
+    def dc(self, duty):
+        self.run(SIM_MAX_SPEED * duty / 100)
+
+    def run_until_stalled(self, speed, then=Stop.COAST, duty_limit=None):
+        self.run(speed)
+        self._stalled = False
+        if _run_loop_active:
+            return SimAwaitable(self.stalled, self._stop_stalled)
+        while not self._stalled:
+            clock.advance(SIM_TICK_MS)
+        return self._stop_stalled()
+
+    def _stop_stalled(self) -> int:
+        self._mode = 'idle'
+        self._done = True
+        return self.angle()
+
+    def stop(self):
+        clock.command()
+        self._mode = 'idle'
+        self._done = True
+
+    def brake(self):
+        self.stop()
+
+    def hold(self):
+        clock.command()
+        self._mode = 'target'
+        self._target = self.position
+        self._max_speed = 0
+        self._end_speed = 0
+        self._done = True
+
+
+class SimLight:
+    def __init__(self):
+        self.color = None
+        self.writes = 0
+
+    def on(self, color=None):
+        self.writes += 1
+        self.color = color
+
+    def off(self):
+        self.on(Color.NONE)
+
+    def blink(self, color, durations):
+        self.on(color)
+
+    def animate(self, colors, interval):
+        self.on(colors[0])
+
+
+class SimColorDistanceSensor:
+    """set sensed_distance to what the sensor should report, 100 when nothing is in range"""
+
+    def __init__(self, port=None, *args, **kwargs):
+        self.port = port
+        self.sensed_distance = 100
+
+    def distance(self) -> int:
+        return self.sensed_distance
+
+
+class SimRemoteButtons:
+    def __init__(self, remote: "SimRemote"):
+        self.remote = remote
+        self.held = ()
+
+    def pressed(self) -> tuple:
+        if not self.remote.connected:
+            raise OSError(ENODEV)
+        return tuple(self.held)
+
+
+class SimRemote:
+    """
+        set connected False to drop a remote out, SimRemote.in_range False to make looking for one time
+        out after the timeout, and SimRemote.switched_on_ms to a later clock time for a remote switched on late.
+        Like a real one, finding a remote, connecting and discovering its services takes SimRemote.connect_ms
+        of the scan. Without a timeout it is the remote load_program hands the program, already connected
+    """
+    in_range = True
+    switched_on_ms = 0
+    connect_ms = 1200
+
+    def __init__(self, name=None, timeout=None):
+        if timeout is not None:
+            found_ms = max(clock.time, SimRemote.switched_on_ms) + SimRemote.connect_ms
+            if not SimRemote.in_range or found_ms > clock.time + timeout:
+                clock.advance(timeout)
+                raise OSError(ETIMEDOUT)
+            clock.advance(found_ms - clock.time)
+        self.connected = True
+        self.buttons = SimRemoteButtons(self)
+        self.light = SimLight()
+
+
+class SimIMU:
+    def up(self):
+        return Side.TOP
+
+    def ready(self) -> bool:
+        return True
+
+
+class SimBLE:
+    """broadcast/observe, every simulated hub hears every channel straight away"""
+
+    def __init__(self, broadcast_channel=None, observe_channels=()):
+        self.broadcast_channel = broadcast_channel
+        self.observe_channels = list(observe_channels)
+        self.broadcasts = 0
+
+    def broadcast(self, data):
+        self.broadcasts += 1
+        _air[self.broadcast_channel] = data
+
+    def observe(self, channel):
+        if channel not in self.observe_channels:
+            raise ValueError(f"channel {channel} is not observed")
+        return _air.get(channel)
+
+
+class SimSystem:
+    """user storage, kept between programs like the hub keeps it between boots"""
+    storage_bytes = bytearray(512)
+
+    def storage(self, offset: int, read: int = None, write: bytes = None):
+        if read is not None:
+            return bytes(self.storage_bytes[offset:offset + read])
+        self.storage_bytes[offset:offset + len(write)] = write
+
+
+class SimHub:
+    def __init__(self, broadcast_channel=None, observe_channels=(), *args, **kwargs):
+        self.light = SimLight()
+        self.imu = SimIMU()
+        self.ble = SimBLE(broadcast_channel, observe_channels)
+        self.system = SimSystem()
+
+
+def _module(name: str, **attributes) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def install():
+    """register the simulated modules, safe to call more than once"""
+    if 'pybricks' in sys.modules and getattr(sys.modules['pybricks'], 'SIMULATED', False):
+        return
+    simulated = {
+        'micropython': _module('micropython', const=lambda value: value, mem_info=lambda *args: None),
+        'uerrno': _module('uerrno', ENODEV=ENODEV, ETIMEDOUT=ETIMEDOUT),
+        'ustruct': _module('ustruct', calcsize=struct.calcsize, pack_into=struct.pack_into,
+                           unpack_from=struct.unpack_from),
+        'umath': _module('umath', floor=math.floor, ceil=math.ceil, sqrt=math.sqrt, fabs=math.fabs),
+        'pybricks': _module('pybricks', SIMULATED=True),
+        'pybricks.parameters': _module('pybricks.parameters', Color=Color, Button=Button, Port=Port,
+                                       Direction=Direction, Stop=Stop, Side=Side),
+        'pybricks.pupdevices': _module('pybricks.pupdevices', Motor=SimMotor, DCMotor=SimMotor, Light=SimLight,
+                                       Remote=SimRemote, ColorDistanceSensor=SimColorDistanceSensor),
+        'pybricks.tools': _module('pybricks.tools', wait=wait, StopWatch=StopWatch, multitask=multitask,
+                                  run_task=run_task),
+        'pybricks.hubs': _module('pybricks.hubs', CityHub=SimHub, TechnicHub=SimHub),
+    }
+    sys.modules.update(simulated)
+
+
+def load_program(vehicle: str, **hub_options) -> types.ModuleType:
+    """
+        import a compiled lego_vehicle_timer_{vehicle}.py file using the simulated modules, each call
+        imports a separate copy so several hubs can be simulated together
+    :param vehicle: servo, train, skid_steer or odv
+    :param hub_options: SimHub arguments, e.g. broadcast_channel and observe_channels
+    :return the program module, main() is not run:
+    """
+    install()
+    path = Path(Path(__file__).parent.resolve().parent, f"lego_vehicle_timer_{vehicle}.py")
+    spec = importlib.util.spec_from_file_location(f"sim_lego_vehicle_timer_{vehicle}", path)
+    program = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(program)
+    program.hub = SimHub(**hub_options)
+    program.remote = SimRemote()
+    return program
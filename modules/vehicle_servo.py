@@ -1,11 +1,11 @@
-from .lego_vehicle_timer_base import MotorHelper, ErrorFlashCodes
+from .lego_vehicle_timer_base import MotorHelper, ErrorFlashCodes, Actuator, remote_input
+from .lego_vehicle_timer_base import load_calibration, save_calibration, angles_match, _CALIBRATION_SERVO
+from .lego_vehicle_timer_base import (_BUTTON_LEFT_PLUS, _BUTTON_LEFT_MINUS, _BUTTON_RIGHT_PLUS, _BUTTON_RIGHT_MINUS,
+                                      _BUTTON_STOP)
 
 error_flash_code = ErrorFlashCodes()
 from micropython import const
-from pybricks.parameters import Button
-from pybricks.pupdevices import Remote
 
-remote: Remote | None = None
 
 # IMPORTS_START
 from pybricks.parameters import Port, Direction
@@ -27,6 +27,10 @@ SERVO_STEER_REVERSE_TURN_MOTOR: bool = False  # set to True if remote + button c
 # Servo steer helper
 ##################################################################################
 
+# saved steering ends, left and right, see calibrate_steering
+_STEERING_CALIBRATION_LAYOUT = '<hh'
+
+
 class RunServoSteerMotors(MotorHelper):
     """
         Handles driving a servo steer model
@@ -42,9 +46,9 @@ class RunServoSteerMotors(MotorHelper):
         self.turn_angle = turn_angle
         try:
             if reverse_drive_motor:
-                self.drive_motor = DCMotor(Port.A, positive_direction=Direction.CLOCKWISE)
+                self.drive_motor = Actuator(DCMotor(Port.A, positive_direction=Direction.CLOCKWISE))
             else:
-                self.drive_motor = DCMotor(Port.A, positive_direction=Direction.COUNTERCLOCKWISE)
+                self.drive_motor = Actuator(DCMotor(Port.A, positive_direction=Direction.COUNTERCLOCKWISE))
             print('Found drive motor on ' + str(Port.A))
         except OSError as ex:
             if ex.errno == ENODEV:
@@ -53,9 +57,9 @@ class RunServoSteerMotors(MotorHelper):
             raise
         try:
             if reverse_steering_motor:
-                self.steering_motor = Motor(Port.B, positive_direction=Direction.COUNTERCLOCKWISE)
+                self.steering_motor = Actuator(Motor(Port.B, positive_direction=Direction.COUNTERCLOCKWISE))
             else:
-                self.steering_motor = Motor(Port.B, positive_direction=Direction.CLOCKWISE)
+                self.steering_motor = Actuator(Motor(Port.B, positive_direction=Direction.CLOCKWISE))
             print('Found steering motor on ' + str(Port.A))
         except OSError as ex:
             if ex.errno == ENODEV:
@@ -63,16 +67,37 @@ class RunServoSteerMotors(MotorHelper):
                 self.error_flash_code.set_error_no_motor_on_b()
             raise
 
-        self.calibrate_steering()
-        self.stop_motors()
+        self.drive_motor.dc(0)
+
+    async def start_up(self):
+        await self.calibrate_steering()
 
-    def calibrate_steering(self):
-        print('--setting steering limits')
-        left_end = self.steering_motor.run_until_stalled(-200, duty_limit=60)
-        right_end = self.steering_motor.run_until_stalled(200, duty_limit=60)
+    async def calibrate_steering(self):
+        saved = load_calibration(_CALIBRATION_SERVO, _STEERING_CALIBRATION_LAYOUT)
+        print('--setting steering limits' if saved is None else '--checking steering limits')
+        left_end = await self.steering_motor.run_until_stalled(-200, duty_limit=60)
+        right_end = await self.steering_motor.run_until_stalled(200, duty_limit=60)
+        if saved is None or not self.check_steering(left_end, right_end, saved[0], saved[1]):
+            save_calibration(_CALIBRATION_SERVO, _STEERING_CALIBRATION_LAYOUT, left_end, right_end)
         self.steering_motor.reset_angle((right_end - left_end) / 2)
         print('--centering')
-        self.steering_motor.run_target(200, 0)
+        await self.steering_motor.run_target(200, 0)
+
+    @staticmethod
+    def check_steering(left_end: int, right_end: int, saved_left_end: int, saved_right_end: int) -> bool:
+        """
+            The motor starts up at its absolute angle so both ends should be where they were when the steering
+            was calibrated, either moving, a linkage re-seated or bent, moves the centre
+        :param left_end: the steering ends just found
+        :param right_end:
+        :param saved_left_end: the saved steering ends
+        :param saved_right_end:
+        :return True if the steering ends have not moved:
+        """
+        if angles_match(left_end, saved_left_end) and angles_match(right_end, saved_right_end):
+            return True
+        print('--steering has changed')
+        return False
 
     def handle_remote_press(self):
         """
@@ -80,25 +105,25 @@ class RunServoSteerMotors(MotorHelper):
         """
         if self.mh__remote_disabled:
             return
-        # Check which remote_buttons are pressed.
-        remote_buttons_pressed = remote.buttons.pressed()
-        if len(remote_buttons_pressed) == 0 or Button.RIGHT in remote_buttons_pressed or Button.LEFT in remote_buttons_pressed:
+        # the buttons input_task read this tick
+        buttons = remote_input.buttons
+        if buttons == 0 or buttons & _BUTTON_STOP:
             self.stop_motors()
             return
         # stop motors as this is bang-bang mode where a button
         #  needs to be held down for racer to run
 
         #  handle button press
-        if Button.LEFT_PLUS in remote_buttons_pressed:
+        if buttons & _BUTTON_LEFT_PLUS:
             self.drive_motor.dc(self.drive_speed)
-        elif Button.LEFT_MINUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_LEFT_MINUS:
             self.drive_motor.dc(-self.drive_speed)
         else:
             self.drive_motor.dc(0)
 
-        if Button.RIGHT_PLUS in remote_buttons_pressed:
+        if buttons & _BUTTON_RIGHT_PLUS:
             self.steering_motor.run_target(200, self.turn_angle, wait=False)
-        elif Button.RIGHT_MINUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_RIGHT_MINUS:
             self.steering_motor.run_target(200, -self.turn_angle, wait=False)
         else:
             self.steering_motor.run_target(200, 0, wait=False)
@@ -106,7 +131,7 @@ class RunServoSteerMotors(MotorHelper):
     # stop all motors
     def stop_motors(self):
         self.drive_motor.dc(0)
-        self.steering_motor.run_target(200, 0)
+        self.steering_motor.run_target(200, 0, wait=False)
 
 
 # MODULE_END
@@ -1,13 +1,12 @@
-from .lego_vehicle_timer_base import MotorHelper, ErrorFlashCodes
+from .lego_vehicle_timer_base import MotorHelper, ErrorFlashCodes, Actuator, remote_input
+from .lego_vehicle_timer_base import (_BUTTON_LEFT_PLUS, _BUTTON_LEFT_MINUS, _BUTTON_RIGHT_PLUS, _BUTTON_RIGHT_MINUS,
+                                      _BUTTON_STOP)
 
 error_flash_code = ErrorFlashCodes()
 from micropython import const
-from pybricks.parameters import Button
-from pybricks.pupdevices import Remote
 from pybricks.hubs import TechnicHub
 
 hub: TechnicHub | None = None
-remote: Remote | None = None
 
 # IMPORTS_START
 from pybricks.parameters import Port, Side, Direction
@@ -60,14 +59,14 @@ class RunSkidSteerMotors(MotorHelper):
         self.drive_speed = drive_speed
         self.last_side = None
         try:
-            self.left_motor = DCMotor(self.left_motor_port, positive_direction=self.left_motor_direction)
+            self.left_motor = Actuator(DCMotor(self.left_motor_port, positive_direction=self.left_motor_direction))
         except OSError as ex:
             if ex.errno == ENODEV:
                 print('Motor needs to be connected to ' + str(self.left_motor_port))
                 self.error_flash_code.set_error_no_motor_on_a()
             raise
         try:
-            self.right_motor = DCMotor(self.right_motor_port, positive_direction=self.right_motor_direction)
+            self.right_motor = Actuator(DCMotor(self.right_motor_port, positive_direction=self.right_motor_direction))
         except OSError as ex:
             if ex.errno == ENODEV:
                 print('Motor needs to be connected to ' + str(self.right_motor_port))
@@ -93,13 +92,13 @@ class RunSkidSteerMotors(MotorHelper):
         # normal side up
         if up_side == Side.TOP:
             print('--Top Up')
-            self.right_motor = DCMotor(self.right_motor_port, positive_direction=self.right_motor_direction)
-            self.left_motor = DCMotor(self.left_motor_port, positive_direction=self.left_motor_direction)
+            self.right_motor = Actuator(DCMotor(self.right_motor_port, positive_direction=self.right_motor_direction))
+            self.left_motor = Actuator(DCMotor(self.left_motor_port, positive_direction=self.left_motor_direction))
         # upside down
         if up_side == Side.BOTTOM:
             print('--Bottom Up')
-            self.right_motor = DCMotor(self.left_motor_port, positive_direction=self.right_motor_direction)
-            self.left_motor = DCMotor(self.right_motor_port, positive_direction=self.left_motor_direction)
+            self.right_motor = Actuator(DCMotor(self.left_motor_port, positive_direction=self.right_motor_direction))
+            self.left_motor = Actuator(DCMotor(self.right_motor_port, positive_direction=self.left_motor_direction))
 
     def handle_remote_press(self):
         """
@@ -107,27 +106,31 @@ class RunSkidSteerMotors(MotorHelper):
         """
         if self.mh__remote_disabled:
             return
-        # Check which remote_buttons are pressed.
-        remote_buttons_pressed = remote.buttons.pressed()
-        if len(remote_buttons_pressed) == 0 or Button.RIGHT in remote_buttons_pressed or Button.LEFT in remote_buttons_pressed:
+        # the buttons input_task read this tick
+        buttons = remote_input.buttons
+        if buttons == 0 or buttons & _BUTTON_STOP:
             self.stop_motors()
             return
-        # stop motors as this is bang-bang mode where a button
-        #  needs to be held down for racer to run
-        self.stop_motors()
+        # this is bang-bang mode where a button needs to be held down for racer to run,
+        #  a side with no button held stops
+        left_speed = 0
+        right_speed = 0
 
         #  handle button press
-        if Button.LEFT_PLUS in remote_buttons_pressed:
-            self.left_motor.dc(self.drive_speed)
+        if buttons & _BUTTON_LEFT_PLUS:
+            left_speed = self.drive_speed
+
+        if buttons & _BUTTON_LEFT_MINUS:
+            left_speed = -self.drive_speed
 
-        if Button.LEFT_MINUS in remote_buttons_pressed:
-            self.left_motor.dc(-self.drive_speed)
+        if buttons & _BUTTON_RIGHT_PLUS:
+            right_speed = self.drive_speed
 
-        if Button.RIGHT_PLUS in remote_buttons_pressed:
-            self.right_motor.dc(self.drive_speed)
+        if buttons & _BUTTON_RIGHT_MINUS:
+            right_speed = -self.drive_speed
 
-        if Button.RIGHT_MINUS in remote_buttons_pressed:
-            self.right_motor.dc(-self.drive_speed)
+        self.left_motor.dc(left_speed)
+        self.right_motor.dc(right_speed)
 
     # stop all motors
     def stop_motors(self):
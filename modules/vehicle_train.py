@@ -1,10 +1,9 @@
-from pybricks.parameters import Button
-from pybricks.pupdevices import Remote
 from micropython import const
-from .lego_vehicle_timer_base import MotorHelper, ErrorFlashCodes
+from .lego_vehicle_timer_base import MotorHelper, ErrorFlashCodes, Actuator, remote_input
+from .lego_vehicle_timer_base import (_BUTTON_LEFT_PLUS, _BUTTON_LEFT_MINUS, _BUTTON_RIGHT_PLUS, _BUTTON_RIGHT_MINUS,
+                                      _BUTTON_STOP)
 
 error_flash_code = ErrorFlashCodes()
-remote: Remote | None = None
 
 # IMPORTS_START
 from pybricks.parameters import Port, Direction
@@ -46,9 +45,9 @@ class RunTrainMotor(MotorHelper):
         # noinspection PyBroadException
         try:
             if reverse_motor:
-                self.train_motor_port_a = DCMotor(Port.A, Direction.COUNTERCLOCKWISE)
+                self.train_motor_port_a = Actuator(DCMotor(Port.A, Direction.COUNTERCLOCKWISE))
             else:
-                self.train_motor_port_a = DCMotor(Port.A, Direction.CLOCKWISE)
+                self.train_motor_port_a = Actuator(DCMotor(Port.A, Direction.CLOCKWISE))
             print('Found train motor on ' + str(Port.A))
             motor_found = True
         except:
@@ -59,9 +58,9 @@ class RunTrainMotor(MotorHelper):
             # noinspection PyBroadException
             try:
                 if reverse_motor_2:
-                    self.train_motor_port_b = DCMotor(Port.B, Direction.COUNTERCLOCKWISE)
+                    self.train_motor_port_b = Actuator(DCMotor(Port.B, Direction.COUNTERCLOCKWISE))
                 else:
-                    self.train_motor_port_b = DCMotor(Port.B, Direction.CLOCKWISE)
+                    self.train_motor_port_b = Actuator(DCMotor(Port.B, Direction.CLOCKWISE))
                 print('Found train motor on ' + str(Port.B))
                 motor_found = True
             except:
@@ -77,14 +76,14 @@ class RunTrainMotor(MotorHelper):
         if self.train_motor_port_a is None:
             # noinspection PyBroadException
             try:
-                self.lights = Light(Port.A)
+                self.lights = Actuator(Light(Port.A))
                 print('Found lights on ' + str(Port.B))
             except:
                 pass
         if self.train_motor_port_b is None:
             # noinspection PyBroadException
             try:
-                self.lights = Light(Port.B)
+                self.lights = Actuator(Light(Port.B))
                 print('Found lights on ' + str(Port.B))
             except:
                 pass
@@ -95,17 +94,17 @@ class RunTrainMotor(MotorHelper):
         """
         if self.mh__remote_disabled:
             return
-        # Check which remote_buttons are pressed.
-        remote_buttons_pressed = remote.buttons.pressed()
-        if len(remote_buttons_pressed) == 0 or Button.RIGHT in remote_buttons_pressed or Button.LEFT in remote_buttons_pressed:
+        # the buttons input_task read this tick
+        buttons = remote_input.buttons
+        if buttons == 0 or buttons & _BUTTON_STOP:
             self.stop_motors()
             return
         # left remote_buttons
         # noinspection DuplicatedCode
-        if Button.LEFT in remote_buttons_pressed or Button.RIGHT in remote_buttons_pressed:
+        if buttons & _BUTTON_STOP:
             self.current_motor_speed = 0
 
-        elif Button.LEFT_PLUS in remote_buttons_pressed or Button.RIGHT_PLUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_LEFT_PLUS or buttons & _BUTTON_RIGHT_PLUS:
 
             if self.current_motor_speed == 0:  # if stopped go forward
                 self.current_motor_speed = self.min_speed
@@ -119,7 +118,7 @@ class RunTrainMotor(MotorHelper):
             if self.current_motor_speed > self.max_speed:
                 self.current_motor_speed = self.max_speed
 
-        elif Button.LEFT_MINUS in remote_buttons_pressed or Button.RIGHT_MINUS in remote_buttons_pressed:
+        elif buttons & _BUTTON_LEFT_MINUS or buttons & _BUTTON_RIGHT_MINUS:
 
             if self.current_motor_speed == 0:  # if stopped go in reverse
                 self.current_motor_speed = -self.min_speed
@@ -0,0 +1,139 @@
+"""
+Scenarios run against the compiled lego_vehicle_timer_* files on the host simulator,
+modules/pybricks_simulator.py. Run compile_pybricks_files first, as for the benchmarks.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / 'modules'))
+
+from pybricks_simulator import (SimRemote, SimSystem, clock, load_program, multitask, run_task_for,  # noqa: E402
+                                wait)
+
+
+@pytest.fixture(autouse=True)
+def simulation():
+    """every scenario starts at time 0, with the remote switched on and in range and nothing in the hub storage"""
+    clock.reset()
+    SimRemote.in_range = True
+    SimRemote.switched_on_ms = 0
+    SimSystem.storage_bytes[:] = bytes(len(SimSystem.storage_bytes))
+    yield clock
+
+
+def new_odv(grid: list[str], start_tile: tuple[int, int] = None, **options):
+    """
+        a RunODVMotors in its own copy of the program, homed and standing on start_tile, default the home tile
+    :return program, odv:
+    """
+    program = load_program('odv')
+    odv = program.RunODVMotors(program.ErrorFlashCodes(), program.ODV_SPEED, grid, **options)
+    tile_angle = odv._tile_to_angle(odv.home_tile if start_tile is None else start_tile)
+    odv.motor_x.reset_angle(tile_angle[0])
+    odv.motor_y.reset_angle(tile_angle[1] + odv.gear_ratio_to_grid[1])
+    odv.axis_homed = [True, True]
+    odv.set_is_homed()
+    return program, odv
+
+
+class ProgramRun:
+    """the program's tasks for a vehicle, from a reset countdown, run a while at a time on the simulated clock"""
+
+    def __init__(self, program, drive_motors):
+        self.program = program
+        self.drive_motors = drive_motors
+        self.countdown_timer = program.CountdownTimer()
+        self.countdown_timer.reset()
+        self.loop_rate = program.LoopRate(self.countdown_timer, drive_motors)
+        self.tasks = multitask(program.input_task(self.countdown_timer, self.loop_rate),
+                               program.status_task(self.countdown_timer, self.loop_rate),
+                               program.control_task(self.countdown_timer, drive_motors, self.loop_rate),
+                               program.auto_drive_task(self.countdown_timer, drive_motors, self.loop_rate))
+
+    def run(self, ms: int, until=None) -> bool:
+        """
+            run the tasks for ms, or until until() is true
+        :return True if until() became true:
+        """
+        return run_task_for(self.tasks, ms, until)
+
+    def hold(self, *buttons):
+        """hold remote buttons, none to let go"""
+        self.program.remote.buttons.held = buttons
+
+    def press(self, *buttons):
+        """press and let go"""
+        self.hold(*buttons)
+        self.run(100)
+        self.hold()
+        self.run(100)
+
+
+class FleetRun:
+    """
+    ODVs sharing a grid, each its own copy of the program broadcasting on its own channel and observing the
+    others, driven round load/unload cycles from one simulated main loop
+    """
+
+    def __init__(self, grid: list[str], start_tiles: list[tuple[int, int]]):
+        self.carts = []
+        channels = list(range(1, len(start_tiles) + 1))
+        for channel, start_tile in zip(channels, start_tiles):
+            peers = [peer for peer in channels if peer != channel]
+            program = load_program('odv', broadcast_channel=channel, observe_channels=peers)
+            odv = program.RunODVMotors(program.ErrorFlashCodes(), program.ODV_SPEED, grid,
+                                       fleet_channel=channel, fleet_peer_channels=peers)
+            odv.mh__remote_disabled = True
+            tile_angle = odv._tile_to_angle(start_tile)
+            odv.motor_x.reset_angle(tile_angle[0])
+            odv.motor_y.reset_angle(tile_angle[1] + odv.gear_ratio_to_grid[1])
+            odv.set_is_homed()
+            self.carts.append(odv)
+        self.cart_size = program._ODV_SIZE * max(self.carts[0].gear_ratio_to_grid)
+
+    def run(self, ms: int) -> tuple[list[int], int]:
+        """
+            drive the carts until the clock reaches ms, two carts closer than a cart on both axes collide
+        :return unloads of each cart, collisions:
+        """
+        cycles = [0] * len(self.carts)
+        collisions = 0
+        was_loaded = [False] * len(self.carts)
+        colliding = set()
+        while clock.time < ms:
+            for i, odv in enumerate(self.carts):
+                if not odv.mh_route_active:
+                    odv.auto_unload()
+                    odv.auto_load()
+                odv.advance_route()
+                if was_loaded[i] and not odv.has_load:
+                    cycles[i] += 1
+                was_loaded[i] = odv.has_load
+            for i in range(len(self.carts)):
+                for j in range(i + 1, len(self.carts)):
+                    close = (abs(self.carts[i].motor_x.angle() - self.carts[j].motor_x.angle()) < self.cart_size and
+                             abs(self.carts[i].motor_y.angle() - self.carts[j].motor_y.angle()) < self.cart_size)
+                    if close and (i, j) not in colliding:
+                        collisions += 1
+                        colliding.add((i, j))
+                    elif not close:
+                        colliding.discard((i, j))
+            wait(10)
+        return cycles, collisions
+
+
+@pytest.fixture
+def make_odv():
+    return new_odv
+
+
+@pytest.fixture
+def program_run():
+    return ProgramRun
+
+
+@pytest.fixture
+def fleet_run():
+    return FleetRun
@@ -0,0 +1,50 @@
+"""Start up, the motors calibrating while the remote is looked for"""
+import pytest
+
+from pybricks_simulator import SimRemote, clock, load_program, run_task_for
+
+LEFT_END = -130
+RIGHT_END = 110
+
+
+def boot_servo(remote_disabled: bool = False):
+    """
+        start up a servo steer vehicle, its steering calibration takes a few seconds
+    :return program, the vehicle, its boot timeline as {phase: (start, end)}:
+    """
+    program = load_program('servo')
+    program.REMOTE_DISABLED = remote_disabled
+    servo = program.RunServoSteerMotors(program.ErrorFlashCodes(), 80, 45, False, False)
+    servo.steering_motor.device.travel_limits = (LEFT_END, RIGHT_END)
+    boot_timeline = program.BootTimeline()
+    countdown_timer = program.CountdownTimer()
+    start_up = program.start_up(countdown_timer, servo, boot_timeline)
+    assert run_task_for(start_up, 60000, lambda: any(name == 'ready' and end >= 0
+                                                     for name, _, end in boot_timeline.phases))
+    start_up.close()
+    return program, servo, {name: (start, end) for name, start, end in boot_timeline.phases}
+
+
+def test_the_remote_is_found_while_the_motors_calibrate():
+    _, _, calibrate_only = boot_servo(remote_disabled=True)
+    calibrate_ms = calibrate_only['calibrate'][1] - calibrate_only['calibrate'][0]
+
+    clock.reset()
+    program, servo, phases = boot_servo()
+    assert program.remote_input.connected
+    assert phases['remote'][0] < phases['calibrate'][1] and phases['calibrate'][0] < phases['remote'][1]
+    # the boot takes as long as the longer of the two, not both one after the other
+    assert phases['ready'][1] < calibrate_ms + SimRemote.connect_ms
+    assert servo.steering_motor.device.position == pytest.approx((LEFT_END + RIGHT_END) / 2, abs=2)
+
+
+def test_boot_carries_on_without_a_remote_and_the_tasks_find_it(program_run):
+    SimRemote.in_range = False
+    program, servo, phases = boot_servo()
+    assert not program.remote_input.connected
+    assert phases['remote'][1] - phases['remote'][0] <= program._BOOT_REMOTE_SCANS * program._REMOTE_SCAN_MS + 50
+    assert servo.steering_motor.device.position == pytest.approx((LEFT_END + RIGHT_END) / 2, abs=2)
+
+    SimRemote.in_range = True
+    run = program_run(program, servo)
+    assert run.run(program._REMOTE_RETRY_MS + program._REMOTE_SCAN_MS + 100, lambda: program.remote_input.connected)
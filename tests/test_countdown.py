@@ -0,0 +1,108 @@
+"""The countdown and its remote reset code, run by the program's tasks"""
+from pybricks_simulator import Button, Color
+
+GRID = ["H##X", "LX#U", "###X"]
+CHORD_BUTTONS = {'+': (Button.LEFT_PLUS, Button.RIGHT_PLUS), '-': (Button.LEFT_MINUS, Button.RIGHT_MINUS),
+                 'c': (Button.LEFT, Button.RIGHT)}
+
+
+def start_countdown(make_odv, program_run, reset_code: str = None):
+    """a program with its countdown started, and reset_code in place of COUNTDOWN_RESET_CODE"""
+    program, odv = make_odv(GRID)
+    if reset_code is not None:
+        program.COUNTDOWN_RESET_CODE = reset_code
+    run = program_run(program, odv)
+    run.press(Button.CENTER)
+    assert run.countdown_timer.countdown_status == program._ACTIVE
+    return program, run
+
+
+def chord(step: str) -> tuple:
+    """the buttons of one step of a reset code"""
+    left, center, right = step.split(',')
+    buttons = [CHORD_BUTTONS[left][0]] if left else []
+    buttons += [Button.CENTER] if center else []
+    buttons += [CHORD_BUTTONS[right][1]] if right else []
+    return tuple(buttons)
+
+
+def test_the_reset_chord_resets_the_countdown(make_odv, program_run):
+    program, run = start_countdown(make_odv, program_run)
+    run.press(*chord(program.COUNTDOWN_RESET_CODE))
+    assert run.countdown_timer.countdown_status == program._READY
+
+
+def test_a_chord_with_another_button_held_does_not_reset(make_odv, program_run):
+    program, run = start_countdown(make_odv, program_run)
+    run.press(*chord(program.COUNTDOWN_RESET_CODE), Button.LEFT_PLUS)
+    assert run.countdown_timer.countdown_status == program._ACTIVE
+
+
+def test_a_code_of_several_steps_resets_once_every_step_is_pressed(make_odv, program_run):
+    code = '+,,+ -,,- c,c,c'
+    program, run = start_countdown(make_odv, program_run, code)
+    for step in code.split():
+        assert run.countdown_timer.countdown_status == program._ACTIVE
+        run.press(*chord(step))
+    assert run.countdown_timer.countdown_status == program._READY
+
+
+def test_a_code_lapses_when_a_step_comes_too_late(make_odv, program_run):
+    code = '+,,+ -,,- c,c,c'
+    program, run = start_countdown(make_odv, program_run, code)
+    steps = code.split()
+    run.press(*chord(steps[0]))
+    run.press(*chord(steps[1]))
+    run.run(program.COUNTDOWN_RESET_CODE_STEP_SECS * 1000 + 500)
+    run.press(*chord(steps[2]))
+    assert run.countdown_timer.countdown_status == program._ACTIVE
+    # and starts again from the first step
+    for step in steps:
+        run.press(*chord(step))
+    assert run.countdown_timer.countdown_status == program._READY
+
+
+def test_a_wrong_step_starts_the_code_again(make_odv, program_run):
+    code = '+,,+ -,,- c,c,c'
+    program, run = start_countdown(make_odv, program_run, code)
+    steps = code.split()
+    run.press(*chord(steps[0]))
+    run.press(*chord(steps[2]))
+    # the first step is needed again
+    run.press(*chord(steps[1]))
+    run.press(*chord(steps[2]))
+    assert run.countdown_timer.countdown_status == program._ACTIVE
+
+
+def test_the_hub_light_is_only_written_when_the_countdown_changes_phase(make_odv, program_run):
+    program, odv = make_odv(GRID)
+    program.COUNTDOWN_LIMIT_MINUTES = 2
+    run = program_run(program, odv)
+    run.run(5000)
+    hub_writes = program.hub.light.writes
+    run.press(Button.CENTER)
+    phases = [run.countdown_timer.countdown_status]
+    while run.run(130000, lambda: run.countdown_timer.countdown_status != phases[-1]):
+        phases.append(run.countdown_timer.countdown_status)
+    assert phases == [program._ACTIVE, program._FINAL_MINUTE, program._FINAL_20_SECS, program._ENDED]
+    # the hub flashes by itself, one write per phase
+    assert program.hub.light.writes - hub_writes == len(phases)
+    assert program.hub.light.color == Color.ORANGE
+
+
+def test_the_remote_light_is_flashed_with_a_write_per_change(make_odv, program_run):
+    program, odv = make_odv(GRID)
+    program.COUNTDOWN_LIMIT_MINUTES = 1
+    run = program_run(program, odv)
+    run.press(Button.CENTER)
+    light = program.remote.light
+    assert run.run(60000, lambda: run.countdown_timer.countdown_status == program._FINAL_20_SECS)
+    writes = light.writes
+    colors = []
+    for _ in range(60):
+        run.run(50)
+        if not colors or light.color != colors[-1]:
+            colors.append(light.color)
+    # 3 seconds of 200ms on, 100ms off
+    assert set(colors) == {Color.ORANGE, Color.NONE}
+    assert len(colors) - 1 <= light.writes - writes <= 21
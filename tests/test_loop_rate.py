@@ -0,0 +1,50 @@
+"""The tasks slow down while the hub waits for the next visitor"""
+from pybricks_simulator import Button
+
+GRID = ["H##X", "LX#U", "###X"]
+
+
+def idle_program(make_odv, program_run):
+    """a program waiting for a visitor, with auto-drive off and the remote samples counted"""
+    program, odv = make_odv(GRID)
+    program.ODV_AUTO_DRIVE_TIMEOUT_SECS = 0
+    run = program_run(program, odv)
+    run.samples = 0
+    sample = program.remote_input.sample
+
+    def counted_sample():
+        run.samples += 1
+        sample()
+
+    program.remote_input.sample = counted_sample
+    return program, run
+
+
+def test_an_idle_hub_samples_the_remote_at_the_idle_rate(make_odv, program_run):
+    program, run = idle_program(make_odv, program_run)
+    run.run(program._IDLE_AFTER_MS + 100)
+    assert run.loop_rate.idle
+    run.samples = 0
+    run.run(60000)
+    assert run.samples <= 60000 // program._IDLE_TASK_MS + 1
+
+
+def test_a_button_brings_the_fast_rate_back_on_the_next_tick(make_odv, program_run):
+    program, run = idle_program(make_odv, program_run)
+    run.run(program._IDLE_AFTER_MS + 100)
+    assert run.loop_rate.idle
+    run.hold(Button.LEFT_PLUS)
+    assert run.run(program._IDLE_TASK_MS + 10, lambda: not run.loop_rate.idle)
+    run.hold()
+    run.samples = 0
+    run.run(1000)
+    assert run.samples >= 1000 // program._INPUT_TASK_MS - 1
+
+
+def test_a_running_countdown_keeps_the_fast_rate(make_odv, program_run):
+    program, run = idle_program(make_odv, program_run)
+    run.press(Button.CENTER)
+    assert not run.run(program._IDLE_AFTER_MS * 3, lambda: run.loop_rate.idle)
+    # back to the idle rate once the countdown is reset and the hub is left alone
+    run.countdown_timer.reset()
+    assert run.run(program._IDLE_AFTER_MS + 200, lambda: run.loop_rate.idle)
@@ -0,0 +1,154 @@
+"""A visitor taking over an auto-driving ODV, and auto-drive carrying on after them"""
+from pybricks_simulator import Button, SimRemote, clock, run_task_for
+
+GRID = ["H##X#XX", "LX###XU", "###X###"]
+
+
+def start_auto_drive(make_odv, program_run):
+    """an ODV at home that has started its first auto-drive route, with no countdown running"""
+    program, odv = make_odv(GRID)
+    run = program_run(program, odv)
+    assert run.run(40000, lambda: odv.mh_route_active)
+    assert odv.mh_auto_drive
+    # part way along the route
+    run.run(1500)
+    assert odv.mh_route_active
+    return program, odv, run
+
+
+def test_takeover_when_ready_leaves_the_cart_to_the_visitor(make_odv, program_run):
+    program, odv, run = start_auto_drive(make_odv, program_run)
+    assert run.countdown_timer.countdown_status == program._READY
+
+    run.press(Button.LEFT_PLUS)
+    assert not odv.mh_auto_drive
+    # no route of its own, the end of a session only happens when a countdown ends
+    assert not run.run(10000, lambda: odv.mh_route_active)
+
+    # the visitor starts a countdown and drives
+    run.press(Button.CENTER)
+    assert run.countdown_timer.countdown_status == program._ACTIVE
+    start_angle = odv.motor_y.angle()
+    run.hold(Button.LEFT_MINUS)
+    run.run(500)
+    run.hold()
+    assert odv.motor_y.angle() > start_angle
+
+
+def test_countdown_end_unloads_and_goes_home_once(make_odv, program_run):
+    program, odv = make_odv(GRID)
+    program.ODV_AUTO_DRIVE_TIMEOUT_SECS = 0
+    program.COUNTDOWN_LIMIT_MINUTES = 1
+    run = program_run(program, odv)
+    run.press(Button.CENTER)
+    assert run.run(70000, lambda: run.countdown_timer.countdown_status == program._ENDED)
+    assert run.run(100, lambda: odv.mh_route_active)
+    assert run.run(60000, lambda: not odv.mh_route_active)
+    assert odv._get_grid_tile_position_from_fine_xy_(odv._get_fine_grid_position_(), True) == odv.home_tile
+    assert not run.run(10000, lambda: odv.mh_route_active)
+
+
+def test_new_countdown_homes_after_the_end_of_session_route(make_odv, program_run):
+    program, odv = make_odv(GRID)
+    program.ODV_AUTO_DRIVE_TIMEOUT_SECS = 0
+    program.COUNTDOWN_LIMIT_MINUTES = 1
+    run = program_run(program, odv)
+    run.press(Button.CENTER)
+    # the x axis has drifted, the end of the session asks for it to be homed again against its stop
+    odv.axis_drift[0] = 10 * odv.gear_ratio_to_grid[0]
+    odv.motor_x.device.travel_limits = (odv._tile_to_angle(odv.home_tile)[0], float('inf'))
+    assert run.run(70000, lambda: odv.mh_route_active)
+    assert not odv.axis_homed[0]
+
+    # staff reset and the next visitor starts a countdown while the cart is on its way home
+    run.countdown_timer.reset()
+    run.press(Button.CENTER)
+    assert program._ACTIVE <= run.countdown_timer.countdown_status <= program._FINAL_20_SECS
+    assert odv.mh_route_active
+    assert run.run(120000, lambda: not odv.mh_route_active)
+    assert odv._get_grid_tile_position_from_fine_xy_(odv._get_fine_grid_position_(), True) == odv.home_tile
+    assert run.run(30000, lambda: odv.mh_is_homed)
+    assert odv.axis_homed[0]
+
+
+def test_countdown_runs_out_while_auto_driving(make_odv, program_run):
+    program, odv = make_odv(GRID)
+    program.COUNTDOWN_LIMIT_MINUTES = 2
+    run = program_run(program, odv)
+    run.press(Button.CENTER)
+    assert run.countdown_timer.countdown_status == program._ACTIVE
+    # the visitor leaves the remote alone and auto-drive takes the cart before the countdown ends
+    assert run.run(40000, lambda: odv.mh_auto_drive)
+    assert run.run(60000, lambda: run.countdown_timer.countdown_status == program._FINAL_MINUTE)
+    assert run.run(60000, lambda: run.countdown_timer.countdown_status == program._ENDED)
+    assert odv.mh_auto_drive
+    # auto-drive carries on with its cycles rather than sending the cart home
+    assert run.run(60000, lambda: odv.has_load)
+    assert run.run(60000, lambda: not odv.has_load)
+    assert odv.mh_auto_drive
+
+
+def test_auto_drive_resumes_a_route_taken_over_when_ready(make_odv, program_run):
+    program, odv, run = start_auto_drive(make_odv, program_run)
+    planned = list(odv.route_steps)
+    run.press(Button.LEFT_PLUS)
+    checkpoint = list(odv.route_checkpoint)
+    assert len(checkpoint) > 0 and checkpoint[-1] == planned[-1]
+    run.run(10000)
+    assert odv.route_checkpoint == checkpoint
+
+    # auto-drive comes back once the remote has been left alone and carries on with the route
+    assert run.run(40000, lambda: odv.mh_auto_drive)
+    assert run.run(1000, lambda: odv.mh_route_active)
+    assert odv.route_checkpoint == []
+    transfers = (program._STEP_LOAD, program._STEP_UNLOAD)
+    assert ([step for step in odv.route_steps if step[0] in transfers] ==
+            [step for step in checkpoint if step[0] in transfers])
+    assert run.run(60000, lambda: odv.has_load)
+
+
+def test_route_checkpoint_is_kept_until_a_new_route_replaces_it(make_odv, program_run):
+    program, odv, run = start_auto_drive(make_odv, program_run)
+    run.press(Button.LEFT_PLUS)
+    checkpoint = list(odv.route_checkpoint)
+    odv.reset_homing()
+    assert odv.route_checkpoint == checkpoint
+    odv.set_is_homed()
+    odv.auto_home()
+    assert odv.route_checkpoint == []
+
+
+def test_looking_for_a_lost_remote_does_not_hold_up_auto_drive(make_odv, program_run):
+    program, odv, run = start_auto_drive(make_odv, program_run)
+    ticks = []
+    advance_route = odv.advance_route
+
+    def timed_advance_route():
+        ticks.append(clock.time)
+        advance_route()
+
+    odv.advance_route = timed_advance_route
+    SimRemote.in_range = False
+    program.remote.connected = False
+    loaded = odv.has_load
+    # the route carries on between the scans, none longer than a full scan
+    assert run.run(60000, lambda: odv.has_load != loaded)
+    assert not program.remote_input.connected
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) <= program._REMOTE_SCAN_MS + 20
+
+    # by now the scans are long enough to connect, so the remote is found on the next one
+    SimRemote.in_range = True
+    assert run.run(program._REMOTE_RETRY_MS + program._REMOTE_SCAN_MS + 100,
+                   lambda: program.remote_input.connected)
+
+
+def test_remote_switched_on_after_boot_gave_up_is_found(make_odv, program_run):
+    program, odv = make_odv(GRID)
+    SimRemote.switched_on_ms = 20000
+    run_task_for(program.connect_remote(program.BootTimeline()), 20000)
+    assert clock.time < SimRemote.switched_on_ms
+    assert not program.remote_input.connected
+
+    run = program_run(program, odv)
+    assert run.run(SimRemote.switched_on_ms + SimRemote.connect_ms + program._REMOTE_SCAN_MS +
+                   program._REMOTE_RETRY_MS - clock.time, lambda: program.remote_input.connected)
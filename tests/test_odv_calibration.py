@@ -0,0 +1,41 @@
+import pytest
+
+from pybricks_simulator import clock, run_task_for
+
+
+def far_reach(program, odv, axis: int) -> int:
+    """the furthest fine grid position along an axis from the home tile where the cart still fits on the grid"""
+    position = [odv.home_tile[0] * program._FINE_GRID_SIZE, odv.home_tile[1] * program._FINE_GRID_SIZE]
+    while odv._get_fine_cell_(position[0], position[1]) != program._CELL_BLOCKED:
+        position[axis] += 1
+    return position[axis] - 1
+
+
+@pytest.mark.parametrize("grid, gear_ratio", [
+    (["H###", "####"], (72, 90)),
+    (["H#####", "######", "######", "######"], (96, 64)),
+])
+def test_calibration_measures_the_gear_ratio_between_the_end_stops(make_odv, grid, gear_ratio):
+    program, odv = make_odv(grid, calibrate=True)
+    for axis, motor in enumerate((odv.motor_x.device, odv.motor_y.device)):
+        # the near stop is at the home tile, the far stop where the cart reaches the far edge of the grid
+        home = odv.home_tile[axis] * program._FINE_GRID_SIZE * gear_ratio[axis]
+        far = far_reach(program, odv, axis) * gear_ratio[axis]
+        motor.travel_limits = (home, far)
+        motor.place((home + far) // 2)
+    run_task_for(odv.calibrate(), 60000)
+    assert odv.gear_ratio_to_grid == list(gear_ratio)
+
+
+def test_cancelled_homing_gives_the_motors_their_torque_back(make_odv):
+    program, odv = make_odv(["H###", "####"])
+    limits = odv.motor_x.control.limits()
+    homing = odv._run_until_stalled_([True, True], -program._HOMING_MOTOR_ROT_SPEED)
+    run_task_for(homing, 500)
+    assert odv.motor_x.control.limits() != limits
+    # the user taking over cancels homing half way to the stops
+    homing.close()
+    assert odv.motor_x.control.limits() == limits
+    assert odv.motor_y.control.limits() == limits
+    clock.advance(500)
+    assert odv.motor_x.speed() == 0
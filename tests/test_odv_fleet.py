@@ -0,0 +1,18 @@
+# one track between the stations with a passing place below it either side of the middle
+GRID = ["L###U", "X#X#X"]
+# two load and two unload stations, the carts compete for stations and cross each other's drives
+FLEET_GRID = ["L#####U", "#X#X#X#", "#######", "#X#X#X#", "L#####U"]
+
+
+def test_carts_waiting_in_each_others_way_take_turns(fleet_run):
+    # the loaded cart waits in the load station for the unload station and the other cart the other way round,
+    # neither can get by the other until one of them moves out of its station
+    cycles, collisions = fleet_run(GRID, [(1, 0), (3, 0)]).run(60000)
+    assert min(cycles) > 0
+    assert collisions == 0
+
+
+def test_carts_share_stations_without_running_into_each_other(fleet_run):
+    cycles, collisions = fleet_run(FLEET_GRID, [(3, 2), (0, 2), (6, 2)]).run(60000)
+    assert min(cycles) > 0
+    assert collisions == 0
@@ -0,0 +1,57 @@
+"""Jogging the ODV by remote, stopping at walls from the fine grid collision cells"""
+import pytest
+
+from pybricks_simulator import Button, clock
+
+GRID = ["H##X", "LX#U", "###X"]
+
+
+def start_jogging(make_odv, program_run):
+    """an ODV at home with the countdown started, so the remote drives it"""
+    program, odv = make_odv(GRID)
+    run = program_run(program, odv)
+    run.press(Button.CENTER)
+    run.run(500)
+    return odv, run
+
+
+@pytest.mark.parametrize('buttons', [(Button.RIGHT_MINUS,), (Button.LEFT_PLUS, Button.RIGHT_MINUS),
+                                     (Button.LEFT_MINUS, Button.RIGHT_MINUS)])
+def test_jogging_into_the_wall_next_to_home_does_not_move(make_odv, program_run, buttons):
+    odv, run = start_jogging(make_odv, program_run)
+    position = odv._get_fine_grid_position_()
+    commands = clock.commands
+    run.hold(*buttons)
+    run.run(1000)
+    assert odv._get_fine_grid_position_() == position
+    assert not odv.motors_running
+    # nothing but the stop when the direction was first held
+    assert clock.commands - commands <= 2
+
+
+def test_jogging_west_into_a_load_station_loads(make_odv, program_run):
+    program, odv = make_odv(["XL##XU", "H#X###"], start_tile=(3, 0))
+    run = program_run(program, odv)
+    run.press(Button.CENTER)
+    run.hold(Button.RIGHT_MINUS)
+    assert run.run(30000, lambda: odv.has_load)
+    assert odv._get_grid_tile_position_from_fine_xy_(odv._get_fine_grid_position_(), True) == odv.load_tile
+
+
+def test_holding_a_direction_jogs_on_and_brakes_short_of_the_wall(make_odv, program_run):
+    odv, run = start_jogging(make_odv, program_run)
+    commands = clock.commands
+    run.hold(Button.RIGHT_PLUS)
+    run.run(1000)
+    assert odv.motors_running and not odv.jog_braking
+    # the motors are started once and left running across the tiles
+    assert clock.commands - commands <= 2
+    assert run.run(10000, lambda: odv.jog_braking)
+    run.run(2000)
+    fine_x, fine_y = odv._get_fine_grid_position_()
+    assert odv.motor_x.speed() == 0
+    # stopped on the last fine position before the wall, without stalling against it
+    assert odv._get_fine_cell_(fine_x, fine_y) != run.program._CELL_BLOCKED
+    assert odv._get_fine_cell_(fine_x + 1, fine_y) == run.program._CELL_BLOCKED
+    assert not odv.motor_x.stalled()
+    assert clock.commands - commands <= 4
@@ -0,0 +1,96 @@
+"""ODV auto-drive routes are driven as straight runs, one move per run"""
+import pytest
+
+from pybricks_simulator import wait
+
+README_GRIDS = [
+    ["H##X", "LX#U", "###X"],
+    ["H##X#XX", "LX###XU", "###X###"],
+    ["XL##XU", "H#X###"],
+]
+
+
+def drive_route(odv):
+    """run the route executor as the main loop would, until the route is done"""
+    while odv.mh_route_active:
+        odv.advance_route()
+        wait(10)
+
+
+def test_collapse_keeps_the_corners(make_odv):
+    program, _ = make_odv(README_GRIDS[0])
+    east, south = program._EAST, program._SOUTH
+    path = [((0, 0), -1), ((1, 0), east), ((2, 0), east), ((2, 1), south), ((2, 2), south)]
+    assert program.collapse_tile_path(path) == [((0, 0), -1), ((2, 0), east), ((2, 2), south)]
+
+
+@pytest.mark.parametrize('grid', README_GRIDS)
+def test_route_targets_only_the_corners(make_odv, grid):
+    program, odv = make_odv(grid)
+    odv.mh__remote_disabled = True
+    odv.auto_load()
+    tiles = []
+    for step_type, value in odv.route_steps:
+        if step_type != program._STEP_TILE:
+            break
+        # the load queues the drive into its station as a step of its own
+        if len(tiles) == 0 or value != tiles[-1]:
+            tiles.append(value)
+    for before, tile, after in zip(tiles, tiles[1:], tiles[2:]):
+        # a tile in the middle of a straight run would not be a target of its own
+        assert not (before[0] == tile[0] == after[0] or before[1] == tile[1] == after[1])
+
+    drive_route(odv)
+    assert odv.has_load
+    tile = odv._get_grid_tile_position_from_fine_xy_(odv._get_fine_grid_position_(), True)
+    assert tile == odv.load_tile
+
+
+def serpentine_grid(size: int) -> list[str]:
+    """
+        walls every fourth column with the gap at alternate ends, so the route to the unload station in the
+        bottom right winds through every cluster, home top left with the load below it
+    """
+    rows = [['#'] * size for _ in range(size)]
+    for i, x in enumerate(range(3, size - 1, 4)):
+        gap = size - 1 if i % 2 == 0 else 0
+        for y in range(size):
+            if y != gap:
+                rows[y][x] = 'X'
+    rows[0][0] = 'H'
+    rows[1][0] = 'L'
+    rows[size - 1][size - 1] = 'U'
+    return [''.join(row) for row in rows]
+
+
+def test_cluster_routes_are_as_short_as_the_flat_planners(make_odv):
+    program, odv = make_odv(serpentine_grid(20))
+    assert odv.cluster_columns > 0
+    start, end = odv.home_tile, odv.unload_tile
+    flat_tiles = len(odv._lowest_cost_path_to_grid_tile(start, end))
+    waypoints = odv._cluster_path_to_grid_tile(start, end)
+    assert waypoints[0] == start and waypoints[-1] == end
+    cluster_tiles = 1
+    for segment_start, segment_end in zip(waypoints, waypoints[1:]):
+        cluster_tiles += len(odv._refine_segment_(segment_start, segment_end)) - 1
+    assert flat_tiles <= cluster_tiles <= flat_tiles * 1.05
+
+    # and the cart drives it segment by segment to the station
+    odv.mh__remote_disabled = True
+    odv.has_load = True
+    odv.auto_unload()
+    assert any(step_type == program._STEP_SEGMENT for step_type, _ in odv.route_steps)
+    drive_route(odv)
+    assert not odv.has_load
+    assert odv._get_grid_tile_position_from_fine_xy_(odv._get_fine_grid_position_(), True) == end
+
+
+def test_cluster_planner_finds_no_route_where_the_flat_planner_does_not(make_odv):
+    grid = serpentine_grid(20)
+    # wall in the unload station
+    grid[18] = grid[18][:19] + 'X'
+    grid[19] = grid[19][:18] + 'XU'
+    _, odv = make_odv(grid)
+    assert odv.cluster_columns > 0
+    assert odv._lowest_cost_path_to_grid_tile(odv.home_tile, odv.unload_tile) == []
+    assert odv._cluster_path_to_grid_tile(odv.home_tile, odv.unload_tile) == []
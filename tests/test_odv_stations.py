@@ -0,0 +1,43 @@
+"""ODV grids with several load and unload stations, the cart picks the pair that keeps its cycle shortest"""
+from pybricks_simulator import wait
+
+# a load and an unload station at each end of the top and bottom rows
+GRID = ["L#####U", "#X#X#X#", "#######", "#X#X#X#", "L#####U"]
+
+
+def drive_to(odv, queue_station) -> tuple[int, int]:
+    """
+        queue a load or unload and drive it as the main loop would
+    :return the tile the cart ends up on:
+    """
+    queue_station()
+    while odv.mh_route_active:
+        odv.advance_route()
+        wait(10)
+    return odv._get_grid_tile_position_from_fine_xy_(odv._get_fine_grid_position_(), True)
+
+
+def test_the_cart_cycles_between_the_nearest_pair_of_stations(make_odv):
+    _, odv = make_odv(GRID, (2, 3))
+    odv.mh__remote_disabled = True
+    assert len(odv.load_tiles) == 2 and len(odv.unload_tiles) == 2
+    for _ in range(2):
+        assert drive_to(odv, odv.auto_load) == (0, 4)
+        assert odv.has_load
+        assert drive_to(odv, odv.auto_unload) == (6, 4)
+        assert not odv.has_load
+
+
+def test_the_load_picked_is_the_one_nearest_an_unload_station(make_odv):
+    # the top load is two tiles nearer the cart, the bottom one is four nearer the only unload station
+    _, odv = make_odv(["L######", "#X#X#X#", "#######", "#X#X#X#", "L#####U"], (2, 1))
+    odv.mh__remote_disabled = True
+    assert drive_to(odv, odv.auto_load) == (0, 4)
+
+
+def test_a_station_that_cannot_be_reached_is_left_out(make_odv):
+    # the top load station is walled in
+    _, odv = make_odv(["LX####U", "XX#X#X#", "#######", "#X#X#X#", "L#####U"], (2, 0))
+    odv.mh__remote_disabled = True
+    assert drive_to(odv, odv.auto_load) == (0, 4)
+    assert odv.has_load
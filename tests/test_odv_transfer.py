@@ -0,0 +1,94 @@
+"""ODV load/unload, how long the cart stays in a station"""
+from pybricks_simulator import Port, clock, wait
+
+GRID = ["H##X#XX", "LX###XU", "###X###"]
+LOAD_TILE = (0, 1)
+
+
+def time_in_station(odv, program, sensor_full_after_ms: int = None) -> int:
+    """
+        load at the load station, the sensor, if there is one, reads full sensor_full_after_ms after the cart
+        gets there
+    :return ms from the cart reaching the station to it setting off back out:
+    """
+    odv.mh__remote_disabled = True
+    odv._queue_load_(LOAD_TILE)
+    arrived = left = -1
+    while odv.mh_route_active:
+        loading = odv.route_steps[odv.route_step_index][0] == program._STEP_LOAD
+        if loading and arrived < 0 and odv.route_step_arrived_ms >= 0:
+            arrived = clock.time
+        elif not loading and arrived >= 0 and left < 0:
+            left = clock.time
+        if arrived >= 0 and sensor_full_after_ms is not None and clock.time - arrived >= sensor_full_after_ms:
+            odv.transfer_sensor.sensed_distance = 20
+        odv.advance_route()
+        wait(10)
+    assert left >= 0, 'the cart never got to the station'
+    return left - arrived
+
+
+def test_without_a_sensor_the_cart_stays_the_whole_dwell(make_odv):
+    program, odv = make_odv(GRID, LOAD_TILE)
+    assert odv.transfer_sensor is None
+    assert program.ODV_TRANSFER_DWELL_MS == 2000
+    assert time_in_station(odv, program) >= 2000
+    assert odv.has_load
+
+
+def test_a_stopped_cart_does_not_end_the_transfer(make_odv):
+    program, odv = make_odv(GRID, LOAD_TILE, transfer_dwell_ms=3000)
+    # the cart stops in the station straight away, a slow station still gets the dwell
+    assert time_in_station(odv, program) >= 3000
+    assert odv.has_load
+
+
+def test_the_sensor_ends_the_transfer(make_odv):
+    program, odv = make_odv(GRID, LOAD_TILE, transfer_sensor_port=Port.B)
+    ms = time_in_station(odv, program, sensor_full_after_ms=700)
+    assert 700 + program._TRANSFER_SENSED_MS <= ms < 1000
+    assert odv.has_load
+
+
+def test_the_sensor_must_read_full_for_a_while(make_odv):
+    program, odv = make_odv(GRID, LOAD_TILE, transfer_sensor_port=Port.B)
+    odv.mh__remote_disabled = True
+    odv._queue_load_(LOAD_TILE)
+    while odv.route_steps[odv.route_step_index][0] != program._STEP_LOAD or odv.route_step_arrived_ms < 0:
+        odv.advance_route()
+        wait(10)
+    # a ball falling past the sensor
+    odv.transfer_sensor.sensed_distance = 20
+    odv.advance_route()
+    wait(50)
+    odv.transfer_sensor.sensed_distance = 100
+    for _ in range(50):
+        odv.advance_route()
+        wait(10)
+    assert odv.route_steps[odv.route_step_index][0] == program._STEP_LOAD
+
+
+def test_with_a_sensor_the_dwell_is_the_longest_stay(make_odv):
+    program, odv = make_odv(GRID, LOAD_TILE, transfer_sensor_port=Port.B)
+    ms = time_in_station(odv, program)
+    assert 2000 <= ms < 2100
+    assert odv.has_load
+
+
+def test_a_station_not_reached_is_not_counted_as_a_transfer(make_odv):
+    program, odv = make_odv(GRID, LOAD_TILE)
+    odv.mh__remote_disabled = True
+    # the cart is held up on the way into the station, it neither gets there nor pushes against it
+    done = odv.motor_x.done
+    odv.motor_x.done = lambda: done() and odv.route_steps[odv.route_step_index][0] != program._STEP_LOAD
+    odv._queue_load_(LOAD_TILE)
+    while odv.mh_route_active:
+        odv.advance_route()
+        wait(10)
+    assert not odv.has_load
+    assert odv.route_step_arrived_ms < 0
+
+    # the next transfer counts again
+    odv.motor_x.done = done
+    time_in_station(odv, program)
+    assert odv.has_load
@@ -0,0 +1,42 @@
+"""Finding the steering centre on boot, with the steering ends saved in the hub"""
+import pytest
+
+from pybricks_simulator import load_program, run_task_for
+
+LEFT_END = -130
+RIGHT_END = 110
+
+
+def new_servo(left_end: int, right_end: int):
+    """a servo steer vehicle whose steering motor stops at the ends, at absolute angles"""
+    program = load_program('servo')
+    servo = program.RunServoSteerMotors(program.ErrorFlashCodes(), 80, 45, False, False)
+    servo.steering_motor.device.travel_limits = (left_end, right_end)
+    return program, servo
+
+
+def boot(program, servo):
+    """start up, then the steering motor's position between its ends"""
+    run_task_for(servo.start_up(), 10000)
+    return servo.steering_motor.device.position
+
+
+def test_first_boot_saves_the_ends_and_centres():
+    program, servo = new_servo(LEFT_END, RIGHT_END)
+    assert program.load_calibration(program._CALIBRATION_SERVO, '<hh') is None
+    assert boot(program, servo) == pytest.approx((LEFT_END + RIGHT_END) / 2, abs=2)
+    saved = program.load_calibration(program._CALIBRATION_SERVO, '<hh')
+    assert saved[0] == pytest.approx(LEFT_END, abs=2) and saved[1] == pytest.approx(RIGHT_END, abs=2)
+
+
+@pytest.mark.parametrize("left_shift, right_shift", [(0, -40), (-40, 0)])
+def test_a_moved_end_stop_moves_the_centre(left_shift, right_shift):
+    program, servo = new_servo(LEFT_END, RIGHT_END)
+    boot(program, servo)
+
+    # the linkage is re-seated between boots, moving one end stop
+    program, servo = new_servo(LEFT_END + left_shift, RIGHT_END + right_shift)
+    centre = (LEFT_END + left_shift + RIGHT_END + right_shift) / 2
+    assert boot(program, servo) == pytest.approx(centre, abs=2)
+    saved = program.load_calibration(program._CALIBRATION_SERVO, '<hh')
+    assert saved[1] - saved[0] == pytest.approx(RIGHT_END + right_shift - LEFT_END - left_shift, abs=4)